@@ -0,0 +1,304 @@
+"""
+Benchmark do processamento de balancetes com planilhas sintéticas.
+
+Mede cada etapa de processar_planilha_xlsx (leitura, normalização,
+conciliação, gravação do relatório e dos lançamentos) em planilhas de
+1 mil, 100 mil e 1 milhão de lançamentos, em .xlsx e .xls, e o lote
+completo (processar_pasta, o mesmo caminho do botão "Processar") em uma
+pasta com várias planilhas pequenas, além do tempo de abertura da janela
+(planilha.py). Para cada cenário informa o tempo, a vazão (lançamentos por
+segundo) e o pico de memória (RSS).
+
+Cada cenário roda em um processo novo, para que o pico de memória de um não
+contamine o do outro. As planilhas geradas ficam guardadas na pasta de dados
+e são reaproveitadas entre execuções.
+
+Uso:
+    python benchmarks/benchmark.py                                # mede e compara com baseline.json
+    python benchmarks/benchmark.py --linhas 1000 100000           # escalas menores
+    python benchmarks/benchmark.py --salvar-baseline              # grava o resultado como nova referência
+
+Código de saída 1 quando algum cenário fica mais lento que a referência além da tolerância.
+As observações da referência (campo "observacoes": limitações da máquina em
+que foi medida, custos conhecidos ainda a reduzir) são mantidas ao regravá-la.
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+PASTA_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+PASTA_SRC = os.path.join(PASTA_BENCHMARKS, "..", "src")
+sys.path.insert(0, PASTA_SRC)
+sys.path.insert(0, PASTA_BENCHMARKS)
+
+from gerar_balancete import gerar_balancete, suporta  # noqa: E402
+
+BASELINE_PADRAO = os.path.join(PASTA_BENCHMARKS, "baseline.json")
+# Planilhas (de 1 mil lançamentos) do cenário de lote
+ARQUIVOS_LOTE = 40
+# Cenários pequenos são repetidos e vale a melhor medida, para reduzir o ruído
+REPETICOES_PEQUENOS = 5
+LINHAS_PEQUENO = 10000
+# Executado em um interpretador novo: importa a interface e, havendo tela, abre e fecha a janela
+SCRIPT_INICIALIZACAO = """
+import json, os, sys, time
+inicio = time.perf_counter()
+import planilha
+importacao = time.perf_counter() - inicio
+janela = False
+if os.environ.get("DISPLAY") or sys.platform in ("win32", "darwin"):
+    try:
+        raiz = planilha.criar_janela()
+        raiz.update()
+        raiz.destroy()
+        janela = True
+    except planilha.tk.TclError:
+        pass
+print(json.dumps({"importacao": importacao, "janela": janela, "pandas": "pandas" in sys.modules}))
+"""
+# Diferenças absolutas abaixo disso não contam como regressão
+SEGUNDOS_MINIMOS_REGRESSAO = 0.05
+
+try:
+    import resource
+except ImportError:
+    # Windows: sem getrusage, o pico de memória não é medido
+    resource = None
+
+
+def pico_memoria_mb(quem="proprio"):
+    """Pico de memória residente (RSS) do processo atual ou de seus filhos, em MB."""
+    if resource is None:
+        return None
+    alvo = resource.RUSAGE_SELF if quem == "proprio" else resource.RUSAGE_CHILDREN
+    pico = resource.getrusage(alvo).ru_maxrss
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def medir_arquivo(caminho, leitura, pasta_saida, repeticoes=1):
+    """
+    Mede processar_planilha_xlsx etapa por etapa.
+    Com repetições, devolve a execução mais rápida.
+    """
+    medidas = [medir_etapas(caminho, leitura, pasta_saida) for _ in range(repeticoes)]
+    melhor = min(medidas, key=lambda medida: medida["segundos"])
+    melhor["pico_memoria_mb"] = pico_memoria_mb()
+    return melhor
+
+def medir_etapas(caminho, leitura, pasta_saida):
+    """
+    Uma execução de processar_planilha_xlsx; o tempo de cada etapa vem das
+    métricas do próprio processamento (resultado["metricas"]).
+    """
+    from balancete.processamento import OpcoesProcessamento, processar_planilha_xlsx
+
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        inicio = time.perf_counter()
+        resultado = processar_planilha_xlsx(caminho, pasta_saida, pasta_saida, OpcoesProcessamento(leitura=leitura))
+        total = time.perf_counter() - inicio
+    if resultado["status"] != "ok":
+        raise RuntimeError(f"Falha ao processar '{caminho}': {resultado['mensagem']}")
+
+    etapas = {registro["etapa"]: registro for registro in resultado["metricas"]}
+    linhas_lidas = etapas["leitura"]["linhas_saida"]
+    return {
+        "etapas": {etapa: round(registro["segundos"], 4) for etapa, registro in etapas.items()},
+        "segundos": round(total, 4),
+        "linhas_lidas": linhas_lidas,
+        "lancamentos": etapas["normalizacao"]["linhas_saida"],
+        "notas": resultado["notas"],
+        "linhas_por_segundo": round(linhas_lidas / total) if total else None,
+    }
+
+def medir_lote(pasta_entrada, pasta_saida, processos):
+    """Executa processar_pasta (o caminho do botão 'Processar') sobre a pasta inteira."""
+    from balancete import listar_planilhas, processar_pasta
+
+    arquivos = len(listar_planilhas(pasta_entrada))
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        inicio = time.perf_counter()
+        resultados = processar_pasta(pasta_entrada, pasta_saida, processos=processos, pasta_lancamentos=pasta_saida)
+        total = time.perf_counter() - inicio
+
+    picos = [pico for pico in (pico_memoria_mb(), pico_memoria_mb("filhos")) if pico is not None]
+    return {
+        "segundos": round(total, 4),
+        "arquivos": arquivos,
+        "ok": sum(1 for resultado in resultados if resultado["status"] == "ok"),
+        "arquivos_por_segundo": round(arquivos / total, 2) if total else None,
+        "pico_memoria_mb": max(picos) if picos else None,
+    }
+
+def medir_inicializacao(repeticoes=REPETICOES_PEQUENOS):
+    """
+    Tempo até a janela abrir: interpretador novo + import planilha (+ criar a
+    janela, quando há tela). Vale a melhor de `repeticoes` medidas.
+    """
+    melhor = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        saida = subprocess.run([sys.executable, "-c", SCRIPT_INICIALIZACAO], cwd=PASTA_SRC,
+                               capture_output=True, text=True, check=True).stdout
+        total = time.perf_counter() - inicio
+        medida = json.loads(saida.strip().splitlines()[-1])
+        if melhor is None or total < melhor["segundos"]:
+            melhor = {"segundos": round(total, 4), "importacao": round(medida["importacao"], 4),
+                      "janela": medida["janela"], "pandas_carregado": medida["pandas"]}
+    melhor["pico_memoria_mb"] = pico_memoria_mb("filhos")
+    return melhor
+
+def em_processo_novo(funcao, *args):
+    """Executa a função em um processo novo ('spawn') e devolve o resultado."""
+    contexto = multiprocessing.get_context("spawn")
+    with contexto.Pool(1) as pool:
+        return pool.apply(funcao, args)
+
+def executar_cenarios(pasta_dados, linhas, formatos, leitura, processos):
+    """Gera as planilhas que faltarem e mede todos os cenários. Retorna {cenario: medidas}."""
+    os.makedirs(pasta_dados, exist_ok=True)
+    resultados = {}
+    with tempfile.TemporaryDirectory(prefix="balancete_benchmark_saida_") as pasta_saida:
+        for quantidade in linhas:
+            for formato in formatos:
+                cenario = f"{formato}_{quantidade}"
+                if not suporta(formato, quantidade):
+                    print(f"{cenario:>16}: ignorado (o formato .{formato} não comporta {quantidade} linhas)")
+                    continue
+                caminho = gerar_balancete(pasta_dados, quantidade, formato)
+                repeticoes = REPETICOES_PEQUENOS if quantidade <= LINHAS_PEQUENO else 1
+                resultados[cenario] = em_processo_novo(medir_arquivo, caminho, leitura, pasta_saida, repeticoes)
+                imprimir_medidas(cenario, resultados[cenario])
+
+        # Lote: várias planilhas pequenas, com o paralelismo padrão
+        pasta_lote = os.path.join(pasta_dados, f"lote_{ARQUIVOS_LOTE}")
+        os.makedirs(pasta_lote, exist_ok=True)
+        for semente in range(ARQUIVOS_LOTE):
+            gerar_balancete(pasta_lote, 1000, "xlsx", semente)
+        cenario = f"lote_{ARQUIVOS_LOTE}x1000"
+        resultados[cenario] = em_processo_novo(medir_lote, pasta_lote, pasta_saida, processos)
+        imprimir_medidas(cenario, resultados[cenario])
+
+    resultados["inicializacao"] = em_processo_novo(medir_inicializacao)
+    imprimir_medidas("inicializacao", resultados["inicializacao"])
+    return resultados
+
+def imprimir_medidas(cenario, medidas):
+    """Mostra a linha de resultado de um cenário."""
+    memoria = f"{medidas['pico_memoria_mb']:.0f} MB" if medidas["pico_memoria_mb"] is not None else "n/d"
+    if "etapas" in medidas:
+        etapas = "  ".join(f"{etapa} {segundos:.2f}s" for etapa, segundos in medidas["etapas"].items())
+        vazao = f"{medidas['linhas_por_segundo']} linhas/s"
+    elif "importacao" in medidas:
+        etapas = (f"import {medidas['importacao']:.2f}s"
+                  + ("  janela" if medidas["janela"] else "  sem tela")
+                  + ("  pandas carregado" if medidas["pandas_carregado"] else ""))
+        vazao = ""
+    else:
+        etapas = f"{medidas['arquivos']} arquivos ({medidas['ok']} ok)"
+        vazao = f"{medidas['arquivos_por_segundo']} arquivos/s"
+    print(f"{cenario:>16}: {medidas['segundos']:8.2f}s  {vazao:>20}  pico {memoria:>8}  | {etapas}")
+
+def ambiente():
+    """Descrição da máquina e das bibliotecas, gravada junto com os resultados."""
+    import numpy
+    import pandas
+
+    versoes = {"python": platform.python_version(), "pandas": pandas.__version__, "numpy": numpy.__version__}
+    for modulo in ("openpyxl", "xlrd", "xlsxwriter"):
+        try:
+            versoes[modulo] = __import__(modulo).__version__
+        except ImportError:
+            versoes[modulo] = None
+    return {"plataforma": platform.platform(), "processador": platform.processor() or platform.machine(),
+            "nucleos": os.cpu_count(), "versoes": versoes}
+
+def comparar(resultados, baseline, tolerancia):
+    """
+    Compara o tempo total de cada cenário com a referência.
+    Retorna a lista de cenários mais lentos que a referência além da tolerância
+    (e de SEGUNDOS_MINIMOS_REGRESSAO, para não acusar ruído nos cenários pequenos).
+    """
+    regressoes = []
+    print(f"\nComparação com a referência (tolerância {tolerancia:.0%}):")
+    for cenario, medidas in resultados.items():
+        referencia = baseline["cenarios"].get(cenario)
+        if referencia is None:
+            print(f"{cenario:>16}: sem referência")
+            continue
+        variacao = medidas["segundos"] / referencia["segundos"] - 1
+        regressao = (variacao > tolerancia
+                     and medidas["segundos"] - referencia["segundos"] > SEGUNDOS_MINIMOS_REGRESSAO)
+        situacao = "REGRESSÃO" if regressao else "ok"
+        print(f"{cenario:>16}: {referencia['segundos']:8.2f}s -> {medidas['segundos']:8.2f}s ({variacao:+.0%}) {situacao}")
+        if regressao:
+            regressoes.append(cenario)
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede o desempenho do processamento com balancetes sintéticos.")
+    parser.add_argument("--linhas", type=int, nargs="+", default=[1000, 100000, 1000000],
+                        help="quantidade de lançamentos de cada cenário (padrão: %(default)s)")
+    parser.add_argument("--formatos", nargs="+", choices=["xlsx", "xls"], default=["xlsx", "xls"],
+                        help="formatos medidos (padrão: %(default)s)")
+    parser.add_argument("--leitura", choices=["streaming", "completa", "blocos"], default="streaming",
+                        help="modo de leitura medido (padrão: %(default)s)")
+    parser.add_argument("--processos", type=int, default=os.cpu_count() or 1,
+                        help="processos do cenário de lote (padrão: %(default)s)")
+    parser.add_argument("--dados", default=os.path.join(tempfile.gettempdir(), "balancete_benchmark"),
+                        help="pasta das planilhas geradas, reaproveitadas entre execuções (padrão: %(default)s)")
+    parser.add_argument("--baseline", default=BASELINE_PADRAO,
+                        help="arquivo JSON de referência (padrão: benchmarks/baseline.json)")
+    parser.add_argument("--salvar-baseline", action="store_true",
+                        help="grava os resultados desta execução como a nova referência")
+    parser.add_argument("--tolerancia", type=float, default=0.25,
+                        help="aumento de tempo tolerado antes de acusar regressão (padrão: %(default)s = 25%%)")
+    parser.add_argument("--saida", metavar="ARQUIVO", help="grava os resultados desta execução em JSON")
+    args = parser.parse_args(argv)
+
+    resultados = executar_cenarios(args.dados, args.linhas, args.formatos, args.leitura, args.processos)
+    execucao = {"data": time.strftime("%Y-%m-%d %H:%M:%S"), "leitura": args.leitura,
+                "ambiente": ambiente(), "cenarios": resultados}
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(execucao, f, ensure_ascii=False, indent=2)
+
+    if args.salvar_baseline:
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                observacoes = json.load(f).get("observacoes")
+            if observacoes:
+                print("\nObservações mantidas da referência anterior (revise se ainda valem):")
+                for observacao in observacoes:
+                    print(f"  - {observacao}")
+                execucao["observacoes"] = observacoes
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(execucao, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"\nReferência gravada em {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("\nSem referência para comparar (use --salvar-baseline).")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("leitura") != args.leitura:
+        print(f"\nAviso: a referência foi medida com leitura '{baseline.get('leitura')}'.")
+    nucleos = baseline.get("ambiente", {}).get("nucleos")
+    if nucleos != os.cpu_count():
+        print(f"\nAviso: a referência foi medida com {nucleos} núcleo(s) e esta máquina tem {os.cpu_count()}; "
+              f"o cenário de lote não é comparável.")
+    return 1 if comparar(resultados, baseline, args.tolerancia) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,297 @@
+"""
+Gera planilhas de balancete sintéticas para medir o desempenho do processamento.
+
+Os arquivos imitam os relatórios reais (razão de fornecedores): linhas de
+preâmbulo, cabeçalho DATA / CONTRAPARTIDA/HISTÓRICO / DÉBITO / CRÉDITO /
+SALDO-EXERCÍCIO, linha de SALDO ANTERIOR, históricos de AQUISICAO e
+PAGAMENTO com número de NF, pagamentos parciais, notas sem pagamento,
+pagamentos de notas do período anterior e lançamentos sem NF.
+Nenhum dado de cliente é usado; a mesma semente gera sempre o mesmo arquivo.
+
+Uso:
+    python benchmarks/gerar_balancete.py PASTA --linhas 1000 100000 --formatos xlsx xls pdf
+"""
+import argparse
+import datetime
+import os
+import random
+
+
+# O formato .xls (BIFF8) comporta no máximo 65.536 linhas por aba
+LIMITE_LINHAS_XLS = 65536
+# Linhas de preâmbulo + cabeçalho + saldo anterior + total, além dos lançamentos
+LINHAS_EXTRAS = 8
+# Página do PDF: A4 paisagem, em pontos
+LARGURA_PAGINA_PDF, ALTURA_PAGINA_PDF = 842, 595
+LINHAS_POR_PAGINA_PDF = 50
+TAMANHO_FONTE_PDF = 8
+# Posição das colunas do PDF: (x, alinhamento); valores alinhados à direita
+COLUNAS_PDF = [(30, "esquerda"), (85, "esquerda"), (130, "esquerda"), None,
+               (560, "direita"), (670, "direita"), (800, "direita")]
+# Largura dos caracteres da Helvetica (em milésimos do tamanho da fonte) usados nos valores
+LARGURAS_HELVETICA = {**{d: 556 for d in "0123456789"}, ",": 278, ".": 278, "-": 333}
+
+CABECALHO = ["DATA", "LOTE", "CONTRAPARTIDA/HISTÓRICO", None, "DÉBITO", "CRÉDITO", "SALDO-EXERCÍCIO"]
+FORNECEDORES = ["ACME INSUMOS LTDA", "DISTRIBUIDORA NORTE SA", "METALURGICA SAO JOSE", "TRANSPORTES RAPIDO",
+                "PAPELARIA CENTRAL ME", "AGRO COMERCIAL SUL", "QUIMICA INDUSTRIAL BR", "SERVICOS GERAIS LTDA"]
+OUTROS_HISTORICOS = ["TARIFA BANCARIA", "TRANSFERENCIA ENTRE CONTAS", "AJUSTE DE SALDO CONFORME CONCILIACAO",
+                     "ESTORNO DE LANCAMENTO", "DEVOLUCAO DE ADIANTAMENTO"]
+
+
+def centavos_aleatorios(sorteio, minimo=1000, maximo=5000000):
+    """Valor aleatório em reais com duas casas (entre R$ 10,00 e R$ 50.000,00)."""
+    return sorteio.randint(minimo, maximo) / 100
+
+def lancamentos(linhas, semente):
+    """
+    Gera os lançamentos do período: (data, lote, histórico, débito, crédito).
+    Pagamentos de notas do período anterior são sinalizados para compor o saldo anterior.
+    Retorna um gerador de (lancamento, valor_do_periodo_anterior).
+    """
+    sorteio = random.Random(semente)
+    data = datetime.datetime(2024, 1, 2)
+    passo = datetime.timedelta(days=365) / max(linhas, 1)
+    proxima_nf = 1000
+    nf_anterior = 1
+    abertas = []
+
+    for i in range(linhas):
+        data_lancamento = (data + passo * i).replace(hour=0, minute=0, second=0, microsecond=0)
+        fornecedor = sorteio.choice(FORNECEDORES)
+        lote = 100000 + i
+        sorte = sorteio.random()
+
+        if sorte < 0.08:
+            # Lançamento sem nota fiscal (não entra na conciliação)
+            valor = centavos_aleatorios(sorteio, 100, 50000)
+            yield (data_lancamento, lote, sorteio.choice(OUTROS_HISTORICOS), valor, None), 0
+        elif sorte < 0.11:
+            # Pagamento de nota do período anterior (sem aquisição no período)
+            valor = centavos_aleatorios(sorteio)
+            yield (data_lancamento, lote, f"PAGAMENTO NF. {nf_anterior} {fornecedor}", valor, None), valor
+            nf_anterior += 1
+        elif abertas and sorte < 0.55:
+            indice = sorteio.randrange(len(abertas))
+            nf, restante, nome = abertas[indice]
+            if restante > 200 and sorteio.random() < 0.2:
+                # Pagamento parcial: a nota continua em aberto
+                valor = round(restante / 2, 2)
+                abertas[indice] = (nf, round(restante - valor, 2), nome)
+            else:
+                valor = restante
+                if sorteio.random() < 0.03:
+                    # Juros/desconto: gera diferença na conciliação
+                    valor = max(0.01, round(valor + sorteio.choice([-1, 1]) * sorteio.randint(1, 5000) / 100, 2))
+                abertas[indice] = abertas[-1]
+                abertas.pop()
+            yield (data_lancamento, lote, f"PAGAMENTO NF. {nf} {nome}", valor, None), 0
+        else:
+            valor = centavos_aleatorios(sorteio)
+            proxima_nf += sorteio.randint(1, 3)
+            # Cerca de 5% das notas nunca são pagas no período
+            if sorteio.random() >= 0.05:
+                abertas.append((proxima_nf, valor, fornecedor))
+            yield (data_lancamento, lote, f"AQUISICAO CONF NF {proxima_nf} {fornecedor}", None, valor), 0
+
+def linhas_balancete(linhas, semente=2024):
+    """
+    Gera todas as linhas da planilha (listas de células), do preâmbulo ao total.
+    O saldo anterior é a soma dos pagamentos de notas do período anterior, como
+    num balancete consistente; para isso os lançamentos são sorteados duas vezes
+    com a mesma semente (uma para somar, outra para escrever).
+    """
+    saldo_anterior = round(sum(anterior for _, anterior in lancamentos(linhas, semente)), 2)
+
+    yield ["EMPRESA EXEMPLO INDUSTRIA E COMERCIO LTDA"]
+    yield ["CNPJ: 00.000.000/0001-00"]
+    yield ["RAZÃO ANALÍTICO - PERÍODO: 01/01/2024 A 31/12/2024"]
+    yield ["CONTA: 2.1.1.01.0001 - FORNECEDORES NACIONAIS"]
+    yield []
+    yield CABECALHO
+    yield [None, None, "SALDO ANTERIOR", None, None, None, -saldo_anterior]
+
+    saldo = -saldo_anterior
+    total_debito = total_credito = 0.0
+    for (data, lote, historico, debito, credito), _ in lancamentos(linhas, semente):
+        saldo = round(saldo + (debito or 0) - (credito or 0), 2)
+        total_debito += debito or 0
+        total_credito += credito or 0
+        yield [data, lote, historico, None, debito, credito, saldo]
+
+    yield [None, None, "TOTAL DA CONTA", None, round(total_debito, 2), round(total_credito, 2), saldo]
+
+def gravar_xlsx(caminho, linhas, semente=2024):
+    """Grava o balancete em .xlsx (xlsxwriter em memória constante; sem ele, openpyxl write_only)."""
+    try:
+        import xlsxwriter
+    except ImportError:
+        xlsxwriter = None
+
+    if xlsxwriter is None:
+        import openpyxl
+        livro = openpyxl.Workbook(write_only=True)
+        aba = livro.create_sheet("Razao")
+        for linha in linhas_balancete(linhas, semente):
+            aba.append(linha)
+        livro.save(caminho)
+        return
+
+    livro = xlsxwriter.Workbook(caminho, {"constant_memory": True})
+    try:
+        aba = livro.add_worksheet("Razao")
+        formato_data = livro.add_format({"num_format": "dd/mm/yyyy"})
+        formato_valor = livro.add_format({"num_format": "#,##0.00"})
+        for i, linha in enumerate(linhas_balancete(linhas, semente)):
+            for j, valor in enumerate(linha):
+                if valor is None:
+                    continue
+                if isinstance(valor, datetime.datetime):
+                    aba.write_datetime(i, j, valor, formato_data)
+                elif isinstance(valor, float):
+                    aba.write_number(i, j, valor, formato_valor)
+                else:
+                    aba.write(i, j, valor)
+    finally:
+        livro.close()
+
+def gravar_xls(caminho, linhas, semente=2024):
+    """Grava o balancete em .xls (BIFF8) com o xlwt; limitado a 65.536 linhas."""
+    import xlwt
+
+    if linhas + LINHAS_EXTRAS > LIMITE_LINHAS_XLS:
+        raise ValueError(f"O formato .xls comporta no máximo {LIMITE_LINHAS_XLS} linhas por aba")
+
+    livro = xlwt.Workbook()
+    aba = livro.add_sheet("Razao")
+    formato_data = xlwt.easyxf(num_format_str="DD/MM/YYYY")
+    formato_valor = xlwt.easyxf(num_format_str="#,##0.00")
+    for i, linha in enumerate(linhas_balancete(linhas, semente)):
+        for j, valor in enumerate(linha):
+            if valor is None:
+                continue
+            if isinstance(valor, datetime.datetime):
+                aba.write(i, j, valor, formato_data)
+            elif isinstance(valor, float):
+                aba.write(i, j, valor, formato_valor)
+            else:
+                aba.write(i, j, valor)
+    livro.save(caminho)
+
+def texto_pdf(valor):
+    """Texto da célula como aparece no relatório em PDF (datas dd/mm/aaaa, valores 1.234,56)."""
+    if isinstance(valor, datetime.datetime):
+        return f"{valor:%d/%m/%Y}"
+    if isinstance(valor, float):
+        return f"{valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    return str(valor)
+
+def largura_pdf(texto):
+    """Largura aproximada do texto em Helvetica, em pontos."""
+    return sum(LARGURAS_HELVETICA.get(c, 600) for c in texto) * TAMANHO_FONTE_PDF / 1000
+
+def comandos_linha_pdf(linha, y):
+    """Operadores PDF que escrevem as células da linha na altura y."""
+    comandos = []
+    for j, valor in enumerate(linha):
+        if valor is None or j >= len(COLUNAS_PDF) or COLUNAS_PDF[j] is None:
+            continue
+        texto = texto_pdf(valor)
+        x, alinhamento = COLUNAS_PDF[j]
+        if alinhamento == "direita":
+            x -= largura_pdf(texto)
+        escapado = texto.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+        comandos.append(f"BT /F1 {TAMANHO_FONTE_PDF} Tf {x:.2f} {y} Td ({escapado}) Tj ET")
+    return comandos
+
+def gravar_pdf(caminho, linhas, semente=2024):
+    """
+    Grava o balancete em PDF (texto em Helvetica, sem bordas de tabela, como
+    os relatórios impressos pelos sistemas contábeis), escrito diretamente,
+    sem bibliotecas. O cabeçalho das colunas se repete em cada página.
+    """
+    offsets = {}
+    paginas = []
+    with open(caminho, "wb") as f:
+        def objeto(numero, conteudo):
+            offsets[numero] = f.tell()
+            f.write(f"{numero} 0 obj\n".encode("ascii") + conteudo + b"\nendobj\n")
+
+        def gravar_pagina(linhas_pagina):
+            numero = 4 + 2 * len(paginas)
+            comandos = [comando for i, linha in enumerate(linhas_pagina)
+                        for comando in comandos_linha_pdf(linha, ALTURA_PAGINA_PDF - 40 - 10 * i)]
+            fluxo = "\n".join(comandos).encode("cp1252")
+            objeto(numero + 1, b"<< /Length %d >>\nstream\n" % len(fluxo) + fluxo + b"\nendstream")
+            objeto(numero, (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {LARGURA_PAGINA_PDF} {ALTURA_PAGINA_PDF}] "
+                            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {numero + 1} 0 R >>").encode("ascii"))
+            paginas.append(numero)
+
+        f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        objeto(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+        linhas_pagina = []
+        cabecalho = None
+        for linha in linhas_balancete(linhas, semente):
+            if linha == CABECALHO:
+                cabecalho = linha
+            if len(linhas_pagina) >= LINHAS_POR_PAGINA_PDF:
+                gravar_pagina(linhas_pagina)
+                linhas_pagina = [cabecalho] if cabecalho else []
+            linhas_pagina.append(linha)
+        if linhas_pagina:
+            gravar_pagina(linhas_pagina)
+
+        kids = " ".join(f"{numero} 0 R" for numero in paginas)
+        objeto(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(paginas)} >>".encode("ascii"))
+        objeto(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        inicio_xref = f.tell()
+        total = max(offsets) + 1
+        f.write(f"xref\n0 {total}\n0000000000 65535 f \n".encode("ascii"))
+        for numero in range(1, total):
+            f.write(f"{offsets[numero]:010d} 00000 n \n".encode("ascii"))
+        f.write(f"trailer\n<< /Size {total} /Root 1 0 R >>\nstartxref\n{inicio_xref}\n%%EOF\n".encode("ascii"))
+
+def suporta(formato, linhas):
+    """Indica se o formato comporta a quantidade de lançamentos."""
+    return formato != "xls" or linhas + LINHAS_EXTRAS <= LIMITE_LINHAS_XLS
+
+def gerar_balancete(pasta, linhas, formato="xlsx", semente=2024):
+    """
+    Gera (ou reaproveita, se já existir) o balancete sintético com a quantidade
+    de lançamentos informada. Retorna o caminho do arquivo.
+    """
+    caminho = os.path.join(pasta, f"balancete_{linhas}_s{semente}.{formato}")
+    if os.path.exists(caminho):
+        return caminho
+
+    temporario = os.path.join(pasta, f".gerando_{linhas}_s{semente}.{formato}")
+    if formato == "xls":
+        gravar_xls(temporario, linhas, semente)
+    elif formato == "pdf":
+        gravar_pdf(temporario, linhas, semente)
+    else:
+        gravar_xlsx(temporario, linhas, semente)
+    os.replace(temporario, caminho)
+    return caminho
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera balancetes sintéticos para benchmark.")
+    parser.add_argument("pasta", help="pasta onde as planilhas serão geradas")
+    parser.add_argument("--linhas", type=int, nargs="+", default=[1000, 100000, 1000000],
+                        help="quantidade de lançamentos de cada planilha (padrão: %(default)s)")
+    parser.add_argument("--formatos", nargs="+", choices=["xlsx", "xls", "pdf"], default=["xlsx", "xls"],
+                        help="formatos gerados (padrão: %(default)s)")
+    parser.add_argument("--semente", type=int, default=2024, help="semente do sorteio (padrão: %(default)s)")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.pasta, exist_ok=True)
+    for linhas in args.linhas:
+        for formato in args.formatos:
+            if not suporta(formato, linhas):
+                print(f"Ignorado: {linhas} lançamentos não cabem em .{formato} (máximo {LIMITE_LINHAS_XLS} linhas).")
+                continue
+            print(f"Gerado: {gerar_balancete(args.pasta, linhas, formato, args.semente)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,20 @@
 # -*- mode: python ; coding: utf-8 -*-
+import os
+import sys
 
+# O PyInstaller não coloca a pasta do .spec no sys.path; SPECPATH é definido por ele
+sys.path.insert(0, SPECPATH)
+from planilha import gerar_icone
+
+# Ícone da janela já transparente e redimensionado: o executável abre sem carregar o Pillow
+gerar_icone(os.path.join(SPECPATH, 'icon.jpg'), os.path.join(SPECPATH, 'icon.png'))
 
 a = Analysis(
     ['planilha.py'],
-    pathex=[],
+    pathex=[SPECPATH],
     binaries=[],
-    datas=[('icon.jpg', '.')],
-    hiddenimports=[],
+    datas=[('icon.jpg', '.'), ('icon.png', '.')],
+    hiddenimports=['balancete'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -0,0 +1,21 @@
+"""
+Núcleo de processamento da Análise de Balancete.
+
+Este pacote não depende de tkinter nem de Pillow e pode ser importado em
+servidores sem interface gráfica. A janela fica em planilha.py e a linha
+de comando em __main__.py (python -m balancete).
+"""
+from .armazem import ArmazemLancamentos
+from .cache import CacheResultados, pasta_padrao_cache
+from .consolidado import FORMATOS_CONSOLIDADO, NOME_CONSOLIDADO, gravar_consolidado, montar_consolidado
+from .conversao import ConversorLibreOffice, LibreOfficeNaoEncontrado, converter_xls_para_xlsx, find_libreoffice_path
+from .indice import IndiceNotas
+from .leitura import FormatoNaoSuportado, iterar_linhas, ler_planilha
+from .lote import listar_planilhas, processar_arquivo, processar_caminhos, processar_pasta, processos_padrao
+from .metricas import ArquivoMetricas, Medidor
+from .observador import ObservadorPasta
+from .processamento import (
+    VERSAO_PROCESSAMENTO, OpcoesProcessamento, PlanilhaInvalida, fmt_br, padrao_movimentacao, parse_valor_br, processar_planilha_xlsx,
+)
+from .regras import REGRAS_PADRAO, ClassificadorHistorico, RegraInvalida, carregar_regras
+from .saida import FORMATOS_LANCAMENTOS, gravar_colunar, gravar_lancamentos
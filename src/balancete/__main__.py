@@ -0,0 +1,258 @@
+"""
+Linha de comando da Análise de Balancete (sem interface gráfica).
+
+Uso:
+    python -m balancete PASTA_ENTRADA PASTA_SAIDA [--resumo ARQUIVO.json] [--consolidado ARQUIVO.xlsx] [--processos N]
+    python -m balancete PASTA_ENTRADA PASTA_SAIDA --observar   # processa as planilhas à medida que chegam
+
+Códigos de saída:
+    0  todos os arquivos processados sem erro
+    1  um ou mais arquivos com erro ou aviso
+    2  parâmetros ou pastas inválidos
+    3  nenhuma planilha encontrada na pasta de entrada
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+
+from .armazem import ArmazemLancamentos
+from .cache import LIMITE_CACHE_PADRAO, CacheResultados, pasta_padrao_cache
+from .composicao import SEGUNDOS_COMPOSICAO
+from .consolidado import formato_consolidado, gravar_consolidado
+from .indice import IndiceNotas
+from .lote import listar_planilhas, processar_pasta, processos_padrao
+from .metricas import ArquivoMetricas
+from .observador import ESPERA_PADRAO, INTERVALO_PADRAO, NOME_ESTADO, ObservadorPasta
+from .processamento import LINHAS_POR_BLOCO_LEITURA, OpcoesProcessamento
+from .regras import carregar_regras
+from .saida import FORMATOS_LANCAMENTOS
+
+
+SAIDA_OK = 0
+SAIDA_FALHAS = 1
+SAIDA_PARAMETROS = 2
+SAIDA_SEM_ARQUIVOS = 3
+
+
+def criar_parser():
+    """Monta o parser de argumentos da linha de comando."""
+    parser = argparse.ArgumentParser(
+        prog="python -m balancete",
+        description="Processa as planilhas de balancete (.xls/.xlsx/.htm/.html/.pdf) de uma pasta e gera os relatórios.",
+    )
+    parser.add_argument("entrada", help="pasta com as planilhas .xls/.xlsx/.htm/.html/.pdf")
+    parser.add_argument("saida", help="pasta onde os relatórios .txt serão salvos")
+    parser.add_argument("--resumo", metavar="ARQUIVO",
+                        help="grava o resumo da execução em JSON ('-' para a saída padrão)")
+    parser.add_argument("--consolidado", metavar="ARQUIVO",
+                        help="grava o consolidado do lote (uma linha por arquivo, com as notas e os valores por "
+                             "situação e a verificação do saldo anterior) em .xlsx, .csv ou .json")
+    parser.add_argument("--soffice", metavar="CAMINHO",
+                        help="caminho do executável do LibreOffice, usado só para arquivos que não podem ser lidos diretamente (padrão: detecção automática)")
+    parser.add_argument("--timeout-conversao", type=int, metavar="SEGUNDOS", default=60,
+                        help="tempo limite de conversão de cada arquivo pelo LibreOffice (padrão: %(default)s)")
+    parser.add_argument("--processos", type=int, metavar="N", default=processos_padrao(),
+                        help="quantidade de arquivos processados em paralelo (padrão: %(default)s, um por núcleo; 1 = sequencial)")
+    parser.add_argument("--leitura", choices=["streaming", "completa", "blocos"], default="streaming",
+                        help="streaming: lê linha a linha guardando só as colunas usadas (padrão); "
+                             "completa: carrega a aba inteira com pandas; "
+                             "blocos: processa e grava --linhas-por-bloco linhas de cada vez, com memória constante "
+                             "para planilhas maiores que a memória")
+    parser.add_argument("--linhas-por-bloco", type=int, metavar="N", default=LINHAS_POR_BLOCO_LEITURA,
+                        help="com --leitura blocos, linhas lidas e processadas de cada vez (padrão: %(default)s)")
+    parser.add_argument("--por-conta", action="store_true",
+                        help="lê todas as abas e concilia cada conta contábil (bloco com cabeçalho e SALDO ANTERIOR "
+                             "próprios) à parte, com uma seção por conta no relatório")
+    parser.add_argument("--formato-lancamentos", choices=FORMATOS_LANCAMENTOS, default="xlsx",
+                        help="formato da planilha de lançamentos de cada arquivo (padrão: %(default)s)")
+    parser.add_argument("--regras", metavar="ARQUIVO",
+                        help="arquivo JSON com as regras de classificação do histórico (palavra-chave -> tipo de "
+                             "movimentação e captura do número da NF); padrão: AQUISICAO e PAGAMENTO, como no original")
+    parser.add_argument("--segundos-composicao", type=float, metavar="S", default=SEGUNDOS_COMPOSICAO,
+                        help="liga a busca das notas cuja soma explica a diferença do saldo anterior, com até S "
+                             "segundos por arquivo com diferença (ex.: 2). Custa até S segundos de CPU por arquivo: "
+                             "num lote de 400 arquivos com diferença, 2 s somam até 13 minutos, divididos entre os "
+                             "processos (padrão: 0, desligada)")
+    parser.add_argument("--pasta-lancamentos", metavar="PASTA",
+                        help="pasta onde os lançamentos serão salvos (padrão: a pasta de entrada)")
+    parser.add_argument("--base-colunar", metavar="PASTA",
+                        help="grava também os lançamentos normalizados em Parquet nessa pasta, com um manifesto, "
+                             "para análises sem reler o Excel")
+    parser.add_argument("--indice-notas", metavar="BANCO",
+                        help="grava os totais de cada nota fiscal nesse índice SQLite, para conciliar notas entre "
+                             "períodos (consulta: python -m balancete.consulta BANCO)")
+    parser.add_argument("--cliente", metavar="NOME",
+                        help="cliente de todas as planilhas no índice de notas (padrão: o nome de cada arquivo, "
+                             "sem o período no fim); com mais de uma planilha, exige --mesmo-cliente")
+    parser.add_argument("--mesmo-cliente", action="store_true",
+                        help="confirma que todas as planilhas da pasta são do cliente informado em --cliente")
+    parser.add_argument("--metricas", metavar="ARQUIVO",
+                        help="acrescenta as medidas de cada etapa (tempo, linhas, bytes, memória) "
+                             "a esse arquivo JSON lines")
+    parser.add_argument("--perfil", metavar="PASTA",
+                        help="processa cada arquivo sob o cProfile e grava NOME.prof nessa pasta")
+    parser.add_argument("--cache", metavar="PASTA", default=pasta_padrao_cache(),
+                        help="pasta do cache de resultados (padrão: %(default)s)")
+    parser.add_argument("--sem-cache", action="store_true",
+                        help="processa todos os arquivos, sem consultar nem gravar o cache")
+    parser.add_argument("--invalidar-cache", action="store_true",
+                        help="apaga o cache antes de processar")
+    parser.add_argument("--limite-cache", type=int, metavar="MB", default=LIMITE_CACHE_PADRAO // (1024 * 1024),
+                        help="tamanho máximo do cache em MB (padrão: %(default)s)")
+    parser.add_argument("--observar", action="store_true",
+                        help="fica observando a pasta de entrada e processa só as planilhas novas ou alteradas, "
+                             "até Ctrl+C (o resumo é regravado a cada lote processado)")
+    parser.add_argument("--intervalo", type=float, metavar="SEGUNDOS", default=INTERVALO_PADRAO,
+                        help="com --observar, intervalo entre as varreduras da pasta (padrão: %(default)s)")
+    parser.add_argument("--espera", type=float, metavar="SEGUNDOS", default=ESPERA_PADRAO,
+                        help="com --observar, tempo que o arquivo deve ficar sem mudar antes de ser processado, "
+                             "para não ler planilhas ainda sendo copiadas (padrão: %(default)s)")
+    parser.add_argument("--estado", metavar="ARQUIVO",
+                        help=f"com --observar, arquivo de estado com as planilhas já processadas "
+                             f"(padrão: {NOME_ESTADO} na pasta de saída)")
+    return parser
+
+def montar_resumo(pasta_entrada, pasta_saida, resultados):
+    """Agrupa os resultados por arquivo em um resumo serializável em JSON."""
+    contagem = {"ok": 0, "aviso": 0, "erro": 0}
+    regras = {}
+    for resultado in resultados:
+        contagem[resultado["status"]] = contagem.get(resultado["status"], 0) + 1
+        for nome, quantidade in (resultado.get("regras") or {}).items():
+            regras[nome] = regras.get(nome, 0) + quantidade
+    return {
+        "entrada": os.path.abspath(pasta_entrada),
+        "saida": os.path.abspath(pasta_saida),
+        "total": len(resultados),
+        "ok": contagem["ok"],
+        "avisos": contagem["aviso"],
+        "erros": contagem["erro"],
+        "cache": sum(1 for resultado in resultados if resultado.get("cache")),
+        # Linhas classificadas por regra, somando todos os arquivos
+        "regras": regras,
+        "arquivos": resultados,
+    }
+
+def gravar_resumo(resumo, destino):
+    """Grava o resumo em JSON no arquivo indicado ou na saída padrão ('-')."""
+    texto = json.dumps(resumo, ensure_ascii=False, indent=2)
+    if destino == "-":
+        sys.stdout.write(texto + "\n")
+    else:
+        with open(destino, "w", encoding="utf-8") as f:
+            f.write(texto)
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando. Retorna o código de saída."""
+    args = criar_parser().parse_args(argv)
+
+    if args.processos < 1:
+        print("Erro: --processos deve ser maior ou igual a 1.", file=sys.stderr)
+        return SAIDA_PARAMETROS
+    if args.linhas_por_bloco < 1:
+        print("Erro: --linhas-por-bloco deve ser maior ou igual a 1.", file=sys.stderr)
+        return SAIDA_PARAMETROS
+    if args.por_conta and args.leitura == "blocos":
+        print("Erro: --por-conta não pode ser usado com --leitura blocos.", file=sys.stderr)
+        return SAIDA_PARAMETROS
+    if args.segundos_composicao < 0:
+        print("Erro: --segundos-composicao não pode ser negativo.", file=sys.stderr)
+        return SAIDA_PARAMETROS
+    if args.consolidado and formato_consolidado(args.consolidado) is None:
+        print("Erro: --consolidado deve terminar em .xlsx, .csv ou .json.", file=sys.stderr)
+        return SAIDA_PARAMETROS
+    if not os.path.isdir(args.entrada):
+        print(f"Erro: pasta de ENTRADA inválida: '{args.entrada}'.", file=sys.stderr)
+        return SAIDA_PARAMETROS
+    if not os.path.isdir(args.saida):
+        print(f"Erro: pasta de SAÍDA inválida: '{args.saida}'.", file=sys.stderr)
+        return SAIDA_PARAMETROS
+    if args.pasta_lancamentos and not os.path.isdir(args.pasta_lancamentos):
+        print(f"Erro: pasta de LANÇAMENTOS inválida: '{args.pasta_lancamentos}'.", file=sys.stderr)
+        return SAIDA_PARAMETROS
+
+    if args.intervalo <= 0 or args.espera < 0:
+        print("Erro: --intervalo deve ser positivo e --espera não pode ser negativa.", file=sys.stderr)
+        return SAIDA_PARAMETROS
+
+    regras = None
+    if args.regras:
+        try:
+            regras = carregar_regras(args.regras)
+        except (OSError, ValueError) as e:
+            # RegraInvalida e JSON malformado são ValueError
+            print(f"Erro: regras de classificação inválidas em '{args.regras}': {e}", file=sys.stderr)
+            return SAIDA_PARAMETROS
+
+    if (args.indice_notas and args.cliente and not args.mesmo_cliente
+            and (args.observar or len(listar_planilhas(args.entrada)) > 1)):
+        print("Erro: --cliente vale para todas as planilhas da pasta, que seriam indexadas como de um único "
+              "cliente; confirme com --mesmo-cliente ou omita --cliente (o cliente passa a ser o nome de cada arquivo).",
+              file=sys.stderr)
+        return SAIDA_PARAMETROS
+
+    if not args.observar and not listar_planilhas(args.entrada):
+        print("Aviso: Nenhum arquivo .xls, .xlsx, .htm, .html ou .pdf encontrado na pasta de entrada.", file=sys.stderr)
+        if args.consolidado:
+            # Só com a linha TOTAL, para quem lê o consolidado de cada execução
+            with contextlib.redirect_stdout(sys.stderr if args.resumo == "-" else sys.stdout):
+                gravar_consolidado([], args.consolidado)
+        if args.resumo:
+            gravar_resumo(montar_resumo(args.entrada, args.saida, []), args.resumo)
+        return SAIDA_SEM_ARQUIVOS
+
+    cache = None
+    if not args.sem_cache:
+        cache = CacheResultados(args.cache, limite_bytes=args.limite_cache * 1024 * 1024)
+    armazem = ArmazemLancamentos(args.base_colunar) if args.base_colunar else None
+    metricas = ArquivoMetricas(args.metricas) if args.metricas else None
+    try:
+        indice_notas = IndiceNotas(args.indice_notas, cliente=args.cliente) if args.indice_notas else None
+    except ValueError as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return SAIDA_PARAMETROS
+    if args.perfil:
+        os.makedirs(args.perfil, exist_ok=True)
+
+    # Quando o resumo vai para a saída padrão, as mensagens de progresso vão para stderr
+    saida_mensagens = sys.stderr if args.resumo == "-" else sys.stdout
+    with contextlib.redirect_stdout(saida_mensagens):
+        if cache is not None and args.invalidar_cache:
+            cache.invalidar()
+        opcoes = OpcoesProcessamento(leitura=args.leitura, formato_lancamentos=args.formato_lancamentos,
+                                     regras=regras, segundos_composicao=args.segundos_composicao,
+                                     por_conta=args.por_conta,
+                                     linhas_por_bloco=args.linhas_por_bloco,
+                                     pasta_perfil=args.perfil)
+        if args.observar:
+            def ao_processar(resultados):
+                if args.resumo:
+                    gravar_resumo(montar_resumo(args.entrada, args.saida, resultados), args.resumo)
+                if args.consolidado:
+                    gravar_consolidado(resultados, args.consolidado)
+            ObservadorPasta(args.entrada, args.saida, caminho_estado=args.estado, intervalo=args.intervalo,
+                            espera=args.espera, ao_processar=ao_processar, soffice_path=args.soffice,
+                            processos=args.processos, timeout_conversao=args.timeout_conversao, opcoes=opcoes,
+                            cache=cache, pasta_lancamentos=args.pasta_lancamentos, armazem=armazem,
+                            metricas=metricas, indice_notas=indice_notas).executar()
+            return SAIDA_OK
+        resultados = processar_pasta(args.entrada, args.saida, soffice_path=args.soffice,
+                                     processos=args.processos,
+                                     timeout_conversao=args.timeout_conversao,
+                                     opcoes=opcoes,
+                                     cache=cache, pasta_lancamentos=args.pasta_lancamentos, armazem=armazem,
+                                     metricas=metricas, indice_notas=indice_notas)
+        if args.consolidado:
+            gravar_consolidado(resultados, args.consolidado)
+
+    resumo = montar_resumo(args.entrada, args.saida, resultados)
+    if args.resumo:
+        gravar_resumo(resumo, args.resumo)
+
+    return SAIDA_OK if resumo["avisos"] == 0 and resumo["erros"] == 0 else SAIDA_FALHAS
+
+
+if __name__ == "__main__":
+    sys.exit(main())
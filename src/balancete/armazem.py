@@ -0,0 +1,150 @@
+import datetime
+import json
+import os
+import tempfile
+from decimal import Decimal
+
+import pandas as pd
+
+from .cache import chave_conteudo
+from .contas import titulo_relatorio
+from .processamento import VERSAO_PROCESSAMENTO, gerar_relatorio, parse_valor_br
+
+
+class ArmazemLancamentos:
+    """
+    Base colunar dos lançamentos já normalizados (df_final), em Parquet.
+
+    Cada planilha processada gera um arquivo {chave}.parquet, onde a chave é o
+    hash do conteúdo da planilha somado à VERSAO_PROCESSAMENTO e às opções do
+    processamento (regras, --por-conta... mudam os lançamentos). O manifesto
+    (manifesto.json) liga cada planilha de origem ao seu Parquet e mostra o
+    saldo anterior (o valor exato vai nos metadados do Parquet), para que
+    análises e novas conciliações partam da base em vez de ler o Excel de novo.
+    Com --por-conta, o saldo de cada conta vai também nos metadados e no
+    manifesto, e a conciliação é refeita conta a conta.
+
+    Os processos do modo paralelo só gravam os .parquet; o manifesto é
+    atualizado pelo processo principal (registrar), ao final do lote.
+
+    Uso:
+        armazem = ArmazemLancamentos("base")
+        df, saldo_anterior = armazem.carregar("cliente_jan.xlsx")
+        relatorio = armazem.reconciliar("cliente_jan.xlsx")
+        ano = armazem.carregar_todos()
+    """
+
+    NOME_MANIFESTO = "manifesto.json"
+
+    def __init__(self, pasta):
+        self.pasta = pasta
+        os.makedirs(self.pasta, exist_ok=True)
+
+    def chave(self, caminho_entrada, opcoes=None):
+        """Chave do Parquet de uma planilha: conteúdo + versão do processamento + opções (como no cache)."""
+        return chave_conteudo(caminho_entrada, VERSAO_PROCESSAMENTO, repr(opcoes))
+
+    def caminho(self, chave):
+        """Caminho do Parquet correspondente à chave."""
+        return os.path.join(self.pasta, f"{chave}.parquet")
+
+    def contem(self, chave):
+        """Indica se o Parquet da chave já existe na base."""
+        return chave is not None and os.path.exists(self.caminho(chave))
+
+    def manifesto(self):
+        """Lê o manifesto; {origem: entrada} vazio se a base ainda não tiver manifesto."""
+        try:
+            with open(os.path.join(self.pasta, self.NOME_MANIFESTO), encoding="utf-8") as f:
+                return json.load(f)["lancamentos"]
+        except (OSError, ValueError, KeyError):
+            return {}
+
+    def registrar(self, registros):
+        """
+        Registra no manifesto uma lista de (caminho_entrada, chave, resultado).
+        Só entram resultados com o Parquet gravado (resultado["colunar"]).
+        """
+        lancamentos = self.manifesto()
+        agora = datetime.datetime.now().isoformat(timespec="seconds")
+        for caminho_entrada, chave, resultado in registros:
+            if not resultado.get("colunar") or not self.contem(chave):
+                continue
+            lancamentos[os.path.abspath(caminho_entrada)] = {
+                "arquivo": os.path.basename(caminho_entrada),
+                "parquet": os.path.basename(self.caminho(chave)),
+                "saldo_anterior": resultado["saldo_anterior"],
+                "versao": VERSAO_PROCESSAMENTO,
+                "registrado_em": agora,
+            }
+            if resultado.get("contas"):
+                lancamentos[os.path.abspath(caminho_entrada)]["contas"] = [
+                    {"conta": conta["conta"], "aba": conta["aba"], "saldo_anterior": conta["saldo_anterior"]}
+                    for conta in resultado["contas"]]
+
+        # Grava em arquivo temporário e renomeia: o manifesto nunca fica pela metade
+        descritor, temporario = tempfile.mkstemp(prefix=".manifesto_", dir=self.pasta)
+        with os.fdopen(descritor, "w", encoding="utf-8") as f:
+            json.dump({"versao": VERSAO_PROCESSAMENTO, "lancamentos": lancamentos}, f, ensure_ascii=False, indent=2)
+        os.replace(temporario, os.path.join(self.pasta, self.NOME_MANIFESTO))
+
+    def entradas(self):
+        """Entradas do manifesto na versão atual do processamento, em ordem de nome de arquivo."""
+        atuais = [entrada for entrada in self.manifesto().values() if entrada["versao"] == VERSAO_PROCESSAMENTO]
+        return sorted(atuais, key=lambda entrada: entrada["arquivo"])
+
+    def localizar(self, arquivo):
+        """Entrada do manifesto pelo nome ou caminho da planilha de origem."""
+        lancamentos = self.manifesto()
+        entrada = lancamentos.get(os.path.abspath(arquivo))
+        if entrada is None:
+            encontradas = [e for e in lancamentos.values() if e["arquivo"] == os.path.basename(arquivo)]
+            entrada = max(encontradas, key=lambda e: e["registrado_em"]) if encontradas else None
+        if entrada is None:
+            raise KeyError(f"'{arquivo}' não está na base de lançamentos")
+        return entrada
+
+    def carregar(self, arquivo):
+        """
+        Carrega os lançamentos normalizados de uma planilha. Retorna (df_final, saldo_anterior).
+        Com --por-conta, df_final.attrs["contas"] tem o saldo e as linhas de cada conta.
+        """
+        entrada = self.localizar(arquivo)
+        df_final = pd.read_parquet(os.path.join(self.pasta, entrada["parquet"]), memory_map=True)
+        # O saldo exato fica nos metadados do Parquet; o do manifesto é o formatado (2 casas)
+        if "saldo_anterior" in df_final.attrs:
+            return df_final, Decimal(df_final.attrs.pop("saldo_anterior"))
+        return df_final, parse_valor_br(entrada["saldo_anterior"])
+
+    def carregar_todos(self):
+        """Junta os lançamentos de todas as planilhas da base, com a coluna 'Arquivo' de origem."""
+        partes = []
+        for entrada in self.entradas():
+            df_final = pd.read_parquet(os.path.join(self.pasta, entrada["parquet"]), memory_map=True)
+            df_final.attrs.clear()
+            partes.append(df_final.assign(Arquivo=entrada["arquivo"]))
+        if not partes:
+            return pd.DataFrame()
+        return pd.concat(partes, ignore_index=True)
+
+    def reconciliar(self, arquivo):
+        """
+        Refaz a conciliação de uma planilha a partir da base; retorna as linhas
+        do relatório. Com --por-conta, uma seção por conta, cada uma com o seu
+        saldo anterior, como no relatório original.
+        """
+        df_final, saldo_anterior = self.carregar(arquivo)
+        contas = df_final.attrs.pop("contas", None)
+        if not contas:
+            return gerar_relatorio(df_final, saldo_anterior)
+
+        relatorio = []
+        inicio = 0
+        for conta in contas:
+            parte = df_final.iloc[inicio:inicio + conta["linhas"]].drop(columns="Conta").reset_index(drop=True)
+            inicio += conta["linhas"]
+            if relatorio:
+                relatorio.append("")
+            relatorio.append(titulo_relatorio(conta))
+            relatorio.extend(gerar_relatorio(parte, Decimal(conta["saldo_anterior"])))
+        return relatorio
@@ -0,0 +1,284 @@
+import os
+import sqlite3
+import tempfile
+from collections import defaultdict
+from decimal import Decimal
+
+import numpy as np
+
+from .metricas import tamanho_arquivo
+from .processamento import (
+    LeitorLancamentos, aviso_colunar, aviso_valores_invalidos, fmt_br, normalizar_lancamentos, nova_situacao,
+    parse_valor_br, relatorio_centavos, relatorio_decimal, somar_por_nota,
+)
+from .regras import ClassificadorHistorico
+from .saida import EscritorParquet, abrir_escritor_lancamentos
+
+
+# Notas distintas mantidas em memória; acima disso as somas vão para um banco SQLite temporário
+LIMITE_NOTAS_EM_MEMORIA = 1000000
+# Notas consultadas/gravadas por comando no banco temporário (limite de parâmetros do SQLite)
+NOTAS_POR_CONSULTA = 500
+
+
+def somar_decimal(df_final):
+    """
+    Soma Crédito e Débito por nota em Decimal, linha a linha, como gerar_relatorio_decimal.
+    Retorna (numeros, credito, debito) na ordem em que as notas aparecem.
+    """
+    notas = defaultdict(lambda: [Decimal("0.00"), Decimal("0.00")])
+    for nf, credito, debito in zip(df_final['Numero'].astype(str), df_final['Crédito'], df_final['Débito']):
+        notas[nf][0] += parse_valor_br(credito)
+        notas[nf][1] += parse_valor_br(debito)
+    return list(notas), [c for c, _ in notas.values()], [d for _, d in notas.values()]
+
+
+class AcumuladorNotas:
+    """
+    Soma Crédito e Débito por nota fiscal bloco a bloco, na ordem em que as
+    notas aparecem, com o mesmo relatório de gerar_relatorio sobre a planilha
+    inteira.
+
+    Enquanto os valores são exatos em centavos, as somas são inteiras (como em
+    somar_por_nota); se algum bloco não for, tudo passa para Decimal (como em
+    gerar_relatorio_decimal). Passando de `limite_notas` notas distintas, as
+    somas vão para um banco SQLite temporário em disco, e a memória deixa de
+    crescer com a quantidade de notas.
+    """
+
+    def __init__(self, limite_notas=LIMITE_NOTAS_EM_MEMORIA):
+        self.limite_notas = limite_notas
+        # {nf: posição em credito/debito}; a ordem do dicionário é a ordem das notas
+        self.posicoes = {}
+        self.credito = []
+        self.debito = []
+        self.decimal = False
+        self.banco = None
+        self.caminho_banco = None
+        self.quantidade = 0
+
+    def adicionar(self, df_final):
+        """Soma os lançamentos normalizados de um bloco."""
+        if df_final.empty:
+            return
+        somas = somar_por_nota(df_final)
+        if somas is None:
+            self.passar_para_decimal()
+            numeros, credito, debito = somar_decimal(df_final)
+        else:
+            numeros, credito, debito = somas[0].tolist(), somas[1].tolist(), somas[2].tolist()
+            if self.decimal:
+                # Valores exatos em centavos: a soma inteira / 100 é a mesma soma em Decimal
+                credito = [Decimal(c) / 100 for c in credito]
+                debito = [Decimal(d) / 100 for d in debito]
+
+        if self.banco is not None:
+            self.somar_no_banco(numeros, credito, debito)
+            return
+        for nf, c, d in zip(numeros, credito, debito):
+            posicao = self.posicoes.get(nf)
+            if posicao is None:
+                self.posicoes[nf] = len(self.credito)
+                self.credito.append(c)
+                self.debito.append(d)
+            else:
+                self.credito[posicao] += c
+                self.debito[posicao] += d
+        if len(self.posicoes) > self.limite_notas:
+            self.descarregar()
+
+    def passar_para_decimal(self):
+        """Converte as somas em centavos já feitas para Decimal."""
+        if not self.decimal:
+            self.credito = [Decimal(c) / 100 for c in self.credito]
+            self.debito = [Decimal(d) / 100 for d in self.debito]
+            self.decimal = True
+
+    def descarregar(self):
+        """Leva as somas para o banco temporário; daí em diante elas são feitas lá, em Decimal."""
+        self.passar_para_decimal()
+        descritor, self.caminho_banco = tempfile.mkstemp(prefix="balancete_notas_", suffix=".db")
+        os.close(descritor)
+        self.banco = sqlite3.connect(self.caminho_banco)
+        self.banco.execute("CREATE TABLE notas (numero TEXT PRIMARY KEY, ordem INTEGER NOT NULL, "
+                           "credito TEXT NOT NULL, debito TEXT NOT NULL)")
+        with self.banco:
+            self.banco.executemany("INSERT INTO notas VALUES (?, ?, ?, ?)",
+                                   ((nf, posicao, str(self.credito[posicao]), str(self.debito[posicao]))
+                                    for nf, posicao in self.posicoes.items()))
+        self.quantidade = len(self.posicoes)
+        self.posicoes, self.credito, self.debito = {}, [], []
+        print(f"Mais de {self.limite_notas} notas: somas por nota gravadas em disco ({self.caminho_banco}).")
+
+    def somar_no_banco(self, numeros, credito, debito):
+        """Soma um bloco (notas sem repetição) às somas do banco, em Decimal."""
+        with self.banco:
+            for inicio in range(0, len(numeros), NOTAS_POR_CONSULTA):
+                lote = numeros[inicio:inicio + NOTAS_POR_CONSULTA]
+                marcadores = ", ".join("?" * len(lote))
+                existentes = {nf: (Decimal(c), Decimal(d)) for nf, c, d in self.banco.execute(
+                    f"SELECT numero, credito, debito FROM notas WHERE numero IN ({marcadores})", lote)}
+                atualizadas, novas = [], []
+                for nf, c, d in zip(lote, credito[inicio:inicio + NOTAS_POR_CONSULTA],
+                                    debito[inicio:inicio + NOTAS_POR_CONSULTA]):
+                    if nf in existentes:
+                        c0, d0 = existentes[nf]
+                        atualizadas.append((str(c0 + c), str(d0 + d), nf))
+                    else:
+                        novas.append((nf, self.quantidade, str(c), str(d)))
+                        self.quantidade += 1
+                self.banco.executemany("UPDATE notas SET credito = ?, debito = ? WHERE numero = ?", atualizadas)
+                self.banco.executemany("INSERT INTO notas VALUES (?, ?, ?, ?)", novas)
+
+    def notas(self):
+        """Percorre (nf, credito, debito) na ordem em que as notas apareceram."""
+        if self.banco is None:
+            yield from zip(self.posicoes, self.credito, self.debito)
+            return
+        self.banco.execute("CREATE INDEX IF NOT EXISTS notas_ordem ON notas (ordem)")
+        for nf, credito, debito in self.banco.execute("SELECT numero, credito, debito FROM notas ORDER BY ordem"):
+            yield nf, Decimal(credito), Decimal(debito)
+
+    def relatorio(self, saldoAnterior_val, segundos_composicao, situacao=None):
+        """Linhas do relatório (um gerador quando as somas estão em Decimal)."""
+        if not self.decimal:
+            return relatorio_centavos(np.asarray(list(self.posicoes), dtype=object),
+                                      np.asarray(self.credito, dtype=np.int64),
+                                      np.asarray(self.debito, dtype=np.int64), saldoAnterior_val, segundos_composicao,
+                                      situacao)
+        return relatorio_decimal(self.notas(), saldoAnterior_val, segundos_composicao, situacao)
+
+    def totais(self, inicio, fim):
+        """Totais por nota em centavos para o índice entre períodos, como totais_por_nota."""
+        if inicio is None:
+            return None
+        notas = []
+        for nf, credito, debito in self.notas():
+            if self.decimal:
+                credito = int((credito * 100).quantize(Decimal("1")))
+                debito = int((debito * 100).quantize(Decimal("1")))
+            if credito or debito:
+                notas.append([str(nf), credito, debito])
+        return {"inicio": f"{inicio:%Y-%m-%d}", "fim": f"{fim:%Y-%m-%d}", "notas": notas}
+
+    def fechar(self):
+        """Apaga o banco temporário, se houver."""
+        if self.banco is not None:
+            self.banco.close()
+            self.banco = None
+            os.remove(self.caminho_banco)
+
+
+def executar_etapas_blocos(caminho_entrada, pasta_saida_relatorios, pasta_lancamentos, opcoes, caminho_colunar,
+                           nome_base, resultado, medidor):
+    """
+    Etapas de processar_planilha_xlsx na leitura em blocos: cada bloco de até
+    opcoes.linhas_por_bloco linhas é lido, normalizado, somado por nota e
+    gravado (lançamentos e base colunar) antes de o próximo ser lido. No fim o
+    relatório é escrito a partir das somas. Os arquivos gerados são os mesmos
+    da leitura em streaming. As medidas de cada etapa somam todos os blocos.
+    """
+    # A planilha final será salva, por padrão, na mesma pasta do arquivo de entrada
+    pasta_lancamentos = pasta_lancamentos or os.path.dirname(caminho_entrada)
+    classificador = ClassificadorHistorico(opcoes.regras)
+    leitor = LeitorLancamentos(caminho_entrada, opcoes.processos_pdf)
+    blocos = leitor.blocos(opcoes.linhas_por_bloco)
+    acumulador = AcumuladorNotas()
+    lancamentos = abrir_escritor_lancamentos(pasta_lancamentos, nome_base, opcoes.formato_lancamentos)
+    colunar = None
+    contagem = {}
+    resultado["valores_invalidos"] = {}
+    inicio = fim = None
+    try:
+        while True:
+            with medidor.etapa_acumulada("leitura", leitura=opcoes.leitura,
+                                         bytes_lidos=tamanho_arquivo(caminho_entrada)) as registro:
+                bloco = next(blocos, None)
+                if bloco is None:
+                    break
+                registro["linhas_saida"] = len(bloco)
+
+            with medidor.etapa_acumulada("normalizacao") as registro:
+                registro["linhas_entrada"] = len(bloco)
+                invalidos_antes = sum(resultado["valores_invalidos"].values())
+                bloco, contagem_bloco = normalizar_lancamentos(bloco, classificador, resultado["valores_invalidos"])
+                registro["linhas_saida"] = len(bloco)
+                registro["valores_invalidos"] = sum(resultado["valores_invalidos"].values()) - invalidos_antes
+            for nome, quantidade in contagem_bloco.items():
+                contagem[nome] = contagem.get(nome, 0) + quantidade
+            if not bloco.empty:
+                inicio = min(inicio, bloco['Data'].min()) if inicio is not None else bloco['Data'].min()
+                fim = max(fim, bloco['Data'].max()) if fim is not None else bloco['Data'].max()
+
+            if caminho_colunar and colunar is not False:
+                try:
+                    with medidor.etapa_acumulada("colunar") as registro:
+                        registro["linhas_entrada"] = len(bloco)
+                        if colunar is None:
+                            # O SALDO ANTERIOR costuma vir logo abaixo do cabeçalho; se vier depois
+                            # do primeiro bloco, o valor final é acertado antes de fechar
+                            colunar = EscritorParquet(caminho_colunar, {"saldo_anterior": str(leitor.saldo_anterior)})
+                        colunar.gravar(bloco)
+                except Exception as e:
+                    aviso_colunar(caminho_entrada, e)
+                    if colunar:
+                        colunar.descartar()
+                    colunar = False
+
+            with medidor.etapa_acumulada("conciliacao") as registro:
+                registro["linhas_entrada"] = len(bloco)
+                acumulador.adicionar(bloco)
+
+            with medidor.etapa_acumulada("lancamentos", formato=opcoes.formato_lancamentos) as registro:
+                registro["linhas_entrada"] = len(bloco)
+                lancamentos.gravar(bloco)
+
+        resultado["regras"] = contagem
+        aviso_valores_invalidos(caminho_entrada, resultado["valores_invalidos"])
+        saldoAnterior_val = leitor.saldo_anterior
+        if colunar:
+            colunar.attrs["saldo_anterior"] = str(saldoAnterior_val)
+            try:
+                colunar.fechar()
+                resultado["colunar"] = caminho_colunar
+            except Exception as e:
+                print(f"Aviso: lançamentos de '{os.path.basename(caminho_entrada)}' não gravados na base colunar: {e}")
+                colunar.descartar()
+            colunar = None
+        if opcoes.indexar_notas:
+            with medidor.etapa("indice_notas") as registro:
+                resultado["indice_notas"] = acumulador.totais(inicio, fim)
+                registro["linhas_saida"] = len(resultado["indice_notas"]["notas"]) if resultado["indice_notas"] else 0
+
+        # O relatório .txt será salvo na pasta de saída escolhida, uma linha por vez
+        caminho_saida_txt = os.path.join(pasta_saida_relatorios, f"{nome_base}_relatorio.txt")
+        with medidor.etapa("relatorio") as registro:
+            linhas = notas = 0
+            with open(caminho_saida_txt, "w", encoding="utf-8") as f:
+                resultado["situacao"] = nova_situacao()
+                for linha in acumulador.relatorio(saldoAnterior_val, opcoes.segundos_composicao, resultado["situacao"]):
+                    f.write(f"\n{linha}" if linhas else linha)
+                    linhas += 1
+                    notas += linha.startswith("NF ")
+            registro["linhas_entrada"] = linhas
+            registro["bytes_gravados"] = tamanho_arquivo(caminho_saida_txt)
+        print(f"Relatório de '{os.path.basename(caminho_entrada)}' salvo em: {caminho_saida_txt}")
+        resultado["relatorio"] = caminho_saida_txt
+        resultado["notas"] = notas
+        resultado["saldo_anterior"] = fmt_br(saldoAnterior_val)
+
+        with medidor.etapa_acumulada("lancamentos", formato=opcoes.formato_lancamentos) as registro:
+            caminho_saida_lancamentos = lancamentos.fechar()
+            registro["bytes_gravados"] = tamanho_arquivo(caminho_saida_lancamentos)
+        print(f"Dados processados de '{os.path.basename(caminho_entrada)}' salvos em: {caminho_saida_lancamentos}")
+        resultado["lancamentos"] = caminho_saida_lancamentos
+
+        resultado["status"] = "ok"
+        return resultado
+    except BaseException:
+        lancamentos.descartar()
+        if colunar:
+            colunar.descartar()
+        raise
+    finally:
+        acumulador.fechar()
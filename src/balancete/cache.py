@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from .processamento import VERSAO_PROCESSAMENTO
+
+
+# Limite padrão do tamanho total do cache em disco
+LIMITE_CACHE_PADRAO = 512 * 1024 * 1024
+# Chaves do resultado que apontam para arquivos gerados e guardados no cache
+ARQUIVOS_RESULTADO = ("relatorio", "lancamentos")
+
+
+def pasta_padrao_cache():
+    """Pasta padrão do cache de resultados, dentro da pasta de cache do usuário."""
+    if os.name == "nt":
+        base = os.getenv("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "balancete", "resultados")
+
+def hash_arquivo(caminho, tamanho_bloco=1024 * 1024):
+    """Calcula o SHA-256 do conteúdo do arquivo, lendo em blocos."""
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+def chave_conteudo(caminho, *partes):
+    """
+    Chave de um arquivo pelo conteúdo, combinada com as partes informadas
+    (versão, opções...). None se o arquivo não puder ser lido.
+    """
+    try:
+        conteudo = hash_arquivo(caminho)
+    except OSError:
+        return None
+    return hashlib.sha256("|".join([conteudo, *map(str, partes)]).encode("utf-8")).hexdigest()
+
+
+class CacheResultados:
+    """
+    Cache persistente dos resultados de processar_planilha_xlsx.
+
+    A chave é o hash do conteúdo do arquivo de entrada somado à versão da
+    lógica de processamento (VERSAO_PROCESSAMENTO) e às opções usadas; o nome
+    do arquivo não entra na chave. Cada entrada guarda o resultado e cópias
+    do relatório .txt e da planilha de lançamentos, que são copiadas de volta
+    quando o mesmo conteúdo aparece de novo.
+
+    O tamanho total é limitado: ao passar do limite, as entradas usadas há
+    mais tempo são removidas.
+    """
+
+    def __init__(self, pasta=None, limite_bytes=LIMITE_CACHE_PADRAO):
+        self.pasta = pasta or pasta_padrao_cache()
+        self.limite_bytes = limite_bytes
+        os.makedirs(self.pasta, exist_ok=True)
+
+    def chave(self, caminho_entrada, opcoes=None):
+        """Chave do arquivo: conteúdo + versão do processamento + opções. None se o arquivo não puder ser lido."""
+        return chave_conteudo(caminho_entrada, VERSAO_PROCESSAMENTO, repr(opcoes))
+
+    def restaurar(self, chave, caminho_entrada, pasta_saida, pasta_lancamentos=None, nome_base=None):
+        """
+        Copia os arquivos guardados para as pastas de saída, com o nome do arquivo
+        atual (ou nome_base, ver lote.nomes_saida).
+        Retorna o resultado guardado (com os novos caminhos) ou None se não houver entrada.
+        """
+        if chave is None:
+            return None
+        pasta_entrada_cache = os.path.join(self.pasta, chave)
+        try:
+            with open(os.path.join(pasta_entrada_cache, "resultado.json"), encoding="utf-8") as f:
+                guardado = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        nome_base = nome_base or os.path.splitext(os.path.basename(caminho_entrada))[0]
+        destinos = {"relatorio": pasta_saida, "lancamentos": pasta_lancamentos or os.path.dirname(caminho_entrada)}
+        resultado = guardado["resultado"]
+        try:
+            for papel, sufixo in guardado["arquivos"].items():
+                destino = os.path.join(destinos[papel], f"{nome_base}{sufixo}")
+                shutil.copyfile(os.path.join(pasta_entrada_cache, papel + os.path.splitext(sufixo)[1]), destino)
+                resultado[papel] = destino
+        except OSError:
+            return None
+
+        # Marca a entrada como usada agora (base da remoção das menos usadas)
+        os.utime(pasta_entrada_cache)
+        resultado["arquivo"] = os.path.basename(caminho_entrada)
+        resultado["cache"] = True
+        print(f"Resultado de '{os.path.basename(caminho_entrada)}' reaproveitado do cache.")
+        return resultado
+
+    def guardar(self, chave, caminho_entrada, resultado, nome_base=None):
+        """
+        Guarda o resultado e os arquivos gerados; só resultados 'ok' e 'aviso' são guardados.
+        nome_base: o nome com que os arquivos foram gerados (padrão: o do arquivo de entrada).
+        """
+        if chave is None or resultado["status"] not in ("ok", "aviso"):
+            return
+
+        nome_base = nome_base or os.path.splitext(os.path.basename(caminho_entrada))[0]
+        temporaria = tempfile.mkdtemp(prefix=".nova_", dir=self.pasta)
+        try:
+            arquivos = {}
+            for papel in ARQUIVOS_RESULTADO:
+                if resultado.get(papel):
+                    sufixo = os.path.basename(resultado[papel])[len(nome_base):]
+                    shutil.copyfile(resultado[papel], os.path.join(temporaria, papel + os.path.splitext(sufixo)[1]))
+                    arquivos[papel] = sufixo
+            guardado = {"resultado": {k: v for k, v in resultado.items() if k != "cache"}, "arquivos": arquivos}
+            with open(os.path.join(temporaria, "resultado.json"), "w", encoding="utf-8") as f:
+                json.dump(guardado, f, ensure_ascii=False)
+
+            destino = os.path.join(self.pasta, chave)
+            shutil.rmtree(destino, ignore_errors=True)
+            os.replace(temporaria, destino)
+        except OSError as e:
+            print(f"Aviso: não foi possível guardar '{os.path.basename(caminho_entrada)}' no cache: {e}")
+            shutil.rmtree(temporaria, ignore_errors=True)
+
+    def entradas(self):
+        """Lista (ultimo_uso, tamanho, caminho) de cada entrada do cache."""
+        entradas = []
+        for nome in os.listdir(self.pasta):
+            caminho = os.path.join(self.pasta, nome)
+            if nome.startswith(".") or not os.path.isdir(caminho):
+                continue
+            tamanho = sum(e.stat().st_size for e in os.scandir(caminho) if e.is_file())
+            entradas.append((os.path.getmtime(caminho), tamanho, caminho))
+        return entradas
+
+    def limitar_tamanho(self):
+        """
+        Remove as entradas usadas há mais tempo até o cache caber no limite.
+        Chamado uma vez ao final de cada lote, não a cada arquivo guardado.
+        """
+        entradas = sorted(self.entradas())
+        total = sum(tamanho for _, tamanho, _ in entradas)
+        for _, tamanho, caminho in entradas:
+            if total <= self.limite_bytes:
+                break
+            shutil.rmtree(caminho, ignore_errors=True)
+            total -= tamanho
+
+    def invalidar(self):
+        """Remove todas as entradas do cache."""
+        for _, _, caminho in self.entradas():
+            shutil.rmtree(caminho, ignore_errors=True)
+        print(f"Cache de resultados limpo: {self.pasta}")
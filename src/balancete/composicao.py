@@ -0,0 +1,194 @@
+import time
+
+import numpy as np
+
+
+# Tempo máximo, em segundos, da busca das combinações que explicam a diferença do saldo anterior.
+# Desligada por padrão: cada arquivo com diferença pode gastar o prazo inteiro, o que num lote grande
+# soma minutos; --segundos-composicao a liga
+SEGUNDOS_COMPOSICAO = 0.0
+# Combinações listadas no relatório
+COMBINACOES_RELATORIO = 5
+# Até esta quantidade de notas candidatas a busca é exata, por meio a meio (2 x 2^20 somas)
+LIMITE_MEIO_A_MEIO = 40
+# Acima desta quantidade de candidatas não há busca com poda: só combinações de um e dois itens
+LIMITE_RAMIFICAR = 400
+# Combinações guardadas pela busca com poda antes de escolher as menores
+LIMITE_SOLUCOES = 200
+# Buscas de explicar_diferenca: notas sem aquisição registrada, todas as notas
+# com saldo (as duas somando a diferença) e notas que somam o saldo anterior
+ALVOS_COMPOSICAO = ("sem_aquisicao", "com_saldo", "saldo_anterior")
+# Nós visitados entre duas verificações do prazo na busca com poda
+NOS_POR_VERIFICACAO = 4096
+
+
+def somas_dos_subconjuntos(valores):
+    """
+    Soma e quantidade de itens de todos os subconjuntos dos valores: o
+    subconjunto de índice m tem os itens i cujo bit i está ligado em m.
+    """
+    somas = np.zeros(1, dtype=np.int64)
+    tamanhos = np.zeros(1, dtype=np.int8)
+    for valor in valores:
+        somas = np.concatenate((somas, somas + valor))
+        tamanhos = np.concatenate((tamanhos, tamanhos + 1))
+    return somas, tamanhos
+
+def itens_da_mascara(mascara, deslocamento=0):
+    """Índices dos bits ligados na máscara, somados ao deslocamento."""
+    mascara = int(mascara)
+    return [deslocamento + i for i in range(mascara.bit_length()) if mascara >> i & 1]
+
+def meio_a_meio(valores, alvo, quantidade):
+    """
+    Busca exata: as somas de todos os subconjuntos de cada metade são
+    calculadas em arrays e, para cada soma da primeira metade, a que falta
+    para o alvo é procurada (busca binária) na segunda, ordenada por soma e
+    quantidade de itens. Devolve as `quantidade` combinações com menos itens.
+    """
+    metade = len(valores) // 2
+    somas_a, tamanhos_a = somas_dos_subconjuntos(valores[:metade])
+    somas_b, tamanhos_b = somas_dos_subconjuntos(valores[metade:])
+    # Dentro de cada soma, os subconjuntos menores primeiro
+    ordem = np.lexsort((tamanhos_b, somas_b))
+    somas_b, tamanhos_b = somas_b[ordem], tamanhos_b[ordem]
+
+    faltam = alvo - somas_a
+    inicio = np.searchsorted(somas_b, faltam, side="left")
+    fim = np.searchsorted(somas_b, faltam, side="right")
+    encontrados = np.flatnonzero(fim > inicio)
+    if not len(encontrados):
+        return []
+
+    # O melhor par de cada subconjunto da primeira metade usa o menor da segunda;
+    # as `quantidade` melhores combinações estão entre os `quantidade` melhores
+    # da primeira metade, cada um com até `quantidade` da segunda
+    melhor = tamanhos_a[encontrados].astype(np.int64) + tamanhos_b[inicio[encontrados]]
+    escolhidos = encontrados[np.lexsort((encontrados, melhor))[:quantidade]]
+    pares = []
+    for a in escolhidos.tolist():
+        for posicao in range(inicio[a], min(fim[a], inicio[a] + quantidade)):
+            pares.append((int(tamanhos_a[a]) + int(tamanhos_b[posicao]), a, int(ordem[posicao])))
+
+    combinacoes = []
+    for _, a, b in sorted(pares):
+        combinacao = itens_da_mascara(a) + itens_da_mascara(b, metade)
+        if combinacao:
+            combinacoes.append(combinacao)
+    return combinacoes[:quantidade]
+
+def pares(valores, alvo):
+    """Combinações de um e de dois itens que somam o alvo, por dicionário (uma passada)."""
+    combinacoes = [[i] for i, valor in enumerate(valores) if valor == alvo]
+    vistos = {}
+    for i, valor in enumerate(valores):
+        j = vistos.get(alvo - valor)
+        if j is not None:
+            combinacoes.append([j, i])
+        vistos.setdefault(valor, i)
+    return combinacoes
+
+def ramificar(valores, alvo, prazo):
+    """
+    Busca com poda para muitas notas: percorre as escolhas (incluir ou não
+    cada nota, das maiores para as menores em valor absoluto) e descarta o
+    ramo quando o que falta para o alvo já não cabe entre a soma dos valores
+    negativos e a dos positivos que restam. Para no prazo ou em LIMITE_SOLUCOES
+    combinações. Devolve (combinacoes, completa).
+    """
+    ordem = sorted(range(len(valores)), key=lambda i: (-abs(valores[i]), i))
+    ordenados = [valores[i] for i in ordem]
+    # Soma dos positivos e dos negativos do item i em diante
+    positivos = [0] * (len(ordenados) + 1)
+    negativos = [0] * (len(ordenados) + 1)
+    for i in range(len(ordenados) - 1, -1, -1):
+        positivos[i] = positivos[i + 1] + max(ordenados[i], 0)
+        negativos[i] = negativos[i + 1] + min(ordenados[i], 0)
+
+    combinacoes = []
+    # Um único caminho com os itens escolhidos: cada nó da pilha guarda o
+    # tamanho do caminho do pai e o item que acrescenta (-1 quando não inclui)
+    caminho = []
+    pilha = [(0, alvo, 0, -1)]
+    nos = 0
+    while pilha:
+        nos += 1
+        if nos % NOS_POR_VERIFICACAO == 0 and time.perf_counter() > prazo:
+            return combinacoes, False
+        i, falta, tamanho, item = pilha.pop()
+        del caminho[tamanho:]
+        if item >= 0:
+            caminho.append(item)
+        # Só no nó que acabou de incluir um item: sem ele, é o mesmo conjunto do pai
+        if falta == 0 and item >= 0:
+            combinacoes.append(sorted(ordem[j] for j in caminho))
+            if len(combinacoes) >= LIMITE_SOLUCOES:
+                return combinacoes, False
+        # Mesmo com a soma exata, itens que se anulam ainda formam outras combinações
+        if i == len(ordenados) or not negativos[i] <= falta <= positivos[i]:
+            continue
+        # Sem o item i por último na pilha: a inclusão é explorada primeiro
+        pilha.append((i + 1, falta, len(caminho), -1))
+        pilha.append((i + 1, falta - ordenados[i], len(caminho), i))
+    return combinacoes, True
+
+def buscar_combinacoes(valores, alvo, prazo, quantidade=COMBINACOES_RELATORIO):
+    """
+    Combinações de valores (centavos inteiros, com sinal) que somam exatamente
+    o alvo, as com menos itens primeiro. Até LIMITE_MEIO_A_MEIO valores a busca
+    é exata; acima disso, as de um e dois itens são procuradas por dicionário e,
+    até LIMITE_RAMIFICAR valores, as demais pela busca com poda, até o prazo
+    (time.perf_counter()).
+    Retorna (combinacoes, completa): listas de índices em `valores` e se todas
+    as possibilidades foram examinadas.
+    """
+    valores = [int(valor) for valor in valores]
+    if not valores:
+        return [], True
+    if len(valores) <= LIMITE_MEIO_A_MEIO:
+        return meio_a_meio(valores, alvo, quantidade), True
+
+    if len(valores) > LIMITE_RAMIFICAR:
+        encontradas, completa = [], False
+    else:
+        encontradas, completa = ramificar(valores, alvo, prazo)
+    combinacoes = []
+    for combinacao in pares(valores, alvo) + encontradas:
+        if combinacao not in combinacoes:
+            combinacoes.append(combinacao)
+    combinacoes.sort(key=lambda combinacao: (len(combinacao), combinacao))
+    return combinacoes[:quantidade], completa
+
+def explicar_diferenca(notas, diferenca, limite_segundos=SEGUNDOS_COMPOSICAO, saldo_anterior=None):
+    """
+    Procura as notas que explicam a diferença entre o débito sem aquisição
+    registrada e o saldo anterior (diferenca, em centavos).
+    notas: (nf, credito, debito) em centavos, com as notas movimentadas.
+    Primeiro só entre as notas sem aquisição registrada (débitos que não seriam
+    do saldo anterior); sem combinação exata, entre todas as notas com saldo
+    (débito - crédito), o que inclui os créditos em aberto com sinal negativo.
+    Sem combinação para a diferença e com saldo_anterior (centavos) positivo,
+    procura as notas sem aquisição registrada que somam o próprio saldo
+    anterior: as que sobram são a diferença.
+    Retorna (combinacoes, completa, alvo): cada combinação é uma lista de
+    (nf, valor em centavos); alvo é um de ALVOS_COMPOSICAO, a busca que achou
+    as combinações (a última tentada, se nenhuma achou).
+    """
+    prazo = time.perf_counter() + limite_segundos
+    sem_aquisicao = [(nf, debito) for nf, credito, debito in notas if credito == 0 and debito > 0]
+    alvo = "sem_aquisicao"
+    candidatas = sem_aquisicao
+    combinacoes, completa = [], True
+    if diferenca > 0:
+        combinacoes, completa = buscar_combinacoes([valor for _, valor in candidatas], diferenca, prazo)
+    if not combinacoes:
+        alvo = "com_saldo"
+        candidatas = [(nf, debito - credito) for nf, credito, debito in notas if debito != credito]
+        combinacoes, completa_ampliada = buscar_combinacoes([valor for _, valor in candidatas], diferenca, prazo)
+        completa = completa and completa_ampliada
+    if not combinacoes and saldo_anterior and saldo_anterior > 0:
+        alvo = "saldo_anterior"
+        candidatas = sem_aquisicao
+        combinacoes, completa_saldo = buscar_combinacoes([valor for _, valor in candidatas], saldo_anterior, prazo)
+        completa = completa and completa_saldo
+    return [[candidatas[i] for i in combinacao] for combinacao in combinacoes], completa, alvo
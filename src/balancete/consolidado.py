@@ -0,0 +1,102 @@
+import json
+import os
+
+import pandas as pd
+
+from .processamento import SITUACOES_NOTA, somar_situacoes
+from .saida import EscritorCsv, gravar_xlsx
+
+
+# Formatos aceitos para o consolidado do lote (extensão do arquivo informado)
+FORMATOS_CONSOLIDADO = ("xlsx", "csv", "json")
+# Valor da coluna "arquivo" na linha de totais
+LINHA_TOTAL = "TOTAL"
+# Nome do consolidado gravado pela janela na pasta de saída
+NOME_CONSOLIDADO = "consolidado.xlsx"
+
+
+def formato_consolidado(caminho):
+    """Formato do consolidado pela extensão do arquivo; None se não for um dos FORMATOS_CONSOLIDADO."""
+    formato = os.path.splitext(caminho)[1].lower().lstrip(".")
+    return formato if formato in FORMATOS_CONSOLIDADO else None
+
+def reais(centavos):
+    return round(centavos / 100, 2)
+
+def linha_consolidado(arquivo, status, situacao, invalidos=None, relatorio=None, mensagem=None):
+    """Uma linha do consolidado: notas, crédito e débito por situação da nota e a verificação do saldo anterior."""
+    linha = {"arquivo": arquivo, "status": status}
+    linha["notas"] = sum(somas["notas"] for somas in situacao["notas"].values()) if situacao else None
+    for nome in SITUACOES_NOTA:
+        somas = situacao["notas"][nome] if situacao else None
+        linha[f"notas_{nome}"] = somas["notas"] if somas else None
+        linha[f"credito_{nome}"] = reais(somas["credito"]) if somas else None
+        linha[f"debito_{nome}"] = reais(somas["debito"]) if somas else None
+    linha["saldo_anterior"] = reais(situacao["saldo_anterior"]) if situacao else None
+    linha["saldo_debito_sem_aquisicao"] = reais(situacao["debito_sem_aquisicao"]) if situacao else None
+    linha["saldo_diferenca"] = reais(situacao["diferenca"]) if situacao else None
+    linha["saldo_situacao"] = situacao["saldo"] if situacao else None
+    # Valores em texto não reconhecidos, que entraram como 0 (ver converter_valores_br)
+    linha["valores_invalidos"] = sum(invalidos.values()) if invalidos is not None else None
+    linha["relatorio"] = relatorio
+    linha["mensagem"] = mensagem
+    return linha
+
+def linhas_consolidado(resultados):
+    """
+    Linhas do consolidado do lote, a partir dos resultados em memória (resultado["situacao"]):
+    uma por arquivo e, no fim, a linha TOTAL com as somas de todos os arquivos
+    processados. Arquivos com erro entram só com o status e a mensagem.
+    """
+    linhas = []
+    situacoes = []
+    invalidos = {}
+    for resultado in resultados:
+        situacao = resultado.get("situacao")
+        if situacao:
+            situacoes.append(situacao)
+        for coluna, quantidade in (resultado.get("valores_invalidos") or {}).items():
+            invalidos[coluna] = invalidos.get(coluna, 0) + quantidade
+        linhas.append(linha_consolidado(resultado["arquivo"], resultado["status"], situacao,
+                                        resultado.get("valores_invalidos"), resultado.get("relatorio"),
+                                        resultado.get("mensagem")))
+    total = somar_situacoes(situacoes) if situacoes else None
+    linhas.append(linha_consolidado(LINHA_TOTAL, f"{len(situacoes)} de {len(resultados)} arquivo(s)", total,
+                                    invalidos if situacoes else None))
+    return linhas
+
+def montar_consolidado(resultados):
+    """Consolidado do lote em DataFrame; dtype object para que as contagens vazias não virem float."""
+    return pd.DataFrame(linhas_consolidado(resultados), dtype=object)
+
+def gravar_consolidado(resultados, caminho):
+    """
+    Grava o consolidado do lote num único arquivo, no formato da extensão
+    (FORMATOS_CONSOLIDADO). Como os demais arquivos gerados, é gravado com
+    outro nome e renomeado no fim. Retorna o caminho.
+    """
+    formato = formato_consolidado(caminho)
+    if formato is None:
+        raise ValueError(f"Formato de consolidado desconhecido: '{caminho}' (use .xlsx, .csv ou .json)")
+
+    if formato == "xlsx":
+        gravar_xlsx(montar_consolidado(resultados), caminho)
+    elif formato == "csv":
+        escritor = EscritorCsv(caminho)
+        try:
+            escritor.gravar(montar_consolidado(resultados))
+        except BaseException:
+            escritor.descartar()
+            raise
+        escritor.fechar()
+    else:
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        try:
+            with open(temporario, "w", encoding="utf-8") as f:
+                json.dump(linhas_consolidado(resultados), f, ensure_ascii=False, indent=2)
+            os.replace(temporario, caminho)
+        finally:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+    print(f"Consolidado do lote salvo em: {caminho}")
+    return caminho
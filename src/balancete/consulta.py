@@ -0,0 +1,65 @@
+"""
+Consulta do índice de notas fiscais entre períodos (ver indice.IndiceNotas).
+
+Cada planilha processada com o índice ativo grava os totais de crédito
+(aquisição) e débito (pagamento) de cada nota, por cliente e período. A
+consulta junta todos os períodos: uma nota adquirida em janeiro e paga em
+março, que aparece em aberto nos dois relatórios mensais, sai conciliada
+aqui, sem reler nenhuma planilha.
+
+Uso:
+    python -m balancete.consulta notas.db                    # notas em aberto em algum período, conciliadas entre períodos
+    python -m balancete.consulta notas.db --pendentes        # só as que continuam em aberto somando todos os períodos
+    python -m balancete.consulta notas.db --nf 1234 --cliente CLIENTE_X
+    python -m balancete.consulta notas.db --conta "FORNECEDORES"   # uma conta (planilhas processadas com --por-conta)
+"""
+import argparse
+import os
+import sys
+
+from .indice import IndiceNotas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m balancete.consulta",
+                                     description="Consulta o índice de notas fiscais entre períodos.")
+    parser.add_argument("banco", help="arquivo SQLite do índice (gerado com --indice-notas)")
+    parser.add_argument("--cliente", help="restringe a consulta a um cliente")
+    parser.add_argument("--conta", help="restringe a consulta a uma conta (planilhas processadas com --por-conta)")
+    parser.add_argument("--nf", metavar="NUMERO", help="consulta uma nota fiscal em todos os períodos")
+    parser.add_argument("--pendentes", action="store_true",
+                        help="só as notas que continuam em aberto somando todos os períodos")
+    parser.add_argument("--periodos", action="store_true", help="lista os períodos registrados")
+    parser.add_argument("--saida", metavar="ARQUIVO", help="grava o relatório nesse arquivo .txt")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.banco):
+        print(f"Erro: índice não encontrado: '{args.banco}'.", file=sys.stderr)
+        return 2
+
+    try:
+        indice = IndiceNotas(args.banco)
+    except ValueError as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 2
+    try:
+        if args.periodos:
+            linhas = [f"{p['cliente']} | {p['periodo']} | {p['inicio']} a {p['fim']} | {p['arquivo']}"
+                      for p in indice.periodos(args.cliente)]
+        else:
+            linhas = indice.relatorio(args.cliente, args.nf, args.pendentes, args.conta)
+    finally:
+        indice.fechar()
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write("\n".join(linhas))
+        print(f"Relatório salvo em: {args.saida} ({len(linhas)} linha(s))")
+    else:
+        for linha in linhas:
+            print(linha)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
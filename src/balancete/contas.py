@@ -0,0 +1,268 @@
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from decimal import Decimal
+
+import pandas as pd
+
+from .leitura import iterar_abas
+from .metricas import tamanho_arquivo
+from .processamento import (
+    COLUNAS_LANCAMENTOS, PlanilhaInvalida, aviso_colunar, aviso_valores_invalidos, fmt_br, gerar_relatorio, linha_e_cabecalho, linha_tem_saldo_anterior,
+    localizar_colunas, montar_bloco, normalizar_lancamentos, nova_situacao, somar_situacoes, totais_por_nota,
+    valor_saldo_anterior,
+)
+from .regras import ClassificadorHistorico
+from .saida import gravar_colunar, gravar_lancamentos
+
+
+# Contas com ao menos estas linhas são conciliadas num processo à parte (OpcoesProcessamento.processos_contas)
+LINHAS_CONTA_PARALELO = 50000
+
+
+def titulo_da_conta(celulas):
+    """Texto da linha que identifica a conta ('Conta: 2.1.1.01 - FORNECEDORES'); None nas demais linhas."""
+    primeira = next((celula for celula in celulas if celula is not None), None)
+    if not isinstance(primeira, str) or not primeira.strip().upper().startswith("CONTA"):
+        return None
+    return " ".join(str(celula).strip() for celula in celulas if celula is not None and str(celula).strip())
+
+
+class LeitorContas:
+    """
+    Percorre todas as abas do arquivo numa única leitura (iterar_abas) e separa
+    os blocos de cada conta contábil, como o ERP exporta: cada conta com seu
+    cabeçalho e sua linha de SALDO ANTERIOR.
+
+    Uma conta começa na primeira linha de cabeçalho de cada aba, a cada
+    cabeçalho precedido de uma linha 'Conta ...' com outro nome (contas sem
+    linha de SALDO ANTERIOR) e a cada nova linha de SALDO ANTERIOR depois da
+    primeira. Os demais cabeçalhos repetidos (quebra de página) só localizam
+    as colunas de novo, pois o layout pode mudar de uma conta para outra. O
+    nome da conta é a última linha 'Conta ...' antes do bloco ou, sem ela,
+    'Conta N'.
+
+    contas() gera, uma conta por vez, {"conta", "aba", "saldo_anterior",
+    "lancamentos" (DataFrame com COLUNAS_LANCAMENTOS ainda brutas)}.
+    """
+
+    def __init__(self, caminho_entrada, processos_pdf=1):
+        self.caminho_entrada = caminho_entrada
+        self.processos_pdf = processos_pdf
+        self.quantidade = 0
+
+    def nova_conta(self, titulo, aba):
+        self.quantidade += 1
+        return {"conta": titulo or f"Conta {self.quantidade}", "aba": aba, "saldo_anterior": Decimal("0.00"),
+                "achou_saldo": False, "col_index_saldo": None, "colunas": [[] for _ in COLUNAS_LANCAMENTOS]}
+
+    def fechar_conta(self, conta):
+        if conta["col_index_saldo"] is not None and not conta["achou_saldo"]:
+            print(f"Aviso: 'SALDO ANTERIOR' não encontrado na conta '{conta['conta']}'.")
+        return {"conta": conta["conta"], "aba": conta["aba"], "saldo_anterior": conta["saldo_anterior"],
+                "lancamentos": montar_bloco(conta["colunas"])}
+
+    def contas(self):
+        for aba, linhas in iterar_abas(self.caminho_entrada, self.processos_pdf):
+            conta = None
+            indices = None
+            titulo = None
+            for celulas in linhas:
+                if linha_e_cabecalho(celulas):
+                    indices = localizar_colunas(celulas)
+                    if conta is not None and titulo and titulo != conta["conta"]:
+                        # Título de outra conta logo antes do cabeçalho: a conta anterior terminou
+                        yield self.fechar_conta(conta)
+                        conta = None
+                    if conta is None:
+                        conta = self.nova_conta(titulo, aba)
+                        titulo = None
+                    conta["col_index_saldo"] = indices[4]
+                    # A busca pelo SALDO ANTERIOR começa na própria linha de cabeçalho
+                    if indices[4] is not None and not conta["achou_saldo"] and linha_tem_saldo_anterior(celulas):
+                        conta["achou_saldo"] = True
+                        conta["saldo_anterior"] = valor_saldo_anterior(celulas[indices[4]])
+                    continue
+                if indices is None:
+                    titulo = titulo_da_conta(celulas) or titulo
+                    continue
+
+                col_index_saldo = indices[4]
+                if col_index_saldo is not None and linha_tem_saldo_anterior(celulas):
+                    if conta["achou_saldo"]:
+                        yield self.fechar_conta(conta)
+                        conta = self.nova_conta(titulo, aba)
+                        conta["col_index_saldo"] = col_index_saldo
+                        titulo = None
+                    conta["achou_saldo"] = True
+                    conta["saldo_anterior"] = valor_saldo_anterior(
+                        celulas[col_index_saldo] if col_index_saldo < len(celulas) else None)
+                else:
+                    titulo = titulo_da_conta(celulas) or titulo
+                for coluna, idx in zip(conta["colunas"], indices):
+                    coluna.append(celulas[idx] if idx is not None and idx < len(celulas) else None)
+            if conta is not None:
+                yield self.fechar_conta(conta)
+
+        if not self.quantidade:
+            raise PlanilhaInvalida("Linha de cabeçalho não encontrada")
+
+
+def conciliar_conta(lancamentos, saldoAnterior_val, regras, segundos_composicao):
+    """
+    Normaliza e concilia os lançamentos de uma conta (executa nos processos paralelos).
+    Retorna (df_final, linhas do relatório, linhas classificadas por regra, situação,
+    valores não reconhecidos por coluna).
+    """
+    invalidos = {}
+    df_final, contagem = normalizar_lancamentos(lancamentos, ClassificadorHistorico(regras), invalidos)
+    situacao = nova_situacao()
+    linhas = gerar_relatorio(df_final, saldoAnterior_val, segundos_composicao, situacao)
+    return df_final, linhas, contagem, situacao, invalidos
+
+def totais_por_conta(contas, partes):
+    """
+    Totais por nota de cada conta para o índice entre períodos (como
+    totais_por_nota, mas sem juntar a mesma NF de contas diferentes):
+    {"inicio", "fim", "contas": {conta: [[numero, credito, debito], ...]}}.
+    Blocos com o mesmo nome de conta (a conta continuada em outra aba) são
+    somados. None se nenhuma conta tiver lançamentos com nota.
+    """
+    inicio = fim = None
+    por_conta = {}
+    for conta, df_conta in zip(contas, partes):
+        totais = totais_por_nota(df_conta)
+        if not totais:
+            continue
+        inicio = min(inicio or totais["inicio"], totais["inicio"])
+        fim = max(fim or totais["fim"], totais["fim"])
+        notas = por_conta.setdefault(conta["conta"], {})
+        for numero, credito, debito in totais["notas"]:
+            soma = notas.setdefault(numero, [0, 0])
+            soma[0] += credito
+            soma[1] += debito
+    if inicio is None:
+        return None
+    return {"inicio": inicio, "fim": fim,
+            "contas": {conta: [[numero, credito, debito] for numero, (credito, debito) in notas.items()]
+                       for conta, notas in por_conta.items()}}
+
+def titulo_relatorio(conta):
+    """Linha que abre a seção da conta no relatório."""
+    aba = f" | Aba {conta['aba']}" if conta["aba"] else ""
+    return f"=== {conta['conta']}{aba} ==="
+
+def executar_etapas_contas(caminho_entrada, pasta_saida_relatorios, pasta_lancamentos, opcoes, caminho_colunar,
+                           nome_base, resultado, medidor):
+    """
+    Etapas de processar_planilha_xlsx com opcoes.por_conta: as contas de todas
+    as abas são separadas numa única leitura (LeitorContas) e cada uma é
+    conciliada à parte, com seu próprio saldo anterior. Com
+    opcoes.processos_contas > 1, as contas grandes (LINHAS_CONTA_PARALELO) vão
+    para processos paralelos enquanto a leitura continua.
+    O relatório tem uma seção por conta; os lançamentos de todas as contas vão
+    para a mesma planilha, com a coluna Conta. O detalhe de cada conta fica em
+    resultado["contas"]; o saldo anterior de cada uma vai também para a base
+    colunar e as notas entram no índice por conta (totais_por_conta).
+    resultado["saldo_anterior"] é a soma das contas.
+    """
+    leitor = LeitorContas(caminho_entrada, opcoes.processos_pdf)
+    contas = leitor.contas()
+    executor = ProcessPoolExecutor(max_workers=opcoes.processos_contas) if opcoes.processos_contas > 1 else None
+    lidas = []
+    try:
+        while True:
+            with medidor.etapa_acumulada("leitura", leitura="contas",
+                                         bytes_lidos=tamanho_arquivo(caminho_entrada)) as registro:
+                conta = next(contas, None)
+                if conta is None:
+                    break
+                registro["linhas_saida"] = len(conta["lancamentos"])
+
+            lancamentos = conta.pop("lancamentos")
+            argumentos = (lancamentos, conta["saldo_anterior"], opcoes.regras, opcoes.segundos_composicao)
+            if executor is not None and len(lancamentos) >= LINHAS_CONTA_PARALELO:
+                conta["conciliacao"] = executor.submit(conciliar_conta, *argumentos)
+            else:
+                with medidor.etapa_acumulada("conciliacao") as registro:
+                    registro["linhas_entrada"] = len(lancamentos)
+                    conta["conciliacao"] = conciliar_conta(*argumentos)
+            lidas.append(conta)
+
+        with medidor.etapa("conciliacao_paralela", contas=len(lidas)):
+            for conta in lidas:
+                if isinstance(conta["conciliacao"], Future):
+                    conta["conciliacao"] = conta["conciliacao"].result()
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    relatorio = []
+    lancamentos = []
+    contagem = {}
+    resultado["contas"] = []
+    resultado["valores_invalidos"] = {}
+    for conta in lidas:
+        df_final, linhas, contagem_conta, situacao, invalidos = conta.pop("conciliacao")
+        for nome, quantidade in contagem_conta.items():
+            contagem[nome] = contagem.get(nome, 0) + quantidade
+        for coluna, quantidade in invalidos.items():
+            resultado["valores_invalidos"][coluna] = resultado["valores_invalidos"].get(coluna, 0) + quantidade
+        df_final.insert(0, 'Conta', conta["conta"])
+        lancamentos.append(df_final)
+        if relatorio:
+            relatorio.append("")
+        relatorio.append(titulo_relatorio(conta))
+        relatorio.extend(linhas)
+        resultado["contas"].append({
+            "conta": conta["conta"],
+            "aba": conta["aba"],
+            "notas": sum(1 for linha in linhas if linha.startswith("NF ")),
+            "saldo_anterior": fmt_br(conta["saldo_anterior"]),
+            "saldo_ok": situacao["saldo"] != "diferenca",
+            "situacao": situacao,
+        })
+    df_final = pd.concat(lancamentos, ignore_index=True)
+    saldoAnterior_val = sum((conta["saldo_anterior"] for conta in lidas), Decimal("0.00"))
+    resultado["regras"] = contagem
+    resultado["situacao"] = somar_situacoes([conta["situacao"] for conta in resultado["contas"]])
+    resultado["notas"] = sum(conta["notas"] for conta in resultado["contas"])
+    resultado["saldo_anterior"] = fmt_br(saldoAnterior_val)
+    aviso_valores_invalidos(caminho_entrada, resultado["valores_invalidos"])
+    print(f"{len(lidas)} conta(s) em '{os.path.basename(caminho_entrada)}'.")
+
+    if caminho_colunar:
+        # Saldo exato e linhas de cada conta, na ordem em que estão em df_final (ver ArmazemLancamentos.reconciliar)
+        contas_colunar = [{"conta": conta["conta"], "aba": conta["aba"], "saldo_anterior": str(conta["saldo_anterior"]),
+                           "linhas": len(parte)} for conta, parte in zip(lidas, lancamentos)]
+        try:
+            with medidor.etapa("colunar", linhas_entrada=len(df_final)) as registro:
+                gravar_colunar(df_final, saldoAnterior_val, caminho_colunar, contas_colunar)
+                registro["bytes_gravados"] = tamanho_arquivo(caminho_colunar)
+            resultado["colunar"] = caminho_colunar
+        except Exception as e:
+            aviso_colunar(caminho_entrada, e)
+    if opcoes.indexar_notas:
+        with medidor.etapa("indice_notas", linhas_entrada=len(df_final)) as registro:
+            resultado["indice_notas"] = totais_por_conta(lidas, lancamentos)
+            por_conta = resultado["indice_notas"]["contas"] if resultado["indice_notas"] else {}
+            registro["linhas_saida"] = sum(len(notas) for notas in por_conta.values())
+
+    # O relatório .txt será salvo na pasta de saída escolhida
+    caminho_saida_txt = os.path.join(pasta_saida_relatorios, f"{nome_base}_relatorio.txt")
+    with medidor.etapa("relatorio", linhas_entrada=len(relatorio)) as registro:
+        with open(caminho_saida_txt, "w", encoding="utf-8") as f:
+            f.write("\n".join(relatorio))
+        registro["bytes_gravados"] = tamanho_arquivo(caminho_saida_txt)
+    print(f"Relatório de '{os.path.basename(caminho_entrada)}' salvo em: {caminho_saida_txt}")
+    resultado["relatorio"] = caminho_saida_txt
+
+    # A planilha final será salva, por padrão, na mesma pasta do arquivo de entrada
+    pasta_lancamentos = pasta_lancamentos or os.path.dirname(caminho_entrada)
+    with medidor.etapa("lancamentos", formato=opcoes.formato_lancamentos, linhas_entrada=len(df_final)) as registro:
+        caminho_saida_lancamentos = gravar_lancamentos(df_final, pasta_lancamentos, nome_base, opcoes.formato_lancamentos)
+        registro["bytes_gravados"] = tamanho_arquivo(caminho_saida_lancamentos)
+    print(f"Dados processados de '{os.path.basename(caminho_entrada)}' salvos em: {caminho_saida_lancamentos}")
+    resultado["lancamentos"] = caminho_saida_lancamentos
+
+    resultado["status"] = "ok"
+    return resultado
@@ -0,0 +1,177 @@
+import os
+import pathlib
+import shutil
+import signal
+import subprocess
+import tempfile
+import time
+
+
+class LibreOfficeNaoEncontrado(RuntimeError):
+    """Indica que o executável do LibreOffice não foi localizado."""
+
+
+def find_libreoffice_path():
+    """Tenta encontrar o caminho do executável do LibreOffice em locais comuns."""
+    common_paths = [
+        os.path.join(os.getenv("PROGRAMFILES", "C:\\Program Files"), "LibreOffice\\program\\soffice.exe"),
+        os.path.join(os.getenv("PROGRAMFILES(X86)", "C:\\Program Files (x86)"), "LibreOffice\\program\\soffice.exe"),
+        "/usr/bin/libreoffice", # Para sistemas Linux
+        "/Applications/LibreOffice.app/Contents/MacOS/soffice" # Para sistemas macOS
+    ]
+    for path in common_paths:
+        if os.path.exists(path):
+            return path
+    # Servidores Linux costumam expor apenas 'soffice' no PATH
+    return shutil.which("soffice") or shutil.which("libreoffice")
+
+
+def separar_nomes_repetidos(caminhos):
+    """
+    Separa os arquivos em rodadas sem nomes repetidos (sem a extensão, ignorando
+    maiúsculas): o LibreOffice grava a.xls e a.htm no mesmo a.xlsx.
+    """
+    rodadas = []
+    vistos = {}
+    for caminho in caminhos:
+        nome = os.path.splitext(os.path.basename(caminho))[0].lower()
+        rodada = vistos.get(nome, 0)
+        vistos[nome] = rodada + 1
+        if rodada == len(rodadas):
+            rodadas.append([])
+        rodadas[rodada].append(caminho)
+    return rodadas
+
+
+class ConversorLibreOffice:
+    """
+    Conversor .xls -> .xlsx que reaproveita o LibreOffice entre arquivos.
+
+    Em vez de abrir um 'soffice' por arquivo e esperar um tempo fixo, os
+    arquivos entram em uma fila e são convertidos em lotes (vários arquivos
+    por execução). O conversor usa um perfil próprio do LibreOffice, criado
+    uma única vez: assim nenhuma outra instância aberta "captura" a chamada,
+    e o término do processo indica que a conversão realmente acabou.
+
+    Cada lote tem tempo limite; arquivos que falham em um lote são
+    reconvertidos individualmente, para que um arquivo problemático não
+    derrube os demais.
+
+    Uso:
+        with ConversorLibreOffice() as conversor:
+            convertidos = conversor.converter(lista_de_xls, pasta_destino)
+    """
+
+    def __init__(self, soffice_path=None, timeout_por_arquivo=60, arquivos_por_lote=50):
+        self.soffice_path = soffice_path or find_libreoffice_path()
+        if not self.soffice_path:
+            raise LibreOfficeNaoEncontrado("LibreOffice não encontrado. Certifique-se de que está instalado.")
+        self.timeout_por_arquivo = timeout_por_arquivo
+        self.arquivos_por_lote = max(1, arquivos_por_lote)
+        self.pasta_perfil = tempfile.mkdtemp(prefix="balancete_libreoffice_")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def fechar(self):
+        """Remove o perfil temporário do LibreOffice."""
+        if self.pasta_perfil:
+            shutil.rmtree(self.pasta_perfil, ignore_errors=True)
+            self.pasta_perfil = None
+
+    def converter(self, caminhos_xls, pasta_destino):
+        """
+        Converte os arquivos informados para .xlsx na pasta de destino.
+        O .xlsx leva o nome do original; arquivos com o mesmo nome (ex.: a.xls e
+        a.htm) são convertidos em subpastas (repetido_2, ...), um em cada.
+        Retorna um dicionário {caminho_xls: caminho_xlsx ou None em caso de falha}.
+        """
+        convertidos = {}
+        for rodada, caminhos in enumerate(separar_nomes_repetidos(caminhos_xls), start=1):
+            destino = pasta_destino
+            if rodada > 1:
+                destino = os.path.join(pasta_destino, f"repetido_{rodada}")
+                os.makedirs(destino, exist_ok=True)
+            fila = list(caminhos)
+            while fila:
+                lote, fila = fila[:self.arquivos_por_lote], fila[self.arquivos_por_lote:]
+                convertidos.update(self.converter_lote(lote, destino))
+
+                # Isola as falhas: cada arquivo que não saiu do lote é tentado sozinho
+                falhas = [caminho for caminho in lote if convertidos[caminho] is None]
+                if len(lote) > 1:
+                    for caminho in falhas:
+                        print(f"Reconvertendo '{os.path.basename(caminho)}' individualmente...")
+                        convertidos.update(self.converter_lote([caminho], destino))
+
+        for caminho, caminho_convertido in convertidos.items():
+            if caminho_convertido:
+                print(f"Conversão concluída. Arquivo salvo como '{caminho_convertido}'.")
+            else:
+                print(f"Erro: Conversão de '{os.path.basename(caminho)}' falhou ou o arquivo de saída não foi encontrado.")
+        return convertidos
+
+    def converter_lote(self, lote, pasta_destino):
+        """Converte um lote de arquivos em uma única execução do LibreOffice."""
+        inicio = time.time()
+        comando = [
+            self.soffice_path,
+            f"-env:UserInstallation={pathlib.Path(self.pasta_perfil).as_uri()}",
+            "--headless", "--norestore", "--nolockcheck",
+            "--convert-to", "xlsx", "--outdir", pasta_destino,
+        ] + list(lote)
+
+        try:
+            self.executar(comando, self.timeout_por_arquivo * len(lote))
+        except subprocess.TimeoutExpired:
+            print(f"Erro: o LibreOffice excedeu o tempo limite convertendo {len(lote)} arquivo(s).")
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"Erro de subprocesso ao tentar converter {len(lote)} arquivo(s): {e}")
+
+        # Só vale como convertido o .xlsx gerado nesta execução (não um antigo)
+        resultado = {}
+        for caminho in lote:
+            nome_base = os.path.splitext(os.path.basename(caminho))[0]
+            caminho_convertido = os.path.join(pasta_destino, f"{nome_base}.xlsx")
+            try:
+                gerado = os.path.getsize(caminho_convertido) > 0 and os.path.getmtime(caminho_convertido) >= inicio - 1
+            except OSError:
+                gerado = False
+            resultado[caminho] = caminho_convertido if gerado else None
+        return resultado
+
+    def executar(self, comando, timeout):
+        """Executa o LibreOffice e aguarda o término, matando o grupo de processos se passar do tempo."""
+        opcoes = {"stdout": subprocess.DEVNULL, "stderr": subprocess.PIPE}
+        if os.name == "posix":
+            # 'soffice' é um script que inicia 'soffice.bin'; o grupo próprio permite encerrar ambos
+            opcoes["start_new_session"] = True
+        processo = subprocess.Popen(comando, **opcoes)
+        try:
+            _, erros = processo.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            if os.name == "posix":
+                try:
+                    os.killpg(processo.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+            else:
+                processo.kill()
+            processo.communicate()
+            raise
+        if processo.returncode != 0:
+            raise subprocess.CalledProcessError(processo.returncode, comando, stderr=erros)
+
+
+def converter_xls_para_xlsx(caminho_xls, pasta_destino, soffice_path=None):
+    """
+    Converte um arquivo .xls para .xlsx via LibreOffice headless.
+    Retorna o caminho do .xlsx gerado ou None se a conversão falhar.
+    Levanta LibreOfficeNaoEncontrado se o LibreOffice não estiver instalado.
+    Para vários arquivos, prefira ConversorLibreOffice.converter, que converte em lote.
+    """
+    with ConversorLibreOffice(soffice_path) as conversor:
+        return conversor.converter([caminho_xls], pasta_destino)[caminho_xls]
@@ -0,0 +1,272 @@
+import datetime
+import os
+import re
+import sqlite3
+import sys
+
+from .cache import chave_conteudo
+from .processamento import VERSAO_PROCESSAMENTO, fmt_centavos
+
+
+# Versão do esquema (PRAGMA user_version): bancos de versões anteriores são migrados (MIGRACOES)
+VERSAO_ESQUEMA = 3
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS periodos (
+    cliente TEXT NOT NULL,
+    periodo TEXT NOT NULL,
+    arquivo TEXT NOT NULL,
+    inicio TEXT NOT NULL,
+    fim TEXT NOT NULL,
+    chave TEXT,
+    versao TEXT NOT NULL,
+    registrado_em TEXT NOT NULL,
+    PRIMARY KEY (cliente, periodo, arquivo)
+);
+CREATE INDEX IF NOT EXISTS periodos_chave ON periodos (chave, cliente);
+CREATE TABLE IF NOT EXISTS notas (
+    cliente TEXT NOT NULL,
+    conta TEXT NOT NULL,
+    numero TEXT NOT NULL,
+    periodo TEXT NOT NULL,
+    arquivo TEXT NOT NULL,
+    credito INTEGER NOT NULL,
+    debito INTEGER NOT NULL,
+    PRIMARY KEY (cliente, conta, numero, periodo, arquivo)
+) WITHOUT ROWID;
+"""
+
+# Cópia das tabelas antigas (renomeadas para *_antiga) para o esquema atual, pela versão de origem.
+# Versão 1 (sem user_version): um arquivo por cliente e período, sem a coluna arquivo nas notas.
+# Versão 2: sem a coluna conta. As notas migradas ficam sem conta, como as processadas sem --por-conta.
+COPIA_PERIODOS = """
+INSERT INTO periodos (cliente, periodo, arquivo, inicio, fim, chave, versao, registrado_em)
+SELECT cliente, periodo, arquivo, inicio, fim, chave, versao, registrado_em FROM periodos_antiga;
+"""
+MIGRACOES = {
+    1: """
+INSERT INTO notas (cliente, conta, numero, periodo, arquivo, credito, debito)
+SELECT n.cliente, '', n.numero, n.periodo, p.arquivo, n.credito, n.debito
+FROM notas_antiga n JOIN periodos_antiga p ON p.cliente = n.cliente AND p.periodo = n.periodo;
+""",
+    2: """
+INSERT INTO notas (cliente, conta, numero, periodo, arquivo, credito, debito)
+SELECT cliente, '', numero, periodo, arquivo, credito, debito FROM notas_antiga;
+""",
+}
+
+# Período no fim do nome do arquivo, que não faz parte do cliente:
+# cliente_2024-01, cliente 01-2024, cliente202401, cliente_jan, cliente-marco2024 (o mês por extenso
+# só depois de _ - ou ., para não cortar nomes como 'Padaria Mar')
+padrao_periodo_nome = re.compile(
+    r'(?:[_.-]+(?:jan(?:eiro)?|fev(?:ereiro)?|mar(?:[cç]o)?|abr(?:il)?|mai(?:o)?|jun(?:ho)?|jul(?:ho)?|ago(?:sto)?'
+    r'|set(?:embro)?|out(?:ubro)?|nov(?:embro)?|dez(?:embro)?)[_.-]?(?:\d{4}|\d{2})?'
+    r'|[\s_.-]*(?:\d{4}[\s_.-]?\d{2}|\d{2}[\s_.-]?\d{4}))$',
+    re.IGNORECASE,
+)
+
+# Totais de cada nota somando todos os períodos do cliente e da conta, com os
+# períodos de aquisição (crédito) e de pagamento (débito); o GROUP_CONCAT não
+# garante a ordem, então consultar os ordena
+CONSULTA_NOTAS = """
+SELECT cliente, conta, numero, SUM(credito), SUM(debito),
+       GROUP_CONCAT(DISTINCT CASE WHEN credito > 0 THEN periodo END),
+       GROUP_CONCAT(DISTINCT CASE WHEN debito > 0 THEN periodo END),
+       SUM(credito != debito)
+FROM notas WHERE {filtro}
+GROUP BY cliente, conta, numero
+"""
+
+
+def status_nota(credito, debito):
+    """Status da nota com os mesmos textos do relatório de cada arquivo (valores em centavos)."""
+    if credito > 0 and debito == 0:
+        return "Sem pagamento registrado"
+    if debito > 0 and credito == 0:
+        return "Sem aquisição registrada"
+    if credito == debito:
+        return "OK"
+    return f"Diferença {fmt_centavos(credito - debito)}"
+
+
+class IndiceNotas:
+    """
+    Banco SQLite com os totais por nota fiscal de cada cliente e período.
+
+    O período de um arquivo é o mês (AAAA-MM) do primeiro lançamento; o
+    cliente é o informado na criação ou, sem ele, o nome da planilha sem o
+    período no fim (clienteA_2024-01.xlsx -> clienteA; ver cliente_de).
+    Reprocessar um arquivo substitui tudo o que ele mesmo gravou para aquele
+    cliente, mesmo que agora comece em outro mês: outros arquivos do mesmo
+    mês continuam no índice. Com
+    --por-conta as notas ficam separadas por conta (a mesma NF em duas contas
+    não se soma); sem ele, a conta é vazia. A chave primária (cliente, conta,
+    numero, periodo, arquivo) é o índice usado nas consultas por nota.
+
+    Como no ArmazemLancamentos, os processos paralelos só calculam os totais;
+    a gravação no banco é feita pelo processo principal (registrar).
+    """
+
+    def __init__(self, caminho, cliente=None):
+        self.caminho = caminho
+        self.cliente = cliente
+        self.conexao = sqlite3.connect(caminho)
+        versao = self.conexao.execute("PRAGMA user_version").fetchone()[0]
+        antigas = self.conexao.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' "
+                                       "AND name IN ('periodos', 'notas')").fetchone()[0]
+        if versao > VERSAO_ESQUEMA:
+            self.conexao.close()
+            raise ValueError(f"Índice de notas '{caminho}' gravado por uma versão mais nova do programa "
+                             f"(esquema {versao}); atualize o programa para usá-lo.")
+        if antigas and versao < VERSAO_ESQUEMA:
+            self.migrar(versao or 1, antigas)
+        self.conexao.executescript(ESQUEMA)
+        self.conexao.execute(f"PRAGMA user_version = {VERSAO_ESQUEMA}")
+
+    def migrar(self, versao, tabelas):
+        """
+        Leva as tabelas de um esquema anterior ao atual, numa transação: os
+        períodos e as notas já gravados são mantidos (MIGRACOES). Se algo
+        falhar, o banco fica como estava e a abertura é recusada.
+        """
+        try:
+            if tabelas != 2:
+                raise sqlite3.DatabaseError(f"{tabelas} de 2 tabelas")
+            self.conexao.executescript(
+                "BEGIN;"
+                "ALTER TABLE periodos RENAME TO periodos_antiga;"
+                "ALTER TABLE notas RENAME TO notas_antiga;"
+                "DROP INDEX IF EXISTS periodos_chave;"
+                + ESQUEMA + COPIA_PERIODOS + MIGRACOES[versao] +
+                "DROP TABLE notas_antiga; DROP TABLE periodos_antiga;"
+                f"PRAGMA user_version = {VERSAO_ESQUEMA};"
+                "COMMIT;")
+        except sqlite3.DatabaseError as e:
+            if self.conexao.in_transaction:
+                self.conexao.rollback()
+            self.conexao.close()
+            raise ValueError(f"Índice de notas '{self.caminho}' no esquema {versao} não pôde ser atualizado ({e}); "
+                             "nada foi alterado. Use outro arquivo para o índice.") from e
+        # Na saída de erros: a saída padrão da consulta é o próprio relatório
+        print(f"Aviso: índice de notas '{self.caminho}' atualizado do esquema {versao} para o {VERSAO_ESQUEMA}.",
+              file=sys.stderr)
+
+    def fechar(self):
+        self.conexao.close()
+
+    def cliente_de(self, caminho_entrada):
+        """
+        Cliente de uma planilha: o informado na criação ou o nome do arquivo sem
+        a extensão e sem o período no fim (padrao_periodo_nome), para que os
+        meses do mesmo cliente se juntem e clientes diferentes não.
+        """
+        if self.cliente:
+            return self.cliente
+        nome = os.path.splitext(os.path.basename(caminho_entrada))[0]
+        return padrao_periodo_nome.sub("", nome) or nome
+
+    def chave(self, caminho_entrada, opcoes=None):
+        """
+        Chave do arquivo no índice: conteúdo + versão do processamento + opções
+        (como em CacheResultados.chave: outras regras ou --por-conta mudam as notas).
+        """
+        return chave_conteudo(caminho_entrada, VERSAO_PROCESSAMENTO, repr(opcoes))
+
+    def contem(self, caminho_entrada, chave):
+        """Indica se o índice já tem as notas desse conteúdo, gravadas por esse arquivo, para o cliente dele."""
+        if chave is None:
+            return False
+        encontrado = self.conexao.execute(
+            "SELECT 1 FROM periodos WHERE chave = ? AND cliente = ? AND arquivo = ? AND versao = ?",
+            (chave, self.cliente_de(caminho_entrada), os.path.basename(caminho_entrada), VERSAO_PROCESSAMENTO))
+        return encontrado.fetchone() is not None
+
+    def registrar(self, registros):
+        """
+        Grava uma lista de (caminho_entrada, chave, totais), onde totais é o
+        resultado["indice_notas"] de processar_planilha_xlsx (ver totais_por_nota
+        e, com --por-conta, totais_por_conta).
+        Tudo numa transação: o banco nunca fica com um período pela metade.
+        """
+        agora = datetime.datetime.now().isoformat(timespec="seconds")
+        with self.conexao:
+            for caminho_entrada, chave, totais in registros:
+                cliente = self.cliente_de(caminho_entrada)
+                arquivo = os.path.basename(caminho_entrada)
+                # O que o arquivo gravou antes, em qualquer período (a data do primeiro lançamento pode ter mudado)
+                self.conexao.execute("DELETE FROM notas WHERE cliente = ? AND arquivo = ?", (cliente, arquivo))
+                self.conexao.execute("DELETE FROM periodos WHERE cliente = ? AND arquivo = ?", (cliente, arquivo))
+                if not totais:
+                    continue
+                periodo = totais["inicio"][:7]
+                por_conta = totais.get("contas") or {"": totais["notas"]}
+                self.conexao.executemany(
+                    "INSERT INTO notas (cliente, conta, numero, periodo, arquivo, credito, debito) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    ((cliente, conta, numero, periodo, arquivo, credito, debito)
+                     for conta, notas in por_conta.items() for numero, credito, debito in notas))
+                self.conexao.execute(
+                    "INSERT INTO periodos (cliente, periodo, arquivo, inicio, fim, chave, versao, registrado_em) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (cliente, periodo, arquivo, totais["inicio"], totais["fim"], chave, VERSAO_PROCESSAMENTO, agora))
+
+    def clientes(self):
+        """Clientes com períodos no índice, em ordem alfabética."""
+        return [linha[0] for linha in self.conexao.execute("SELECT DISTINCT cliente FROM periodos ORDER BY cliente")]
+
+    def periodos(self, cliente=None):
+        """Períodos registrados: lista de dicionários (cliente, periodo, inicio, fim, arquivo...)."""
+        filtro, parametros = ("WHERE cliente = ?", (cliente,)) if cliente else ("", ())
+        cursor = self.conexao.execute(f"SELECT * FROM periodos {filtro} ORDER BY cliente, periodo, arquivo", parametros)
+        colunas = [descricao[0] for descricao in cursor.description]
+        return [dict(zip(colunas, linha)) for linha in cursor]
+
+    def consultar(self, cliente=None, numero=None, somente_pendentes=False, conta=None):
+        """
+        Notas conciliadas entre todos os períodos. Sem número, traz as notas que
+        ficaram em aberto (crédito diferente do débito) em algum período isolado;
+        com somente_pendentes, só as que continuam em aberto somando os períodos.
+        Retorna dicionários com cliente, conta, numero, credito, debito (centavos),
+        status, periodos_aquisicao e periodos_pagamento.
+        """
+        condicoes, parametros = [], []
+        if cliente:
+            condicoes.append("cliente = ?")
+            parametros.append(cliente)
+        if conta is not None:
+            condicoes.append("conta = ?")
+            parametros.append(conta)
+        if numero is not None:
+            condicoes.append("numero = ?")
+            parametros.append(str(numero))
+        consulta = CONSULTA_NOTAS.format(filtro=" AND ".join(condicoes) or "1")
+        if numero is None:
+            consulta += " HAVING SUM(credito != debito) > 0"
+            if somente_pendentes:
+                consulta += " AND SUM(credito) != SUM(debito)"
+        consulta += " ORDER BY cliente, conta, LENGTH(numero), numero"
+
+        notas = []
+        for cliente_nota, conta_nota, nf, credito, debito, aquisicoes, pagamentos, _ in self.conexao.execute(
+                consulta, parametros):
+            notas.append({
+                "cliente": cliente_nota,
+                "conta": conta_nota,
+                "numero": nf,
+                "credito": credito,
+                "debito": debito,
+                "status": status_nota(credito, debito),
+                "periodos_aquisicao": sorted(aquisicoes.split(",")) if aquisicoes else [],
+                "periodos_pagamento": sorted(pagamentos.split(",")) if pagamentos else [],
+            })
+        return notas
+
+    def relatorio(self, cliente=None, numero=None, somente_pendentes=False, conta=None):
+        """Linhas de texto da consulta, no formato do relatório de cada arquivo, com os períodos."""
+        linhas = []
+        for nota in self.consultar(cliente, numero, somente_pendentes, conta):
+            prefixo = f"{nota['cliente']} | {nota['conta']}" if nota["conta"] else nota["cliente"]
+            linhas.append(f"{prefixo} | NF {nota['numero']} -> Crédito: {fmt_centavos(nota['credito'])} | "
+                          f"Débito: {fmt_centavos(nota['debito'])} | {nota['status']} | "
+                          f"Aquisição: {', '.join(nota['periodos_aquisicao']) or '-'} | "
+                          f"Pagamento: {', '.join(nota['periodos_pagamento']) or '-'}")
+        return linhas
@@ -0,0 +1,387 @@
+import codecs
+import datetime
+import os
+import re
+import zipfile
+from html.parser import HTMLParser
+
+import pandas as pd
+
+from .leitura_pdf import EXTENSOES_PDF, e_pdf, iterar_linhas_pdf
+
+
+# Extensões de balancetes exportados como página HTML
+EXTENSOES_HTML = ('.htm', '.html')
+# Bytes lidos do início do arquivo para reconhecer HTML e a codificação
+TAMANHO_AMOSTRA_HTML = 4096
+# Bytes entregues ao parser HTML de cada vez
+TAMANHO_BLOCO_HTML = 256 * 1024
+# Assinatura dos arquivos OLE (o .xls BIFF de verdade)
+ASSINATURA_OLE = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+
+padrao_charset = re.compile(rb'charset\s*=\s*["\']?\s*([A-Za-z0-9_.:-]+)', re.IGNORECASE)
+# Células de texto convertidas como o Excel faria: datas dd/mm/aaaa [hh:mm[:ss]] e números 1.234,56
+padrao_data_br = re.compile(r'(\d{2})/(\d{2})/(\d{4})(?:\s+(\d{2}):(\d{2})(?::(\d{2}))?)?')
+padrao_numero_br = re.compile(r'-?(?:\d{1,3}(?:\.\d{3})+|\d+)(?:,\d+)?')
+
+
+class FormatoNaoSuportado(Exception):
+    """Indica que o arquivo não pôde ser lido diretamente e precisa de conversão (LibreOffice)."""
+
+
+def e_xls(caminho_entrada):
+    """Indica se o arquivo tem extensão .xls (formato BIFF)."""
+    return os.path.splitext(caminho_entrada)[1].lower() == '.xls'
+
+def e_html(caminho_entrada):
+    """
+    Indica se o arquivo é um balancete em HTML: extensão .htm/.html ou um .xls
+    que na verdade é uma página HTML (como alguns sistemas exportam).
+    """
+    extensao = os.path.splitext(caminho_entrada)[1].lower()
+    if extensao in EXTENSOES_HTML:
+        return True
+    if extensao != '.xls':
+        return False
+    try:
+        with open(caminho_entrada, "rb") as f:
+            amostra = f.read(TAMANHO_AMOSTRA_HTML)
+    except OSError:
+        return False
+    if amostra.startswith(ASSINATURA_OLE):
+        return False
+    amostra = amostra.lstrip(b"\xef\xbb\xbf \t\r\n").lower()
+    return amostra.startswith(b"<") and any(marca in amostra for marca in (b"<html", b"<table", b"<!doctype html"))
+
+def importar_xlrd():
+    """Importa o xlrd; sem ele, os .xls precisam passar pelo LibreOffice."""
+    try:
+        import xlrd
+    except ImportError:
+        raise FormatoNaoSuportado("A biblioteca 'xlrd' não está instalada (pip install xlrd)")
+    return xlrd
+
+def ler_planilha(caminho_entrada, processos_pdf=1):
+    """
+    Lê a primeira aba da planilha, sem cabeçalho, em um DataFrame.
+    Arquivos .xls (BIFF) são lidos diretamente pelo xlrd, sem conversão para .xlsx;
+    HTML e PDF passam pela mesma leitura de iterar_linhas.
+    Levanta FormatoNaoSuportado quando o arquivo precisa passar pelo LibreOffice
+    (ex.: arquivo corrompido ou xlrd ausente).
+    """
+    if e_pdf(caminho_entrada):
+        return pd.DataFrame(list(iterar_linhas_pdf(caminho_entrada, processos_pdf)), dtype=object)
+    if e_html(caminho_entrada):
+        return pd.DataFrame(list(iterar_linhas_html(caminho_entrada)), dtype=object)
+    if e_xls(caminho_entrada):
+        xlrd = importar_xlrd()
+        try:
+            return pd.read_excel(caminho_entrada, header=None, engine='xlrd')
+        except (xlrd.XLRDError, xlrd.compdoc.CompDocError, zipfile.BadZipFile) as e:
+            # BadZipFile: o xlrd abre como zip o que parece .xlsx renomeado
+            raise FormatoNaoSuportado(str(e)) from e
+
+    try:
+        return pd.read_excel(caminho_entrada, header=None, engine='openpyxl')
+    except zipfile.BadZipFile as e:
+        # Não é um .xlsx de verdade (ex.: .xls renomeado)
+        raise FormatoNaoSuportado(str(e)) from e
+
+def iterar_linhas(caminho_entrada, processos_pdf=1):
+    """
+    Percorre a primeira aba linha a linha, gerando uma tupla de valores por linha,
+    sem montar a planilha inteira em memória.
+    Os valores seguem as mesmas conversões de pd.read_excel (datas, números inteiros).
+    processos_pdf: processos que extraem as páginas de um PDF em paralelo.
+    """
+    if e_pdf(caminho_entrada):
+        return iterar_linhas_pdf(caminho_entrada, processos_pdf)
+    if e_html(caminho_entrada):
+        return iterar_linhas_html(caminho_entrada)
+    if e_xls(caminho_entrada):
+        return iterar_linhas_xls(caminho_entrada)
+    return iterar_linhas_xlsx(caminho_entrada)
+
+def iterar_abas(caminho_entrada, processos_pdf=1):
+    """
+    Percorre todas as abas do arquivo numa única abertura, gerando
+    (nome da aba, linhas da aba) na ordem do livro; as linhas são as de
+    iterar_linhas e devem ser consumidas antes de passar à aba seguinte.
+    HTML e PDF têm uma aba só, sem nome (None).
+    """
+    if e_pdf(caminho_entrada):
+        yield None, iterar_linhas_pdf(caminho_entrada, processos_pdf)
+    elif e_html(caminho_entrada):
+        yield None, iterar_linhas_html(caminho_entrada)
+    elif e_xls(caminho_entrada):
+        yield from iterar_abas_xls(caminho_entrada)
+    else:
+        yield from iterar_abas_xlsx(caminho_entrada)
+
+def abrir_xlsx(caminho_entrada):
+    """Abre o .xlsx no modo somente leitura do openpyxl."""
+    import openpyxl
+
+    try:
+        return openpyxl.load_workbook(caminho_entrada, read_only=True, data_only=True)
+    except zipfile.BadZipFile as e:
+        raise FormatoNaoSuportado(str(e)) from e
+
+def linhas_aba_xlsx(aba):
+    """Itera as linhas de uma aba do openpyxl (somente leitura)."""
+    # Alguns sistemas gravam a dimensão da aba errada; o pandas faz o mesmo ajuste
+    aba.reset_dimensions()
+    for linha in aba.iter_rows(values_only=True):
+        yield tuple(converter_celula_xlsx(valor) for valor in linha)
+
+def iterar_linhas_xlsx(caminho_entrada):
+    """Itera as linhas de um .xlsx no modo somente leitura do openpyxl."""
+    livro = abrir_xlsx(caminho_entrada)
+    try:
+        yield from linhas_aba_xlsx(livro.worksheets[0])
+    finally:
+        livro.close()
+
+def iterar_abas_xlsx(caminho_entrada):
+    """(nome, linhas) de cada aba de planilha do .xlsx (abas de gráfico ficam de fora)."""
+    livro = abrir_xlsx(caminho_entrada)
+    try:
+        for aba in livro.worksheets:
+            yield aba.title, linhas_aba_xlsx(aba)
+    finally:
+        livro.close()
+
+def converter_celula_xlsx(valor):
+    """Converte números inteiros gravados como float, como faz o pd.read_excel."""
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    if valor == "":
+        return None
+    return valor
+
+def abrir_xls(xlrd, caminho_entrada):
+    """Abre o .xls com o xlrd, carregando as abas só quando pedidas."""
+    try:
+        return xlrd.open_workbook(caminho_entrada, on_demand=True)
+    except (xlrd.XLRDError, xlrd.compdoc.CompDocError, zipfile.BadZipFile) as e:
+        raise FormatoNaoSuportado(str(e)) from e
+
+def linhas_aba_xls(xlrd, livro, indice):
+    """Itera as linhas da aba `indice` do .xls, liberando-a ao final."""
+    aba = livro.sheet_by_index(indice)
+    for i in range(aba.nrows):
+        yield tuple(converter_celula_xls(xlrd, celula, livro.datemode) for celula in aba.row(i))
+    livro.unload_sheet(indice)
+
+def iterar_linhas_xls(caminho_entrada):
+    """Itera as linhas de um .xls (BIFF) com o xlrd, carregando só a primeira aba."""
+    xlrd = importar_xlrd()
+    livro = abrir_xls(xlrd, caminho_entrada)
+    try:
+        yield from linhas_aba_xls(xlrd, livro, 0)
+    finally:
+        livro.release_resources()
+
+def iterar_abas_xls(caminho_entrada):
+    """(nome, linhas) de cada aba do .xls, uma aba carregada por vez."""
+    xlrd = importar_xlrd()
+    livro = abrir_xls(xlrd, caminho_entrada)
+    try:
+        for indice, nome in enumerate(livro.sheet_names()):
+            yield nome, linhas_aba_xls(xlrd, livro, indice)
+    finally:
+        livro.release_resources()
+
+def converter_celula_xls(xlrd, celula, datemode):
+    """Converte uma célula do xlrd no mesmo valor que o pd.read_excel produziria."""
+    tipo, valor = celula.ctype, celula.value
+    if tipo in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK, xlrd.XL_CELL_ERROR):
+        return None
+    if tipo == xlrd.XL_CELL_DATE:
+        try:
+            return xlrd.xldate_as_datetime(valor, datemode)
+        except xlrd.xldate.XLDateError:
+            return valor
+    if tipo == xlrd.XL_CELL_BOOLEAN:
+        return bool(valor)
+    if tipo == xlrd.XL_CELL_NUMBER and float(valor).is_integer():
+        return int(valor)
+    if valor == "":
+        return None
+    return valor
+
+def detectar_codificacao(amostra):
+    """
+    Detecta, uma única vez, a codificação do HTML pelo início do arquivo:
+    BOM, depois o charset declarado no <meta>; sem declaração, UTF-8 se o
+    trecho for UTF-8 válido, senão cp1252 (o padrão dos sistemas Windows).
+    """
+    if amostra.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if amostra.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+
+    declarado = padrao_charset.search(amostra)
+    if declarado:
+        nome = declarado.group(1).decode("ascii").lower()
+        # Como os navegadores, trata latin-1 como cp1252 (que tem os mesmos caracteres e mais alguns)
+        if nome in ("iso-8859-1", "latin-1", "latin1", "us-ascii", "ascii"):
+            return "cp1252"
+        try:
+            return codecs.lookup(nome).name
+        except LookupError:
+            pass
+
+    try:
+        # O trecho pode terminar no meio de um caractere: o decodificador incremental aceita
+        codecs.getincrementaldecoder("utf-8")().decode(amostra, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "cp1252"
+
+def converter_celula_texto(texto):
+    """
+    Converte o texto de uma célula no valor que a planilha teria: vazio -> None,
+    dd/mm/aaaa -> datetime, 1.234,56 -> float (inteiros como int); o resto fica texto.
+    """
+    texto = " ".join(texto.split())
+    if not texto:
+        return None
+    primeiro = texto[0]
+    if primeiro.isdigit() or primeiro == "-":
+        data = padrao_data_br.fullmatch(texto)
+        if data:
+            dia, mes, ano, hora, minuto, segundo = data.groups()
+            try:
+                return datetime.datetime(int(ano), int(mes), int(dia), int(hora or 0), int(minuto or 0), int(segundo or 0))
+            except ValueError:
+                return texto
+        if padrao_numero_br.fullmatch(texto):
+            valor = float(texto.replace(".", "").replace(",", "."))
+            return int(valor) if valor.is_integer() and "," not in texto else valor
+    return texto
+
+
+class ColetorTabela:
+    """
+    Monta as linhas (<tr>) das tabelas do HTML à medida que o parser avança.
+    Células com colspan ocupam as colunas seguintes com None, como na planilha,
+    para que os índices das colunas batam com o cabeçalho.
+    As linhas prontas ficam em `linhas` até serem consumidas.
+    """
+
+    def __init__(self):
+        self.linhas = []
+        self.linha = None
+        self.celula = None
+        self.colspan = 1
+
+    def inicio(self, tag, colspan=None):
+        if tag == "tr":
+            self.fechar_linha()
+            self.linha = []
+        elif tag in ("td", "th"):
+            self.fechar_celula()
+            if self.linha is None:
+                self.linha = []
+            self.celula = []
+            try:
+                self.colspan = max(1, int(colspan or 1))
+            except ValueError:
+                self.colspan = 1
+        elif tag == "br" and self.celula is not None:
+            self.celula.append(" ")
+
+    def fim(self, tag):
+        if tag in ("td", "th"):
+            self.fechar_celula()
+        elif tag in ("tr", "table"):
+            self.fechar_linha()
+
+    def texto(self, dados):
+        if self.celula is not None:
+            self.celula.append(dados)
+
+    def fechar_celula(self):
+        if self.celula is None:
+            return
+        self.linha.append(converter_celula_texto("".join(self.celula)))
+        self.linha.extend([None] * (self.colspan - 1))
+        self.celula = None
+
+    def fechar_linha(self):
+        self.fechar_celula()
+        if self.linha is not None:
+            self.linhas.append(tuple(self.linha))
+            self.linha = None
+
+
+class AlvoLxml:
+    """Interface de 'target' do parser do lxml, repassando os eventos ao ColetorTabela."""
+
+    def __init__(self, coletor):
+        self.coletor = coletor
+
+    def start(self, tag, atributos):
+        self.coletor.inicio(tag, atributos.get("colspan"))
+
+    def end(self, tag):
+        self.coletor.fim(tag)
+
+    def data(self, dados):
+        self.coletor.texto(dados)
+
+    def close(self):
+        self.coletor.fechar_linha()
+
+
+class ParserHtmlPadrao(HTMLParser):
+    """Parser da biblioteca padrão, usado quando o lxml não está instalado."""
+
+    def __init__(self, coletor):
+        super().__init__(convert_charrefs=True)
+        self.coletor = coletor
+
+    def handle_starttag(self, tag, atributos):
+        self.coletor.inicio(tag, dict(atributos).get("colspan"))
+
+    def handle_endtag(self, tag):
+        self.coletor.fim(tag)
+
+    def handle_data(self, dados):
+        self.coletor.texto(dados)
+
+    def close(self):
+        super().close()
+        self.coletor.fechar_linha()
+
+def criar_parser_html(coletor):
+    """Parser incremental do HTML: lxml (libxml2, bem mais rápido) ou, sem ele, o html.parser."""
+    try:
+        from lxml import etree
+    except ImportError:
+        return ParserHtmlPadrao(coletor)
+    return etree.HTMLParser(target=AlvoLxml(coletor), recover=True)
+
+def iterar_linhas_html(caminho_entrada):
+    """
+    Percorre as linhas das tabelas de um balancete em HTML sem carregar o
+    arquivo inteiro: o arquivo é lido em blocos, decodificado com a
+    codificação detectada uma vez no início e entregue a um parser incremental.
+    Gera uma tupla de valores por <tr>, como iterar_linhas.
+    """
+    coletor = ColetorTabela()
+    parser = criar_parser_html(coletor)
+    with open(caminho_entrada, "rb") as f:
+        bloco = f.read(TAMANHO_BLOCO_HTML)
+        decodificador = codecs.getincrementaldecoder(detectar_codificacao(bloco[:TAMANHO_AMOSTRA_HTML]))(errors="replace")
+        while bloco:
+            parser.feed(decodificador.decode(bloco))
+            yield from coletor.linhas
+            coletor.linhas.clear()
+            bloco = f.read(TAMANHO_BLOCO_HTML)
+        final = decodificador.decode(b"", final=True)
+        if final:
+            parser.feed(final)
+    parser.close()
+    yield from coletor.linhas
@@ -0,0 +1,184 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+
+# Extensão dos balancetes em PDF
+EXTENSOES_PDF = ('.pdf',)
+# Páginas extraídas por tarefa no modo paralelo
+PAGINAS_POR_TAREFA = 8
+# Distância vertical máxima, em pontos, entre palavras da mesma linha
+TOLERANCIA_LINHA = 3
+# Folga, em pontos, ao comparar a posição de um texto com o início de uma coluna
+TOLERANCIA_COLUNA = 2
+# Valores monetários do relatório (1.234,56 ou 1.234,56-); números sem centavos (NF, lote) ficam fora
+padrao_valor_pdf = re.compile(r'-?\d{1,3}(?:\.\d{3})*,\d{2}-?|-?\d+,\d{2}-?')
+
+
+def e_pdf(caminho_entrada):
+    """Indica se o arquivo é um balancete em PDF."""
+    return os.path.splitext(caminho_entrada)[1].lower() in EXTENSOES_PDF
+
+def importar_pdfium():
+    """
+    Importa o pypdfium2 (instalado junto com o pdfplumber), que extrai o texto
+    com posições em C, bem mais rápido que o pdfminer. Sem ele não há como ler
+    PDF (o LibreOffice não converte PDF em planilha).
+    """
+    try:
+        import pypdfium2
+    except ImportError:
+        raise ImportError("A biblioteca 'pypdfium2' não está instalada (pip install pdfplumber ou pip install pypdfium2)")
+    return pypdfium2
+
+def trechos_da_pagina(pagina):
+    """
+    Trechos de texto da página com a posição (x0, x1 e topo, em pontos a partir
+    do alto da página). Cada trecho é um pedaço contínuo de texto de uma linha:
+    'CONTRAPARTIDA / HISTÓRICO' ou um histórico inteiro viram um trecho só, e
+    colunas diferentes ficam em trechos diferentes.
+    """
+    texto = pagina.get_textpage()
+    try:
+        altura = pagina.get_height()
+        trechos = []
+        for i in range(texto.count_rects()):
+            esquerda, base, direita, topo = texto.get_rect(i)
+            conteudo = texto.get_text_bounded(esquerda, base, direita, topo).strip()
+            if conteudo:
+                trechos.append({"text": conteudo, "x0": esquerda, "x1": direita, "top": altura - topo})
+        return trechos
+    finally:
+        texto.close()
+
+def linhas_da_pagina(pagina):
+    """Agrupa os trechos de texto da página em linhas (de cima para baixo), cada uma da esquerda para a direita."""
+    palavras = trechos_da_pagina(pagina)
+    palavras.sort(key=lambda palavra: (round(palavra["top"]), palavra["x0"]))
+    linhas = []
+    topo = None
+    for palavra in palavras:
+        if topo is None or palavra["top"] - topo > TOLERANCIA_LINHA:
+            linhas.append([])
+            topo = palavra["top"]
+        linhas[-1].append(palavra)
+    for linha in linhas:
+        linha.sort(key=lambda palavra: palavra["x0"])
+    return linhas
+
+def e_valor(texto):
+    """Indica se o texto é um valor monetário (com centavos)."""
+    return padrao_valor_pdf.fullmatch(texto) is not None
+
+def localizar_layout(caminho_entrada):
+    """
+    Procura, página a página, a linha de cabeçalho (com DÉBITO e CRÉDITO) e
+    devolve o layout das colunas: lista de (texto, x0, x1, numerica). As colunas
+    de valores são as que recebem números com centavos, alinhados à direita.
+    None se o PDF não tiver cabeçalho.
+    """
+    pdfium = importar_pdfium()
+    pdf = pdfium.PdfDocument(caminho_entrada)
+    try:
+        for indice in range(len(pdf)):
+            pagina = pdf[indice]
+            try:
+                for linha in linhas_da_pagina(pagina):
+                    textos = [palavra["text"].upper() for palavra in linha]
+                    if 'DÉBITO' in textos and 'CRÉDITO' in textos:
+                        inicio_valores = textos.index('DÉBITO')
+                        return [(palavra["text"], palavra["x0"], palavra["x1"], i >= inicio_valores)
+                                for i, palavra in enumerate(linha)]
+            finally:
+                pagina.close()
+    finally:
+        pdf.close()
+    return None
+
+def distribuir_linha(linha, layout):
+    """
+    Coloca cada trecho da linha na coluna do cabeçalho correspondente: os
+    títulos do cabeçalho na própria coluna; valores com centavos na coluna de
+    valores com a borda direita mais próxima (alinhamento à direita); o resto
+    na última coluna de texto que começa antes do trecho (alinhamento à esquerda).
+    """
+    celulas = [None] * len(layout)
+    colunas_texto = [i for i, coluna in enumerate(layout) if not coluna[3]]
+    colunas_valor = [i for i, coluna in enumerate(layout) if coluna[3]]
+    inicio_valores = layout[colunas_valor[0]][1] if colunas_valor else None
+    for palavra in linha:
+        texto = palavra["text"]
+        cabecalho = [i for i, coluna in enumerate(layout)
+                     if coluna[0] == texto and abs(coluna[1] - palavra["x0"]) <= TOLERANCIA_COLUNA]
+        if cabecalho:
+            # O cabeçalho se repete em cada página, na mesma posição
+            destino = cabecalho[0]
+        elif colunas_valor and e_valor(texto) and palavra["x1"] > inicio_valores:
+            destino = min(colunas_valor, key=lambda i: abs(layout[i][2] - palavra["x1"]))
+        else:
+            destino = colunas_texto[0] if colunas_texto else 0
+            for i in colunas_texto:
+                if layout[i][1] <= palavra["x0"] + TOLERANCIA_COLUNA:
+                    destino = i
+        celulas[destino] = texto if celulas[destino] is None else f"{celulas[destino]} {texto}"
+    return celulas
+
+def sinal_no_inicio(texto):
+    """Passa o sinal de valores negativos do fim (1.234,56-) para o início (-1.234,56)."""
+    if texto and texto.endswith("-") and not texto.startswith("-") and e_valor(texto):
+        return "-" + texto[:-1]
+    return texto or ""
+
+def extrair_paginas(caminho_entrada, inicio, fim, layout):
+    """
+    Extrai as linhas das páginas [inicio, fim) do PDF (executa nos processos paralelos).
+    Sem layout, cada linha sai com os trechos na ordem em que aparecem.
+    Retorna a lista de tuplas de valores, na ordem das páginas.
+    """
+    # Importado aqui porque leitura importa este módulo
+    from .leitura import converter_celula_texto
+
+    pdfium = importar_pdfium()
+    linhas = []
+    pdf = pdfium.PdfDocument(caminho_entrada)
+    try:
+        for indice in range(inicio, fim):
+            pagina = pdf[indice]
+            try:
+                for linha in linhas_da_pagina(pagina):
+                    celulas = distribuir_linha(linha, layout) if layout else [palavra["text"] for palavra in linha]
+                    # Mesmas conversões das células do HTML (datas dd/mm/aaaa, valores 1.234,56)
+                    linhas.append(tuple(converter_celula_texto(sinal_no_inicio(celula)) for celula in celulas))
+            finally:
+                pagina.close()
+    finally:
+        pdf.close()
+    return linhas
+
+def iterar_linhas_pdf(caminho_entrada, processos=1):
+    """
+    Percorre as linhas de um balancete em PDF. O cabeçalho da primeira página
+    que o tiver define as colunas; depois as páginas são extraídas em blocos
+    de PAGINAS_POR_TAREFA, distribuídos entre `processos` processos, e as
+    linhas saem na ordem das páginas, como em iterar_linhas.
+    """
+    pdfium = importar_pdfium()
+    pdf = pdfium.PdfDocument(caminho_entrada)
+    try:
+        total_paginas = len(pdf)
+    finally:
+        pdf.close()
+    layout = localizar_layout(caminho_entrada)
+
+    blocos = [(inicio, min(inicio + PAGINAS_POR_TAREFA, total_paginas))
+              for inicio in range(0, total_paginas, PAGINAS_POR_TAREFA)]
+    if processos <= 1 or len(blocos) <= 1:
+        for inicio, fim in blocos:
+            yield from extrair_paginas(caminho_entrada, inicio, fim, layout)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(processos, len(blocos))) as executor:
+        # map devolve os blocos na ordem de envio, mesmo que terminem fora de ordem
+        for linhas in executor.map(extrair_paginas, *zip(*[(caminho_entrada, inicio, fim, layout)
+                                                           for inicio, fim in blocos])):
+            yield from linhas
@@ -0,0 +1,484 @@
+import dataclasses
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from .conversao import ConversorLibreOffice, LibreOfficeNaoEncontrado
+from .leitura import EXTENSOES_HTML, EXTENSOES_PDF, e_pdf
+from .metricas import Medidor, pico_memoria_mb
+from .processamento import OpcoesProcessamento, novo_resultado, processar_planilha_xlsx
+
+
+EXTENSOES_PLANILHA = ('.xls', '.xlsx') + EXTENSOES_HTML + EXTENSOES_PDF
+# Arquivos aguardando o LibreOffice; com a fila cheia, quem encaminha espera a conversão andar
+FILA_CONVERSAO = 16
+# Resultados aguardando a gravação no cache
+FILA_GRAVACAO = 32
+# Arquivos por execução do LibreOffice no lote: os que já estiverem na fila, até este limite
+ARQUIVOS_POR_CONVERSAO = 8
+# Intervalo, em segundos, em que quem espera uma fila cheia confere se a thread que a consome ainda está viva
+ESPERA_FILA = 0.5
+
+
+def listar_planilhas(pasta_entrada):
+    """Lista, em ordem alfabética, os balancetes (.xls/.xlsx/.htm/.html/.pdf) da pasta de entrada."""
+    return sorted(f for f in os.listdir(pasta_entrada) if f.lower().endswith(EXTENSOES_PLANILHA))
+
+def nomes_saida(caminhos):
+    """
+    Nome base do relatório e dos lançamentos de cada arquivo: o nome sem a
+    extensão. Arquivos com o mesmo nome (ex.: a.xls e a.pdf) levam também a
+    extensão (a_xls, a_pdf), para um não sobrescrever os arquivos do outro; se
+    ainda assim repetir (pastas diferentes), recebem um número (a_xls_2).
+    A comparação ignora maiúsculas, como no Windows.
+    """
+    bases = [os.path.splitext(os.path.basename(caminho)) for caminho in caminhos]
+    repetidos = Counter(base.lower() for base, _ in bases)
+    nomes = []
+    usados = set()
+    for base, extensao in bases:
+        nome = f"{base}_{extensao.lstrip('.').lower()}" if repetidos[base.lower()] > 1 else base
+        unico, numero = nome, 2
+        while unico.lower() in usados:
+            unico, numero = f"{nome}_{numero}", numero + 1
+        usados.add(unico.lower())
+        nomes.append(unico)
+    return nomes
+
+def processos_padrao():
+    """Número padrão de processos do modo paralelo: um por núcleo."""
+    return os.cpu_count() or 1
+
+def iniciar_processo(mensagens_em_stderr):
+    """
+    Inicializa cada processo do modo paralelo.
+    Com 'spawn' (Windows/macOS) o filho não herda o redirecionamento de stdout
+    feito pela linha de comando, então ele é refeito aqui.
+    """
+    if mensagens_em_stderr:
+        sys.stdout = sys.stderr
+
+def resultado_cancelado(caminho):
+    """Resultado de um arquivo que não chegou a ser processado porque o lote foi cancelado."""
+    resultado = novo_resultado(caminho)
+    resultado["status"] = "cancelado"
+    resultado["mensagem"] = "Processamento cancelado"
+    return resultado
+
+class PipelineLote:
+    """
+    Executa as planilhas do lote em estágios que andam ao mesmo tempo, ligados
+    por filas limitadas:
+
+        processamento (leitura, conciliação, relatório e lançamentos; nos processos paralelos)
+          -> conversão pelo LibreOffice (thread), só dos arquivos que não puderam
+             ser lidos diretamente, que voltam convertidos para o processamento
+          -> gravação no cache (thread)
+
+    Assim o LibreOffice converte os .xls problemáticos enquanto os demais
+    arquivos são processados, e a cópia para o cache não segura o próximo
+    arquivo. Com as filas cheias, a thread principal espera o estágio seguinte
+    andar (contrapressão), sem acumular arquivos em memória.
+
+    A thread principal recebe os eventos dos estágios por uma fila e é a única
+    que envia arquivos ao processamento e chama concluir(indice, resultado),
+    na ordem de término. Se a thread de conversão morrer, ela avisa por um
+    evento "conversao_encerrada" e os arquivos que esperavam a conversão
+    terminam com erro; nenhuma fila é esperada depois que a thread que a
+    consome morreu.
+    """
+
+    def __init__(self, pasta_saida, processos, opcoes=None, soffice_path=None, timeout_conversao=60,
+                 pasta_lancamentos=None, concluir=None, guardar=None, cancelar=None, medidor=None):
+        """
+        concluir(indice, resultado): chamado na thread principal a cada arquivo terminado.
+        guardar(indice, resultado): chamado na thread de gravação (ex.: CacheResultados.guardar).
+        """
+        self.pasta_saida = pasta_saida
+        self.processos = processos
+        self.opcoes = opcoes
+        self.soffice_path = soffice_path
+        self.timeout_conversao = timeout_conversao
+        self.pasta_lancamentos = pasta_lancamentos
+        self.concluir = concluir
+        self.guardar = guardar
+        self.cancelar = cancelar
+        self.medidor = medidor or Medidor(None)
+        self.eventos = queue.Queue()
+        self.fila_conversao = queue.Queue(maxsize=FILA_CONVERSAO)
+        self.fila_gravacao = queue.Queue(maxsize=FILA_GRAVACAO)
+        self.resultados = {}
+        self.thread_conversao = None
+        self.thread_gravacao = None
+
+    def cancelado(self):
+        return self.cancelar is not None and self.cancelar.is_set()
+
+    def executar(self, tarefas):
+        """
+        Processa as tarefas (indice, caminho, pasta_lancamentos, caminho_colunar, nome_base).
+        Retorna {indice: resultado}.
+        """
+        if self.processos <= 1 or len(tarefas) <= 1:
+            # Sem paralelismo, uma thread basta para o processamento andar junto com a conversão
+            executor, trabalhadores = ThreadPoolExecutor(max_workers=1), 1
+        else:
+            trabalhadores = min(self.processos, len(tarefas))
+            executor = ProcessPoolExecutor(max_workers=trabalhadores,
+                                           initializer=iniciar_processo, initargs=(sys.stdout is sys.stderr,))
+        self.thread_gravacao = threading.Thread(target=self.gravar, name="gravacao", daemon=True)
+        self.thread_gravacao.start()
+        with tempfile.TemporaryDirectory(prefix="balancete_conversao_") as pasta_conversao:
+            self.thread_conversao = threading.Thread(target=self.converter, args=(pasta_conversao,), name="conversao",
+                                                     daemon=True)
+            self.thread_conversao.start()
+            try:
+                with executor:
+                    self.acompanhar(executor, tarefas, trabalhadores)
+            finally:
+                self.enfileirar(self.fila_conversao, None, self.thread_conversao)
+                self.thread_conversao.join()
+                self.enfileirar(self.fila_gravacao, None, self.thread_gravacao)
+                self.thread_gravacao.join()
+        return self.resultados
+
+    @staticmethod
+    def enfileirar(fila, item, consumidor):
+        """
+        Põe o item na fila, esperando enquanto ela estiver cheia. Retorna False,
+        sem pôr, se a thread que consome a fila tiver morrido.
+        """
+        while consumidor.is_alive():
+            try:
+                fila.put(item, timeout=ESPERA_FILA)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def acompanhar(self, executor, tarefas, trabalhadores):
+        """
+        Laço da thread principal: envia os arquivos e trata os eventos até todos terminarem.
+        Só `trabalhadores` arquivos ficam no executor de cada vez; os demais esperam
+        em `pendentes`, para que o cancelamento alcance todos os que ainda não começaram.
+        """
+        caminhos = {indice: caminho for indice, caminho, _, _, _ in tarefas}
+        colunares = {indice: caminho_colunar for indice, _, _, caminho_colunar, _ in tarefas}
+        nomes = {indice: nome_base for indice, _, _, _, nome_base in tarefas}
+        pendentes = deque((indice, caminho, pasta_lancamentos)
+                         for indice, caminho, pasta_lancamentos, _, _ in tarefas)
+        em_execucao = set()
+        aguardando = {}
+        convertidos = set()
+        # A thread de conversão avisou que morreu; ela ainda pode parecer viva por um instante
+        conversao_encerrada = False
+
+        def enviar(indice, caminho, pasta_lancamentos):
+            # O .xlsx convertido tem nome temporário: os arquivos gerados levam o nome do original
+            futuro = executor.submit(processar_planilha_xlsx, caminho, self.pasta_saida, pasta_lancamentos,
+                                     self.opcoes, colunares[indice], nomes[indice], caminhos[indice])
+            em_execucao.add(indice)
+            futuro.add_done_callback(lambda futuro: self.eventos.put(("processado", indice, futuro)))
+
+        abertos = len(tarefas)
+        while abertos:
+            if self.cancelado():
+                # Os arquivos já em execução terminam; os que não começaram ficam cancelados
+                while pendentes:
+                    indice, _, _ = pendentes.popleft()
+                    self.finalizar(indice, resultado_cancelado(caminhos[indice]))
+                    abertos -= 1
+                if not abertos:
+                    break
+            while pendentes and len(em_execucao) < trabalhadores:
+                enviar(*pendentes.popleft())
+
+            evento, indice, valor = self.eventos.get()
+            if evento == "conversao_encerrada":
+                # A thread de conversão morreu: nenhuma das conversões pendentes vai voltar
+                for indice, resultado in aguardando.items():
+                    resultado["mensagem"] = f"Falha na conversão via LibreOffice: {valor}"
+                    self.finalizar(indice, resultado)
+                abertos -= len(aguardando)
+                aguardando.clear()
+                conversao_encerrada = True
+                continue
+            abertos -= 1
+            if evento == "processado":
+                em_execucao.discard(indice)
+                resultado = self.resultado_do_futuro(valor, caminhos[indice])
+                if resultado.pop("requer_conversao", False) and indice not in convertidos:
+                    if not self.cancelado():
+                        # Espera, com a fila cheia, o LibreOffice dar vazão
+                        aguardando[indice] = resultado
+                        if not conversao_encerrada and self.enfileirar(self.fila_conversao, (indice, caminhos[indice]),
+                                                                       self.thread_conversao):
+                            abertos += 1
+                            continue
+                        del aguardando[indice]
+                        resultado["mensagem"] = "Falha na conversão via LibreOffice"
+                    else:
+                        resultado = resultado_cancelado(caminhos[indice])
+                self.finalizar(indice, resultado)
+            else:
+                resultado = aguardando.pop(indice)
+                if self.cancelado():
+                    self.finalizar(indice, resultado_cancelado(caminhos[indice]))
+                elif valor is None:
+                    resultado["mensagem"] = "Falha na conversão via LibreOffice"
+                    self.finalizar(indice, resultado)
+                else:
+                    # O .xlsx convertido é temporário; os lançamentos vão para a pasta do arquivo original.
+                    # Volta à frente da fila: já esperou a conversão
+                    convertidos.add(indice)
+                    pendentes.appendleft((indice, valor, self.pasta_lancamentos or os.path.dirname(caminhos[indice])))
+                    abertos += 1
+
+    def resultado_do_futuro(self, futuro, caminho):
+        """Resultado de um arquivo enviado ao processamento (cancelado ou com falha do processo)."""
+        if futuro.cancelled():
+            return resultado_cancelado(caminho)
+        try:
+            return futuro.result()
+        except Exception as e:
+            # Falha do próprio processo (ex.: memória insuficiente), não da planilha
+            print(f"Ocorreu um erro ao processar '{os.path.basename(caminho)}': {e}")
+            resultado = novo_resultado(caminho)
+            resultado["mensagem"] = str(e)
+            return resultado
+
+    def finalizar(self, indice, resultado):
+        self.resultados[indice] = resultado
+        if self.concluir is not None:
+            self.concluir(indice, resultado)
+        if self.guardar is not None and resultado["status"] in ("ok", "aviso"):
+            if not self.enfileirar(self.fila_gravacao, (indice, resultado), self.thread_gravacao):
+                print(f"Aviso: resultado de '{resultado['arquivo']}' não gravado: a gravação foi interrompida.")
+
+    def converter(self, pasta_conversao):
+        """
+        Thread de conversão: junta os arquivos que estiverem na fila (até
+        ARQUIVOS_POR_CONVERSAO), converte numa execução do LibreOffice e devolve
+        cada um à thread principal. O mesmo perfil do LibreOffice serve o lote todo.
+        Cada execução grava numa pasta própria: um .xlsx ainda em processamento
+        não é sobrescrito pela conversão de outro arquivo de mesmo nome.
+        """
+        try:
+            self.converter_lotes(pasta_conversao)
+        except BaseException as e:
+            # A thread principal espera uma resposta de cada arquivo enviado: avisa que nenhuma outra virá
+            print(f"Erro de Conversão: {e}")
+            self.eventos.put(("conversao_encerrada", None, e))
+
+    def converter_lotes(self, pasta_conversao):
+        """Laço da thread de conversão (ver converter)."""
+        conversor = None
+        indisponivel = False
+        try:
+            while True:
+                item = self.fila_conversao.get()
+                if item is None:
+                    return
+                lote = [item]
+                while len(lote) < ARQUIVOS_POR_CONVERSAO:
+                    try:
+                        item = self.fila_conversao.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        self.fila_conversao.put(None)
+                        break
+                    lote.append(item)
+
+                convertidos = {}
+                if not indisponivel and not self.cancelado():
+                    with self.medidor.etapa_acumulada("conversao") as registro:
+                        registro["arquivos"] = len(lote)
+                        print(f"\nConvertendo {len(lote)} arquivo(s) via LibreOffice...")
+                        try:
+                            if conversor is None:
+                                conversor = ConversorLibreOffice(self.soffice_path, timeout_por_arquivo=self.timeout_conversao)
+                            destino = tempfile.mkdtemp(prefix="execucao_", dir=pasta_conversao)
+                            convertidos = conversor.converter([caminho for _, caminho in lote], destino)
+                        except LibreOfficeNaoEncontrado as e:
+                            print(f"Erro de Conversão: {e}")
+                            indisponivel = True
+                        except Exception as e:
+                            # A thread principal espera uma resposta para cada arquivo: a falha vale para o lote
+                            print(f"Erro de Conversão: {e}")
+                        registro["convertidos"] = sum(1 for convertido in convertidos.values() if convertido)
+                for indice, caminho in lote:
+                    self.eventos.put(("convertido", indice, convertidos.get(caminho)))
+        finally:
+            if conversor is not None:
+                conversor.fechar()
+
+    def gravar(self):
+        """
+        Thread de gravação: guarda os resultados concluídos (ex.: no cache), um por vez.
+        Se ela morrer, quem enfileira percebe (enfileirar) e segue sem gravar.
+        """
+        while True:
+            item = self.fila_gravacao.get()
+            if item is None:
+                return
+            with self.medidor.etapa_acumulada("cache_gravacao") as registro:
+                registro["arquivos"] = 1
+                try:
+                    self.guardar(*item)
+                except Exception as e:
+                    # A gravação é um extra: o resultado do arquivo já está pronto
+                    print(f"Aviso: resultado de '{item[1]['arquivo']}' não gravado: {e}")
+
+def processar_caminhos(caminhos, pasta_saida, soffice_path=None, processos=None, timeout_conversao=60,
+                       opcoes=None, cache=None, pasta_lancamentos=None, armazem=None, metricas=None,
+                       progresso=None, cancelar=None, indice_notas=None, nomes=None):
+    """
+    Processa a lista de planilhas e devolve os resultados na mesma ordem.
+    Arquivos .xls são lidos diretamente (xlrd); só os que não puderem ser lidos
+    são convertidos pelo LibreOffice, numa pasta temporária, enquanto os demais
+    continuam sendo processados (ver PipelineLote).
+    pasta_lancamentos: pasta das planilhas _lancamentos (padrão: a pasta de cada arquivo de entrada).
+    cache: CacheResultados opcional; arquivos com conteúdo já processado são
+    restaurados do cache sem serem lidos de novo.
+    armazem: ArmazemLancamentos opcional; os lançamentos normalizados de cada
+    arquivo são gravados na base colunar e registrados no manifesto.
+    metricas: ArquivoMetricas opcional que recebe as medidas de cada etapa do lote
+    e de cada arquivo.
+    progresso(resultado): chamado a cada arquivo concluído (inclusive os restaurados
+    do cache), na thread que chamou esta função.
+    cancelar: evento (threading.Event); quando acionado, o lote para entre um
+    arquivo e outro e os que faltavam ficam com status "cancelado".
+    indice_notas: IndiceNotas opcional; os totais por nota fiscal de cada arquivo
+    são gravados no índice entre períodos.
+    nomes: nome base dos arquivos gerados para cada caminho (padrão: nomes_saida(caminhos)).
+    """
+    processos = processos or processos_padrao()
+    nomes = nomes or nomes_saida(caminhos)
+    # As chaves do cache e do índice dependem das opções efetivas (repr), então o padrão é explícito
+    opcoes = opcoes or OpcoesProcessamento()
+    if indice_notas is not None:
+        opcoes = dataclasses.replace(opcoes, indexar_notas=True)
+
+    registros_arquivos = []
+    registros_indice = []
+
+    def ao_concluir(indice, resultado):
+        resultado["arquivo"] = os.path.basename(caminhos[indice])
+        totais = resultado.pop("indice_notas", None)
+        # Processada sem notas: o registro vazio apaga o que o arquivo tinha gravado antes
+        if totais or (indice_notas is not None and resultado["status"] == "ok" and not resultado["cache"]):
+            registros_indice.append((caminhos[indice], chaves_indice[indice], totais))
+        # As medidas saem do resultado (não vão para o cache nem para o resumo)
+        for registro in resultado.pop("metricas", None) or []:
+            registros_arquivos.append({**registro, "arquivo": os.path.basename(caminhos[indice])})
+        if progresso is not None:
+            progresso(resultado)
+
+    medidor = Medidor(None)
+    inicio = time.perf_counter()
+
+    resultados = {}
+    chaves = {}
+    chaves_colunar = {}
+    chaves_indice = {}
+    caminhos_colunar = {}
+    tarefas = []
+    with medidor.etapa("cache", arquivos=len(caminhos)) as registro:
+        for indice, caminho in enumerate(caminhos):
+            caminhos_colunar[indice] = None
+            if armazem is not None:
+                chaves_colunar[indice] = armazem.chave(caminho, opcoes)
+                if chaves_colunar[indice] is not None:
+                    caminhos_colunar[indice] = armazem.caminho(chaves_colunar[indice])
+            if indice_notas is not None:
+                # Mesma chave (conteúdo + versão + opções) da base colunar: evita ler o arquivo de novo
+                chaves_indice[indice] = (chaves_colunar[indice] if armazem is not None
+                                         else indice_notas.chave(caminho, opcoes))
+            if cache is not None:
+                chaves[indice] = cache.chave(caminho, opcoes)
+                # Só reaproveita o cache se a base colunar e o índice (quando usados) já tiverem o arquivo
+                if ((armazem is None or armazem.contem(chaves_colunar[indice]))
+                        and (indice_notas is None or indice_notas.contem(caminho, chaves_indice[indice]))):
+                    resultado = cache.restaurar(chaves[indice], caminho, pasta_saida, pasta_lancamentos,
+                                                nomes[indice])
+                    if resultado is not None:
+                        resultado["colunar"] = caminhos_colunar[indice]
+                        resultados[indice] = resultado
+                        ao_concluir(indice, resultado)
+                        continue
+            tarefas.append((indice, caminho, pasta_lancamentos, caminhos_colunar[indice], nomes[indice]))
+        registro["acertos"] = len(resultados)
+
+    # Planilhas e PDFs dividem os mesmos processos, um arquivo por processo. Um arquivo
+    # só: os processos que sobrariam trabalham dentro dele (páginas do PDF ou contas grandes)
+    opcoes_lote = opcoes
+    if len(tarefas) == 1 and e_pdf(tarefas[0][1]):
+        opcoes_lote = dataclasses.replace(opcoes, processos_pdf=processos)
+    elif len(tarefas) == 1 and opcoes.por_conta:
+        opcoes_lote = dataclasses.replace(opcoes, processos_contas=processos)
+    guardar = None
+    if cache is not None:
+        guardar = lambda indice, resultado: cache.guardar(chaves[indice], caminhos[indice], resultado, nomes[indice])
+    pipeline = PipelineLote(pasta_saida, processos, opcoes_lote, soffice_path, timeout_conversao,
+                            pasta_lancamentos, ao_concluir, guardar, cancelar, medidor)
+    with medidor.etapa("processamento", arquivos=len(tarefas), processos=processos):
+        resultados.update(pipeline.executar(tarefas))
+
+    if cache is not None:
+        cache.limitar_tamanho()
+
+    if indice_notas is not None:
+        indice_notas.registrar(registros_indice)
+
+    if armazem is not None:
+        armazem.registrar([(caminhos[indice], chaves_colunar[indice], resultados[indice])
+                           for indice in range(len(caminhos))])
+
+    if metricas is not None:
+        contagem = {}
+        for resultado in resultados.values():
+            contagem[resultado["status"]] = contagem.get(resultado["status"], 0) + 1
+        total = {"arquivo": None, "etapa": "total", "arquivos": len(caminhos), **contagem,
+                 "segundos": round(time.perf_counter() - inicio, 6), "pico_processo_mb": pico_memoria_mb(),
+                 "pid": os.getpid()}
+        metricas.registrar(medidor.registros + registros_arquivos + [total])
+
+    return [resultados[indice] for indice in range(len(caminhos))]
+
+def processar_arquivo(caminho_completo_entrada, pasta_saida, soffice_path=None, timeout_conversao=60, opcoes=None,
+                      cache=None, pasta_lancamentos=None, armazem=None, metricas=None, indice_notas=None):
+    """
+    Processa um único arquivo de balancete (.xls, .xlsx, .htm, .html ou .pdf).
+    Retorna o dicionário de resultado de processar_planilha_xlsx.
+    """
+    return processar_caminhos([caminho_completo_entrada], pasta_saida, soffice_path,
+                              processos=1, timeout_conversao=timeout_conversao, opcoes=opcoes, cache=cache,
+                              pasta_lancamentos=pasta_lancamentos, armazem=armazem, metricas=metricas,
+                              indice_notas=indice_notas)[0]
+
+def processar_pasta(pasta_entrada, pasta_saida, soffice_path=None, processos=None, timeout_conversao=60,
+                    opcoes=None, cache=None, pasta_lancamentos=None, armazem=None, metricas=None,
+                    progresso=None, cancelar=None, indice_notas=None):
+    """
+    Processa todas as planilhas da pasta de entrada.
+    processos: quantidade de processos em paralelo (padrão: um por núcleo; 1 = sequencial).
+    timeout_conversao: tempo limite, em segundos, por arquivo convertido pelo LibreOffice.
+    opcoes: OpcoesProcessamento repassadas a processar_planilha_xlsx.
+    cache: CacheResultados opcional para reaproveitar arquivos já processados.
+    pasta_lancamentos: pasta das planilhas _lancamentos (padrão: a própria pasta de entrada).
+    armazem: ArmazemLancamentos opcional que recebe os lançamentos normalizados.
+    metricas: ArquivoMetricas opcional (JSON lines com as medidas de cada etapa).
+    progresso, cancelar: acompanhamento e cancelamento (ver processar_caminhos).
+    indice_notas: IndiceNotas opcional (índice de notas fiscais entre períodos).
+    Retorna a lista de resultados, na mesma ordem de listar_planilhas.
+    """
+    print("Iniciando o processamento...")
+    caminhos = [os.path.join(pasta_entrada, arquivo) for arquivo in listar_planilhas(pasta_entrada)]
+    return processar_caminhos(caminhos, pasta_saida, soffice_path, processos, timeout_conversao, opcoes, cache,
+                              pasta_lancamentos, armazem, metricas, progresso, cancelar, indice_notas)
@@ -0,0 +1,179 @@
+import contextlib
+import cProfile
+import datetime
+import json
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    # Windows: sem getrusage, o pico de memória não é medido
+    resource = None
+
+
+def pico_memoria_mb():
+    """
+    Pico de memória residente (RSS) do processo atual desde o início, em MB
+    (None no Windows). É do processo inteiro: não diz quanto cada etapa usou.
+    """
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def memoria_atual_mb():
+    """Memória residente (RSS) do processo neste momento, em MB (lida de /proc; None fora do Linux)."""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            paginas = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return round(paginas * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+
+def medir_memoria(registro, memoria_inicio):
+    """
+    Preenche a memória de uma execução da etapa: a residente ao final
+    ("memoria_mb"), quanto ela cresceu na etapa ("aumento_memoria_mb"; numa
+    etapa acumulada, o maior aumento entre as execuções) e o pico do processo
+    até ali ("pico_processo_mb").
+    """
+    memoria_fim = memoria_atual_mb()
+    registro["memoria_mb"] = memoria_fim
+    if memoria_inicio is not None and memoria_fim is not None:
+        aumento = round(memoria_fim - memoria_inicio, 1)
+        anterior = registro.get("aumento_memoria_mb")
+        registro["aumento_memoria_mb"] = aumento if anterior is None else max(aumento, anterior)
+    else:
+        registro["aumento_memoria_mb"] = None
+    registro["pico_processo_mb"] = pico_memoria_mb()
+
+def tamanho_arquivo(caminho):
+    """Tamanho do arquivo em bytes (None se não existir)."""
+    try:
+        return os.path.getsize(caminho)
+    except (OSError, TypeError):
+        return None
+
+
+class Medidor:
+    """
+    Mede as etapas do processamento de um arquivo (ou do lote).
+
+    Cada etapa gera um registro com o tempo, a memória da etapa (medir_memoria:
+    a residente ao final, quanto cresceu durante a etapa e o pico do processo
+    até ali) e os campos preenchidos por quem a executa (linhas de
+    entrada/saída, bytes lidos/gravados).
+
+    Uso:
+        medidor = Medidor("cliente.xlsx")
+        with medidor.etapa("leitura", bytes_lidos=tamanho) as registro:
+            df = ler(...)
+            registro["linhas_saida"] = len(df)
+    """
+
+    def __init__(self, arquivo):
+        self.arquivo = arquivo
+        self.registros = []
+
+    @contextlib.contextmanager
+    def etapa(self, nome, **campos):
+        registro = {"arquivo": self.arquivo, "etapa": nome, **campos}
+        memoria_inicio = memoria_atual_mb()
+        inicio = time.perf_counter()
+        try:
+            yield registro
+        except BaseException as e:
+            registro["erro"] = type(e).__name__
+            raise
+        finally:
+            registro["segundos"] = round(time.perf_counter() - inicio, 6)
+            medir_memoria(registro, memoria_inicio)
+            registro["pid"] = os.getpid()
+            self.registros.append(registro)
+
+    @contextlib.contextmanager
+    def etapa_acumulada(self, nome, **campos):
+        """
+        Como etapa, mas repetida (uma vez por bloco, no modo em blocos): todas
+        as execuções vão para um único registro, com os tempos e os campos
+        numéricos (linhas, bytes) somados e o maior aumento de memória.
+        """
+        registro = next((registro for registro in self.registros if registro["etapa"] == nome), None)
+        if registro is None:
+            registro = {"arquivo": self.arquivo, "etapa": nome, **campos, "vezes": 0, "segundos": 0.0}
+            self.registros.append(registro)
+        parcial = {}
+        memoria_inicio = memoria_atual_mb()
+        inicio = time.perf_counter()
+        try:
+            yield parcial
+        except BaseException as e:
+            registro["erro"] = type(e).__name__
+            raise
+        finally:
+            registro["segundos"] = round(registro["segundos"] + time.perf_counter() - inicio, 6)
+            registro["vezes"] += 1
+            for campo, valor in parcial.items():
+                if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+                    registro[campo] = registro.get(campo, 0) + valor
+                else:
+                    registro[campo] = valor
+            medir_memoria(registro, memoria_inicio)
+            registro["pid"] = os.getpid()
+
+
+class ArquivoMetricas:
+    """
+    Grava as métricas de uma execução em JSON lines (um registro por linha).
+    Todos os registros da execução levam o mesmo identificador ("execucao"),
+    e o arquivo é acrescentado a cada execução, para comparar rodadas.
+    Só o processo principal grava; os processos paralelos devolvem seus
+    registros no resultado de cada arquivo.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.execucao = f"{datetime.datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+
+    def registrar(self, registros):
+        """Acrescenta os registros ao arquivo."""
+        with open(self.caminho, "a", encoding="utf-8") as f:
+            for registro in registros:
+                f.write(json.dumps({"execucao": self.execucao, **registro}, ensure_ascii=False) + "\n")
+
+
+@contextlib.contextmanager
+def perfilar(pasta_perfil, caminho_entrada):
+    """
+    Executa o bloco sob o cProfile e grava {nome do arquivo, com a extensão}.prof
+    na pasta informada (para abrir com pstats ou snakeviz). Sem pasta, não faz nada.
+    """
+    if not pasta_perfil:
+        yield
+        return
+
+    perfil = cProfile.Profile()
+    perfil.enable()
+    try:
+        yield
+    finally:
+        perfil.disable()
+        perfil.dump_stats(reservar_perfil(pasta_perfil, os.path.basename(caminho_entrada)))
+
+def reservar_perfil(pasta_perfil, nome):
+    """
+    Cria, vazio, o arquivo {nome}.prof ou, se já existir (o mesmo arquivo
+    processado de novo no lote, ou outro processo chegou antes), {nome}_2.prof,
+    {nome}_3.prof... Retorna o caminho reservado.
+    """
+    numero = 1
+    while True:
+        caminho = os.path.join(pasta_perfil, f"{nome}.prof" if numero == 1 else f"{nome}_{numero}.prof")
+        try:
+            with open(caminho, "x"):
+                return caminho
+        except FileExistsError:
+            numero += 1
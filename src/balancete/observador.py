@@ -0,0 +1,207 @@
+import datetime
+import json
+import os
+import tempfile
+import threading
+import time
+
+from .lote import EXTENSOES_PLANILHA, nomes_saida, processar_caminhos
+from .saida import SUFIXO_LANCAMENTOS
+
+
+# Intervalo padrão entre duas varreduras da pasta, em segundos
+INTERVALO_PADRAO = 2.0
+# Tempo padrão que um arquivo precisa ficar sem mudar (tamanho e data) antes de ser processado
+ESPERA_PADRAO = 5.0
+# Nome padrão do arquivo de estado, gravado na pasta de saída
+NOME_ESTADO = ".balancete_observador.json"
+# Arquivos com erro (arquivo bloqueado, falha na conversão...) são processados de novo até
+# TENTATIVAS_ERRO vezes, com espera de ESPERA_NOVA_TENTATIVA segundos, dobrando a cada tentativa
+TENTATIVAS_ERRO = 5
+ESPERA_NOVA_TENTATIVA = 30.0
+
+
+def planilha_observavel(nome):
+    """
+    Indica se o arquivo da pasta observada deve ser processado: balancetes .xls/.xlsx/.htm/.html/.pdf,
+    exceto as de lançamentos geradas pelo próprio processamento e os arquivos
+    temporários/de bloqueio do Excel e do LibreOffice (~$..., .~lock...).
+    """
+    base, extensao = os.path.splitext(nome)
+    if extensao.lower() not in EXTENSOES_PLANILHA or nome.startswith(("~$", ".")):
+        return False
+    return not base.endswith(SUFIXO_LANCAMENTOS)
+
+def assinatura(caminho):
+    """(tamanho, data de modificação em ns) do arquivo; None se ele sumiu."""
+    try:
+        info = os.stat(caminho)
+    except OSError:
+        return None
+    return [info.st_size, info.st_mtime_ns]
+
+
+class ObservadorPasta:
+    """
+    Modo contínuo: observa a pasta de entrada e processa só as planilhas novas
+    ou modificadas, pelo mesmo caminho do lote (processar_caminhos ->
+    processar_planilha_xlsx).
+
+    A pasta é varrida a cada `intervalo` segundos. Um arquivo só é processado
+    depois de ficar `espera` segundos com o mesmo tamanho e a mesma data de
+    modificação, para não ler planilhas que ainda estão sendo copiadas.
+
+    O estado (tamanho e data de cada planilha já processada) fica em um
+    arquivo JSON; ao reiniciar, só o que mudou desde então é processado.
+    Planilhas inválidas (status "aviso") também entram no estado e só voltam a
+    ser processadas quando forem alteradas; as que deram erro, que pode ser
+    passageiro, são tentadas de novo (TENTATIVAS_ERRO, ESPERA_NOVA_TENTATIVA).
+    Um ciclo que falha é registrado e a observação continua.
+
+    Uso:
+        observador = ObservadorPasta("entrada", "saida", cache=CacheResultados())
+        observador.executar()            # até Ctrl+C ou observador.parar.set()
+    """
+
+    def __init__(self, pasta_entrada, pasta_saida, caminho_estado=None, intervalo=INTERVALO_PADRAO,
+                 espera=ESPERA_PADRAO, ao_processar=None, **opcoes_lote):
+        """
+        ao_processar(resultados): chamado ao fim de cada ciclo que processou arquivos.
+        opcoes_lote: repassadas a processar_caminhos (soffice_path, processos, opcoes,
+        cache, pasta_lancamentos, armazem, metricas...).
+        """
+        self.pasta_entrada = pasta_entrada
+        self.pasta_saida = pasta_saida
+        self.caminho_estado = caminho_estado or os.path.join(pasta_saida, NOME_ESTADO)
+        self.intervalo = intervalo
+        self.espera = espera
+        self.ao_processar = ao_processar
+        self.opcoes_lote = opcoes_lote
+        self.parar = threading.Event()
+        self.estado = self.carregar_estado()
+        # {caminho: (assinatura, instante em que foi vista pela primeira vez)}
+        self.vistos = {}
+
+    def carregar_estado(self):
+        """Lê o arquivo de estado; {caminho: entrada} vazio se ainda não existir ou estiver corrompido."""
+        try:
+            with open(self.caminho_estado, encoding="utf-8") as f:
+                return json.load(f)["arquivos"]
+        except (OSError, ValueError, KeyError):
+            return {}
+
+    def gravar_estado(self):
+        """Grava o estado em arquivo temporário e renomeia, para nunca deixá-lo pela metade."""
+        pasta = os.path.dirname(os.path.abspath(self.caminho_estado))
+        descritor, temporario = tempfile.mkstemp(prefix=".observador_", dir=pasta)
+        with os.fdopen(descritor, "w", encoding="utf-8") as f:
+            json.dump({"pasta_entrada": os.path.abspath(self.pasta_entrada), "arquivos": self.estado},
+                      f, ensure_ascii=False, indent=2)
+        os.replace(temporario, self.caminho_estado)
+
+    def prontos(self, agora=None):
+        """
+        Varre a pasta e devolve, em ordem alfabética, as planilhas novas ou
+        modificadas que já estão estáveis há `espera` segundos.
+        """
+        agora = time.monotonic() if agora is None else agora
+        prontos = []
+        presentes = set()
+        for nome in sorted(os.listdir(self.pasta_entrada)):
+            if not planilha_observavel(nome):
+                continue
+            caminho = os.path.abspath(os.path.join(self.pasta_entrada, nome))
+            atual = assinatura(caminho)
+            if atual is None:
+                continue
+            presentes.add(caminho)
+
+            processado = self.estado.get(caminho)
+            if processado is not None and processado["assinatura"] == atual:
+                self.vistos.pop(caminho, None)
+                if time.time() >= processado.get("nova_tentativa_em", float("inf")):
+                    # Erro anterior com o arquivo sem mudar: já está estável
+                    self.vistos[caminho] = (atual, agora)
+                    prontos.append(caminho)
+                continue
+            vista = self.vistos.get(caminho)
+            if vista is None or vista[0] != atual:
+                # Primeira vez ou ainda mudando: o prazo recomeça
+                self.vistos[caminho] = (atual, agora)
+                continue
+            if agora - vista[1] >= self.espera:
+                prontos.append(caminho)
+
+        # Arquivos removidos da pasta saem do estado
+        for caminho in set(self.vistos) - presentes:
+            del self.vistos[caminho]
+        removidos = set(self.estado) - presentes
+        for caminho in removidos:
+            del self.estado[caminho]
+        if removidos:
+            self.gravar_estado()
+        return prontos
+
+    def nomes(self, caminhos):
+        """
+        Nome base dos arquivos gerados para os caminhos, calculado sobre todas
+        as planilhas da pasta (nomes_saida): a.pdf que chega depois de a.xls
+        não sobrescreve o relatório dele.
+        """
+        todos = [os.path.abspath(os.path.join(self.pasta_entrada, nome))
+                 for nome in sorted(os.listdir(self.pasta_entrada)) if planilha_observavel(nome)]
+        por_caminho = dict(zip(todos, nomes_saida(todos)))
+        return [por_caminho.get(caminho) or os.path.splitext(os.path.basename(caminho))[0] for caminho in caminhos]
+
+    def ciclo(self):
+        """Uma varredura: processa as planilhas prontas e atualiza o estado. Retorna os resultados."""
+        caminhos = self.prontos()
+        if not caminhos:
+            return []
+
+        print(f"{len(caminhos)} planilha(s) nova(s) ou alterada(s) em '{self.pasta_entrada}'.")
+        # Assinatura de antes do processamento: se o arquivo mudar no meio, é processado de novo
+        assinaturas = {caminho: self.vistos[caminho][0] for caminho in caminhos}
+        resultados = processar_caminhos(caminhos, self.pasta_saida, cancelar=self.parar, nomes=self.nomes(caminhos),
+                                        **self.opcoes_lote)
+
+        agora = datetime.datetime.now().isoformat(timespec="seconds")
+        for caminho, resultado in zip(caminhos, resultados):
+            del self.vistos[caminho]
+            if resultado["status"] == "cancelado":
+                continue
+            anterior = self.estado.get(caminho)
+            entrada = {"assinatura": assinaturas[caminho], "status": resultado["status"],
+                       "relatorio": resultado["relatorio"], "processado_em": agora}
+            print(f"  {resultado['arquivo']}: {resultado['status']}"
+                  + (f" ({resultado['mensagem']})" if resultado["mensagem"] else ""))
+            if resultado["status"] == "erro":
+                repetido = (anterior is not None and anterior["status"] == "erro"
+                            and anterior["assinatura"] == assinaturas[caminho])
+                entrada["tentativas"] = anterior.get("tentativas", 1) + 1 if repetido else 1
+                if entrada["tentativas"] < TENTATIVAS_ERRO:
+                    espera = ESPERA_NOVA_TENTATIVA * 2 ** (entrada["tentativas"] - 1)
+                    entrada["nova_tentativa_em"] = time.time() + espera
+                    print(f"    nova tentativa em {espera:g}s ({entrada['tentativas']} de {TENTATIVAS_ERRO}).")
+            self.estado[caminho] = entrada
+        self.gravar_estado()
+
+        if self.ao_processar is not None:
+            self.ao_processar(resultados)
+        return resultados
+
+    def executar(self):
+        """Varre a pasta em laço até self.parar ser acionado (ou Ctrl+C)."""
+        print(f"Observando '{self.pasta_entrada}' a cada {self.intervalo:g}s "
+              f"(espera de {self.espera:g}s por arquivo). Ctrl+C para encerrar.")
+        try:
+            while not self.parar.is_set():
+                try:
+                    self.ciclo()
+                except Exception as e:
+                    # Pasta inacessível, disco cheio, falha no ao_processar...: o próximo ciclo tenta de novo
+                    print(f"Erro no ciclo de observação: {e}")
+                self.parar.wait(self.intervalo)
+        except KeyboardInterrupt:
+            pass
+        print("Observação encerrada.")
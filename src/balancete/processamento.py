@@ -0,0 +1,821 @@
+import pandas as pd
+import numpy as np
+import re
+import os
+from collections import defaultdict
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from .composicao import LIMITE_RAMIFICAR, SEGUNDOS_COMPOSICAO, explicar_diferenca
+from .leitura import FormatoNaoSuportado, iterar_linhas, ler_planilha
+from .metricas import Medidor, perfilar, tamanho_arquivo
+from .regras import ClassificadorHistorico
+from .saida import gravar_colunar, gravar_lancamentos
+
+
+# Versão da lógica de processamento: deve mudar sempre que a mesma planilha
+# puder gerar um relatório diferente (invalida o cache de resultados)
+VERSAO_PROCESSAMENTO = "10"
+
+# --- REGEX ---
+# Expressão única das regras padrão (Aquisição/Pagamento), com um grupo por regra
+# para o número da nota fiscal; as regras configuráveis ficam em regras.py
+padrao_movimentacao = ClassificadorHistorico().padrao
+# Valor em texto no formato brasileiro: 1.234,56 | -1.234,56 | 1.234,56- | (1.234,56) | 1.234,56 D | R$ 1.234,56
+padrao_valor_br = re.compile(
+    r'(?P<abre>\()?\s*(?:R\$)?\s*(?P<menos>-)?\s*(?:R\$)?\s*'
+    r'(?P<inteiro>\d{1,3}(?:\.\d{3})+|\d+)(?:,(?P<fracao>\d+))?'
+    r'\s*(?P<menos_fim>-)?\s*(?P<fecha>\))?\s*(?P<natureza>[DC])?',
+    re.IGNORECASE,
+)
+# Caso comum (1.234,56 | 1234,56): tirando os separadores, os dígitos são os centavos
+# (alternativas agrupadas: o fullmatch do pyarrow não agrupa a alternância sozinho)
+padrao_valor_br_simples = r'(?:\d{1,3}(?:\.\d{3}){0,4}|\d{1,13}),\d{2}'
+# Dígitos da parte inteira até os quais o valor é convertido em centavos inteiros (como em centavos())
+DIGITOS_CENTAVOS = 13
+
+# Linhas de cada bloco na leitura em blocos (OpcoesProcessamento.linhas_por_bloco)
+LINHAS_POR_BLOCO_LEITURA = 100000
+# Acima desta quantidade de notas com saldo, a composição da diferença do saldo anterior não é buscada
+LIMITE_NOTAS_COMPOSICAO = 100000
+# Situações das notas no relatório (resultado["situacao"]["notas"]) e da verificação do saldo anterior
+SITUACOES_NOTA = ("ok", "sem_pagamento", "sem_aquisicao", "diferenca")
+SITUACOES_SALDO = ("ok", "diferenca", "nao_existe_aquisicao")
+
+
+# --- FUNÇÕES AUXILIARES ---
+def parse_valor_br(s: str) -> Decimal:
+    """Converte uma string de valor em formato brasileiro para Decimal (formatos de padrao_valor_br)."""
+    try:
+        if isinstance(s, (int, float)):
+            return Decimal(str(s))
+        partes = padrao_valor_br.fullmatch(str(s).strip())
+        if partes and bool(partes["abre"]) == bool(partes["fecha"]):
+            valor = Decimal(partes["inteiro"].replace(".", "") + "." + (partes["fracao"] or "0"))
+            return -valor if partes["abre"] or partes["menos"] or partes["menos_fim"] else valor
+        s = str(s).replace(".", "").replace(",", ".")
+        return Decimal(s)
+    except InvalidOperation:
+        return Decimal("0.00")
+
+def converter_valores_br(serie, credor_negativo=False):
+    """
+    Converte uma coluna de valores numa passada vetorizada. Números passam
+    direto; textos no formato brasileiro (padrao_valor_br: separador de
+    milhar, vírgula decimal, negativos entre parênteses ou com o sinal no fim,
+    sufixo D/C) viram centavos inteiros exatos e, então, reais. Textos fora
+    desse formato ainda são tentados como número comum ("1234.56").
+    O sufixo D/C só indica a natureza; com credor_negativo (coluna Saldo),
+    o C torna o valor negativo.
+    Retorna (Series float64, células não reconhecidas). Vazios, espaços e "-"
+    valem 0 e não contam como falha.
+    """
+    if pd.api.types.infer_dtype(serie, skipna=True) not in ("string", "mixed", "mixed-integer", "empty"):
+        # Sem nenhum texto: o caminho numérico de sempre
+        valores = pd.to_numeric(serie, errors='coerce')
+        falhas = int((valores.isna() & serie.notna()).sum())
+        return valores.fillna(0).astype(np.float64), falhas
+
+    tipo = pd.api.types.infer_dtype(serie, skipna=True)
+    e_texto = (serie.notna() if tipo == "string" else serie.map(lambda valor: isinstance(valor, str))).to_numpy(bool)
+    valores = pd.to_numeric(serie.where(~e_texto), errors='coerce').to_numpy(dtype=np.float64)
+    vazio = serie.isna().to_numpy()
+
+    posicoes = np.flatnonzero(e_texto)
+    textos = serie.iloc[posicoes]
+    try:
+        # Com o pyarrow, as operações de texto abaixo rodam em C++, sem um objeto Python por célula
+        textos = textos.astype("string[pyarrow]")
+    except ImportError:
+        pass
+    textos = textos.str.strip()
+    vazios = textos.isin(["", "-"]).to_numpy(dtype=bool)
+    vazio[posicoes[vazios]] = True
+
+    simples = textos.str.fullmatch(padrao_valor_br_simples).to_numpy(dtype=bool) & ~vazios
+    digitos = textos[simples].str.replace(".", "", regex=False).str.replace(",", "", regex=False)
+    valores[posicoes[simples]] = digitos.astype(np.int64).to_numpy() / 100
+
+    # Demais formatos (sinal, parênteses, D/C, R$, outras casas decimais): um padrão com grupos;
+    # o índice passa a ser a posição na coluna
+    resto = ~simples & ~vazios
+    textos = pd.Series(textos[resto].to_numpy(dtype=object), index=posicoes[resto], dtype=object)
+    partes = textos.str.extract(f"^{padrao_valor_br.pattern}$", flags=re.IGNORECASE)
+    validos = partes["inteiro"].notna() & (partes["abre"].isna() == partes["fecha"].isna())
+    partes = partes[validos]
+    inteiro = partes["inteiro"].str.replace(".", "", regex=False)
+    fracao = partes["fracao"].fillna("")
+    # Até duas casas decimais (e DIGITOS_CENTAVOS na parte inteira): centavos inteiros, sem passar por float
+    exatos = (fracao.str.len() <= 2) & (inteiro.str.len() <= DIGITOS_CENTAVOS)
+    reais = pd.Series(np.nan, index=partes.index, dtype=np.float64)
+    if exatos.any():
+        centavos_texto = (inteiro[exatos].astype(np.int64) * 100
+                          + fracao[exatos].str.ljust(2, "0").astype(np.int64))
+        reais[exatos] = centavos_texto / 100
+    if not exatos.all():
+        reais[~exatos] = (inteiro[~exatos] + "." + fracao[~exatos]).astype(np.float64)
+    negativo = partes["abre"].notna() | partes["menos"].notna() | partes["menos_fim"].notna()
+    if credor_negativo:
+        negativo = negativo | partes["natureza"].str.upper().eq("C")
+    valores[reais.index.to_numpy()] = reais.where(~negativo, -reais).to_numpy()
+
+    # Textos fora do formato brasileiro: número comum, como o pd.to_numeric fazia com a coluna inteira
+    outros = textos[~validos]
+    if len(outros):
+        valores[outros.index.to_numpy()] = pd.to_numeric(outros, errors='coerce').to_numpy(dtype=np.float64)
+
+    falhas = int((np.isnan(valores) & ~vazio).sum())
+    return pd.Series(valores, index=serie.index).fillna(0), falhas
+
+def fmt_br(d: Decimal) -> str:
+    """Formata um Decimal para string de valor em formato brasileiro."""
+    if not isinstance(d, Decimal):
+        d = Decimal(str(d))
+    return f"{d:.2f}".replace(".", ",")
+
+def novo_resultado(caminho_entrada):
+    """Cria o dicionário de resultado devolvido pelo processamento de um arquivo."""
+    return {
+        "arquivo": os.path.basename(caminho_entrada),
+        "status": "erro",
+        "mensagem": None,
+        "relatorio": None,
+        "lancamentos": None,
+        "notas": 0,
+        "saldo_anterior": None,
+        "colunar": None,
+        "regras": None,
+        "contas": None,
+        "situacao": None,
+        "valores_invalidos": None,
+        "cache": False,
+    }
+
+
+class PlanilhaInvalida(Exception):
+    """Indica que a planilha não tem o cabeçalho ou as colunas esperadas."""
+
+
+@dataclass
+class OpcoesProcessamento:
+    """
+    Opções do processamento de cada arquivo.
+    leitura: "streaming" percorre a planilha linha a linha e guarda só as colunas
+             usadas; "completa" carrega a aba inteira com pd.read_excel; "blocos"
+             lê, normaliza, soma por nota e grava `linhas_por_bloco` linhas de cada
+             vez (ver blocos.py), com memória constante qualquer que seja o tamanho.
+    formato_lancamentos: formato da planilha de lançamentos ("xlsx", "csv" ou "parquet").
+    regras: regras de classificação do histórico (ver regras.py); None usa
+            REGRAS_PADRAO. Mudam o resultado, então entram no repr (e no cache).
+    segundos_composicao: tempo máximo da busca das notas que explicam a
+                         diferença do saldo anterior (ver composicao.py); 0,
+                         o padrão, desliga a busca. Muda o relatório, então
+                         entra no repr.
+    por_conta: lê todas as abas e concilia cada conta contábil (bloco com seu
+               cabeçalho e seu SALDO ANTERIOR) à parte, com uma seção por conta
+               no relatório (ver contas.py). Lê como o "streaming", qualquer que
+               seja `leitura`. Muda o resultado, então entra no repr.
+    linhas_por_bloco: linhas de cada bloco na leitura "blocos" (só muda a memória
+                      usada; fica fora do repr).
+    pasta_perfil: se informada, cada arquivo é processado sob o cProfile e o perfil
+                  é gravado nessa pasta. Não muda o resultado, por isso fica fora
+                  do repr (e da chave do cache).
+    processos_pdf: processos que extraem as páginas de um PDF em paralelo
+                   (só muda a velocidade; fica fora do repr).
+    processos_contas: com por_conta, processos que conciliam as contas grandes
+                      em paralelo (só muda a velocidade; fica fora do repr).
+    indexar_notas: devolve também os totais por nota fiscal e o período em
+                   resultado["indice_notas"], para o índice entre períodos
+                   (IndiceNotas). Também fica fora do repr.
+    """
+    leitura: str = "streaming"
+    formato_lancamentos: str = "xlsx"
+    regras: list = None
+    segundos_composicao: float = SEGUNDOS_COMPOSICAO
+    por_conta: bool = False
+    linhas_por_bloco: int = field(default=LINHAS_POR_BLOCO_LEITURA, repr=False)
+    pasta_perfil: str = field(default=None, repr=False)
+    processos_pdf: int = field(default=1, repr=False)
+    processos_contas: int = field(default=1, repr=False)
+    indexar_notas: bool = field(default=False, repr=False)
+
+
+# Colunas extraídas da planilha, na ordem usada em df_final
+COLUNAS_LANCAMENTOS = ['Data', 'Texto_Completo', 'Débito', 'Crédito', 'Saldo']
+# Trechos procurados na linha de cabeçalho para cada coluna de COLUNAS_LANCAMENTOS
+PADROES_CABECALHO = ['DATA', 'CONTRAPARTIDA/HISTÓRICO', 'DÉBITO', 'CRÉDITO', 'SALDO-EXERCÍCIO']
+
+
+def linha_e_cabecalho(celulas):
+    """Indica se a linha é o cabeçalho (tem as células DÉBITO e CRÉDITO)."""
+    row_str = [str(x).upper() for x in celulas]
+    return 'DÉBITO' in row_str and 'CRÉDITO' in row_str
+
+def linha_tem_saldo_anterior(celulas):
+    """Indica se alguma célula da linha contém 'SALDO ANTERIOR'."""
+    return any("SALDO ANTERIOR" in str(cell).upper() for cell in celulas)
+
+def localizar_colunas(celulas):
+    """
+    Encontra, na linha de cabeçalho, o índice de cada coluna de COLUNAS_LANCAMENTOS
+    (a primeira célula que contém o trecho, sem diferenciar maiúsculas).
+    Levanta PlanilhaInvalida se faltar alguma coluna essencial; só SALDO-EXERCÍCIO é opcional.
+    """
+    indices = []
+    for padrao in PADROES_CABECALHO:
+        indices.append(next((i for i, x in enumerate(celulas) if re.search(padrao, str(x), re.IGNORECASE)), None))
+
+    if any(idx is None for idx in indices[:4]):
+        raise PlanilhaInvalida("Colunas essenciais não encontradas")
+    return indices
+
+def valor_saldo_anterior(saldo_anterior_bruto):
+    """Converte o valor da linha SALDO ANTERIOR, sempre positivo."""
+    saldoAnterior_val = Decimal("0.00")
+    try:
+        saldoAnterior_val = parse_valor_br(saldo_anterior_bruto)
+        saldoAnterior_val = (saldoAnterior_val * -1 if saldoAnterior_val < 0 else saldoAnterior_val)
+
+        print(f"Saldo Anterior extraído: {fmt_br(saldoAnterior_val)}")
+    except (IndexError, KeyError, InvalidOperation):
+        print("Aviso: Não foi possível extrair o Saldo Anterior.")
+    return saldoAnterior_val
+
+def localizar_estrutura(df_bruto):
+    """
+    Localiza, numa única varredura vetorizada (coluna a coluna), a linha de
+    cabeçalho, os índices das colunas de interesse e a primeira linha com
+    'SALDO ANTERIOR' a partir do cabeçalho.
+    Retorna (row_with_headers, indices, indice_saldo ou None).
+    Levanta PlanilhaInvalida se o cabeçalho ou as colunas essenciais faltarem.
+    """
+    tem_debito = np.zeros(len(df_bruto), dtype=bool)
+    tem_credito = np.zeros(len(df_bruto), dtype=bool)
+    tem_saldo = np.zeros(len(df_bruto), dtype=bool)
+    for coluna in df_bruto.columns:
+        serie = df_bruto[coluna]
+        # Colunas numéricas, booleanas ou de datas não podem conter os textos procurados
+        if serie.dtype.kind in "biufcmM":
+            continue
+        texto = serie.astype(str).str.upper()
+        tem_debito |= (texto == 'DÉBITO').to_numpy()
+        tem_credito |= (texto == 'CRÉDITO').to_numpy()
+        tem_saldo |= texto.str.contains('SALDO ANTERIOR', regex=False).to_numpy()
+
+    cabecalhos = np.flatnonzero(tem_debito & tem_credito)
+    if len(cabecalhos) == 0:
+        raise PlanilhaInvalida("Linha de cabeçalho não encontrada")
+    row_with_headers = int(cabecalhos[0])
+
+    indices = localizar_colunas(df_bruto.iloc[row_with_headers])
+
+    saldos = np.flatnonzero(tem_saldo[row_with_headers:])
+    indice_saldo = row_with_headers + int(saldos[0]) if len(saldos) else None
+    return row_with_headers, indices, indice_saldo
+
+def extrair_dados_completo(caminho_entrada, processos_pdf=1):
+    """
+    Lê a aba inteira com pd.read_excel e separa as colunas de interesse.
+    Retorna (df_final com COLUNAS_LANCAMENTOS ainda brutas, saldo anterior).
+    """
+    # Lê o arquivo completo sem cabeçalho para ter controle total
+    df_bruto = ler_planilha(caminho_entrada, processos_pdf)
+
+    # Encontra a linha de cabeçalho, os índices das colunas de interesse e a linha do saldo anterior
+    row_with_headers, indices, indice_saldo = localizar_estrutura(df_bruto)
+    col_index_saldo = indices[4]
+
+    # Extrai o saldo anterior procurando pela descrição na coluna de histórico
+    saldoAnterior_val = Decimal("0.00")
+    if col_index_saldo is not None:
+        if indice_saldo is not None:
+            saldoAnterior_val = valor_saldo_anterior(df_bruto.iloc[indice_saldo, col_index_saldo])
+        else:
+            print("Aviso: 'SALDO ANTERIOR' não encontrado na planilha.")
+
+    # Seleciona os dados a partir da linha seguinte à do cabeçalho
+    df_final = df_bruto.iloc[row_with_headers + 1:, [idx for idx in indices if idx is not None]].copy()
+    df_final.columns = [nome for nome, idx in zip(COLUNAS_LANCAMENTOS, indices) if idx is not None]
+    df_final = df_final.reindex(columns=COLUNAS_LANCAMENTOS)
+    return df_final, saldoAnterior_val
+
+def montar_bloco(colunas):
+    """DataFrame com COLUNAS_LANCAMENTOS (ainda brutas) a partir das listas de valores de cada coluna."""
+    return pd.DataFrame({nome: pd.Series(coluna, dtype=object) for nome, coluna in zip(COLUNAS_LANCAMENTOS, colunas)})
+
+
+class LeitorLancamentos:
+    """
+    Percorre a planilha linha a linha (iterar_linhas): localiza o cabeçalho e o
+    SALDO ANTERIOR durante a leitura e guarda apenas as colunas de interesse,
+    sem manter a aba inteira em memória.
+
+    blocos() entrega os lançamentos em DataFrames de até `linhas_por_bloco`
+    linhas (sem limite, um bloco só) e sempre entrega ao menos um bloco, mesmo
+    vazio. O saldo anterior fica em self.saldo_anterior assim que é encontrado.
+    """
+
+    def __init__(self, caminho_entrada, processos_pdf=1):
+        self.caminho_entrada = caminho_entrada
+        self.processos_pdf = processos_pdf
+        self.saldo_anterior = Decimal("0.00")
+
+    def blocos(self, linhas_por_bloco=None):
+        linhas = iterar_linhas(self.caminho_entrada, self.processos_pdf)
+
+        # Encontra a linha de cabeçalho
+        for celulas in linhas:
+            if linha_e_cabecalho(celulas):
+                break
+        else:
+            raise PlanilhaInvalida("Linha de cabeçalho não encontrada")
+
+        indices = localizar_colunas(celulas)
+        col_index_saldo = indices[4]
+
+        # A busca pelo SALDO ANTERIOR começa na própria linha de cabeçalho
+        achou_saldo = col_index_saldo is not None and linha_tem_saldo_anterior(celulas)
+        if achou_saldo:
+            self.saldo_anterior = valor_saldo_anterior(celulas[col_index_saldo])
+
+        colunas = [[] for _ in COLUNAS_LANCAMENTOS]
+        for celulas in linhas:
+            if not achou_saldo and col_index_saldo is not None and linha_tem_saldo_anterior(celulas):
+                achou_saldo = True
+                self.saldo_anterior = valor_saldo_anterior(
+                    celulas[col_index_saldo] if col_index_saldo < len(celulas) else None)
+            for coluna, idx in zip(colunas, indices):
+                coluna.append(celulas[idx] if idx is not None and idx < len(celulas) else None)
+            if linhas_por_bloco and len(colunas[0]) >= linhas_por_bloco:
+                yield montar_bloco(colunas)
+                colunas = [[] for _ in COLUNAS_LANCAMENTOS]
+
+        if col_index_saldo is not None and not achou_saldo:
+            print("Aviso: 'SALDO ANTERIOR' não encontrado na planilha.")
+        yield montar_bloco(colunas)
+
+def extrair_dados_streaming(caminho_entrada, processos_pdf=1):
+    """
+    Lê a planilha com o LeitorLancamentos, num bloco só.
+    Retorna (df_final com COLUNAS_LANCAMENTOS ainda brutas, saldo anterior).
+    """
+    leitor = LeitorLancamentos(caminho_entrada, processos_pdf)
+    [df_final] = leitor.blocos()
+    return df_final, leitor.saldo_anterior
+
+def normalizar_lancamentos(df_final, classificador=None, invalidos=None):
+    """
+    Converte datas e valores, extrai Descrição/Número do histórico e mantém só
+    as linhas de movimentação com nota fiscal.
+    classificador: ClassificadorHistorico (padrão: regras padrão).
+    invalidos: dicionário onde somar, por coluna, os valores não reconhecidos
+    (que ficam 0) nas linhas mantidas; ver aviso_valores_invalidos.
+    Retorna (df_final, linhas classificadas por regra).
+    """
+    # Converte 'Data' para o formato correto e remove linhas inválidas
+    df_final['Data'] = pd.to_datetime(df_final['Data'], errors='coerce')
+    #
+    df_final.dropna(subset=['Data'], inplace=True)
+    #
+
+    # Extrai Descrição e Número da coluna de texto (todas as regras numa passada)
+    classificador = classificador or ClassificadorHistorico()
+    df_final['Descrição'], df_final['Numero'], contagem = classificador.classificar(df_final['Texto_Completo'])
+
+    # Remove linhas que não tenham a descrição ou o número
+    #
+    df_final.dropna(subset=['Descrição', 'Numero'], inplace=True)
+    #
+
+    # Converte as colunas de valores para numérico (sempre float64, para que o tipo
+    # não dependa de quais linhas estão na tabela: igual na planilha inteira e em blocos)
+    for coluna in ('Débito', 'Crédito', 'Saldo'):
+        df_final[coluna], falhas = converter_valores_br(df_final[coluna], credor_negativo=coluna == 'Saldo')
+        if invalidos is not None and falhas:
+            invalidos[coluna] = invalidos.get(coluna, 0) + falhas
+
+    # Reseta o índice para começar do zero
+    return df_final.reset_index(drop=True), contagem
+
+def aviso_valores_invalidos(caminho_entrada, invalidos):
+    """Avisa quantos valores de cada coluna não foram reconhecidos e ficaram 0 (nada se todos foram)."""
+    if invalidos:
+        colunas = ", ".join(f"{coluna}: {quantidade}" for coluna, quantidade in invalidos.items())
+        print(f"Aviso: valores não reconhecidos em '{os.path.basename(caminho_entrada)}' foram considerados 0 "
+              f"({colunas}).")
+
+def aviso_colunar(caminho_entrada, erro):
+    """
+    Avisa que os lançamentos não foram gravados na base colunar. A base é um
+    extra: o relatório do arquivo continua sendo gerado.
+    """
+    print(f"Aviso: lançamentos de '{os.path.basename(caminho_entrada)}' não gravados na base colunar: {erro}")
+
+def centavos(valores):
+    """
+    Converte uma coluna numérica em centavos (int64).
+    Retorna None se algum valor não for exato em centavos; nesse caso o cálculo
+    em Decimal (gerar_relatorio_decimal) deve ser usado.
+    """
+    valores = np.asarray(valores, dtype=np.float64)
+    inteiros = np.rint(valores * 100)
+    # Até 15 dígitos, n/100 == valor garante que Decimal(str(valor)) == n/100
+    exatos = np.isfinite(valores) & (np.abs(inteiros) < 1e15) & (inteiros / 100 == valores)
+    if not exatos.all():
+        return None
+    return inteiros.astype(np.int64)
+
+def fmt_centavos(c) -> str:
+    """Formata um valor em centavos como fmt_br (ex.: -123456 -> '-1234,56')."""
+    c = int(c)
+    sinal = "-" if c < 0 else ""
+    return f"{sinal}{abs(c) // 100},{abs(c) % 100:02d}"
+
+def somar_por_nota(df_final):
+    """
+    Soma Débito e Crédito por nota fiscal, em centavos, na ordem em que as notas
+    aparecem na planilha. Retorna (numeros, credito, debito) ou None se algum
+    valor não for exato em centavos.
+    """
+    debito = centavos(df_final['Débito'])
+    credito = centavos(df_final['Crédito'])
+    if debito is None or credito is None:
+        return None
+
+    codigos, numeros = pd.factorize(df_final['Numero'].astype(str), sort=False)
+    quantidade = len(numeros)
+    soma_debito = np.zeros(quantidade, dtype=np.int64)
+    soma_credito = np.zeros(quantidade, dtype=np.int64)
+    np.add.at(soma_debito, codigos, debito)
+    np.add.at(soma_credito, codigos, credito)
+    return np.asarray(numeros, dtype=object), soma_credito, soma_debito
+
+def totais_por_nota(df_final):
+    """
+    Totais de cada nota fiscal do arquivo para o índice entre períodos:
+    {"inicio", "fim" (datas dos lançamentos), "notas": [[numero, credito, debito], ...]},
+    com os valores em centavos. None se o arquivo não tiver lançamentos com nota.
+    """
+    if df_final.empty:
+        return None
+
+    somas = somar_por_nota(df_final)
+    if somas is None:
+        # Valores com mais de duas casas: soma em Decimal e arredonda para centavos
+        notas = defaultdict(lambda: [Decimal("0.00"), Decimal("0.00")])
+        for nf, credito, debito in zip(df_final['Numero'].astype(str), df_final['Crédito'], df_final['Débito']):
+            notas[nf][0] += parse_valor_br(credito)
+            notas[nf][1] += parse_valor_br(debito)
+        numeros = list(notas)
+        credito = [int((c * 100).quantize(Decimal("1"))) for c, _ in notas.values()]
+        debito = [int((d * 100).quantize(Decimal("1"))) for _, d in notas.values()]
+    else:
+        numeros, credito, debito = somas[0].tolist(), somas[1].tolist(), somas[2].tolist()
+
+    return {
+        "inicio": f"{df_final['Data'].min():%Y-%m-%d}",
+        "fim": f"{df_final['Data'].max():%Y-%m-%d}",
+        "notas": [[str(nf), c, d] for nf, c, d in zip(numeros, credito, debito) if c or d],
+    }
+
+def nova_situacao():
+    """
+    Situação do relatório de um arquivo, para o consolidado do lote: quantidade
+    de notas e somas (em centavos) por situação da nota e a verificação do
+    saldo anterior. Preenchida pelas funções do relatório.
+    """
+    return {
+        "notas": {nome: {"notas": 0, "credito": 0, "debito": 0} for nome in SITUACOES_NOTA},
+        "saldo": None,
+        "saldo_anterior": 0,
+        "debito_sem_aquisicao": 0,
+        "diferenca": 0,
+    }
+
+def somar_situacoes(situacoes):
+    """Junta as situações de várias contas: soma notas e valores; o saldo só fica ok se todas ficarem."""
+    total = nova_situacao()
+    for situacao in situacoes:
+        for nome, somas in situacao["notas"].items():
+            for campo, valor in somas.items():
+                total["notas"][nome][campo] += valor
+        for campo in ("saldo_anterior", "debito_sem_aquisicao", "diferenca"):
+            total[campo] += situacao[campo]
+    vereditos = {situacao["saldo"] for situacao in situacoes}
+    total["saldo"] = next((veredito for veredito in ("diferenca", "ok", "nao_existe_aquisicao") if veredito in vereditos),
+                          None)
+    return total
+
+def gerar_relatorio(df_final, saldoAnterior_val, segundos_composicao=SEGUNDOS_COMPOSICAO, situacao=None):
+    """
+    Soma Débito e Crédito por nota fiscal e monta as linhas do relatório .txt,
+    terminando com a verificação do saldo anterior (e, havendo diferença, as
+    combinações de notas que a explicam). Se `situacao` (nova_situacao) for
+    informada, é preenchida com os totais por situação e o veredito do saldo.
+    Os valores são somados como centavos inteiros e os status são classificados
+    por operações sobre arrays; o texto gerado é o mesmo do cálculo em Decimal.
+    """
+    somas = somar_por_nota(df_final)
+    if somas is None:
+        return gerar_relatorio_decimal(df_final, saldoAnterior_val, segundos_composicao, situacao)
+    return relatorio_centavos(*somas, saldoAnterior_val, segundos_composicao, situacao)
+
+def relatorio_centavos(numeros, credito, debito, saldoAnterior_val, segundos_composicao=SEGUNDOS_COMPOSICAO,
+                       situacao=None):
+    """Linhas do relatório a partir das somas por nota em centavos (ver somar_por_nota)."""
+    # --- ENGENHARIA E CÁLCULOS (lógica similar à do PDF) ---
+    # Notas sem nenhum valor não entram no relatório
+    movimentadas = (credito != 0) | (debito != 0)
+    numeros, credito, debito = numeros[movimentadas], credito[movimentadas], debito[movimentadas]
+
+    sem_pagamento = (credito > 0) & (debito == 0)
+    sem_aquisicao = (debito > 0) & (credito == 0)
+    status = np.select(
+        [sem_pagamento, sem_aquisicao, credito == debito],
+        ["Sem pagamento registrado", "Sem aquisição registrada", "OK"],
+        default="",
+    )
+
+    if situacao is not None:
+        conferem = credito == debito
+        diferenca = ~(sem_pagamento | sem_aquisicao | conferem)
+        for nome, mascara in zip(SITUACOES_NOTA, (conferem, sem_pagamento, sem_aquisicao, diferenca)):
+            situacao["notas"][nome] = {"notas": int(mascara.sum()), "credito": int(credito[mascara].sum()),
+                                       "debito": int(debito[mascara].sum())}
+
+    # GERAR RELATÓRIO .txt
+    relatorio = []
+    for nf, c, d, st in zip(numeros, credito.tolist(), debito.tolist(), status.tolist()):
+        if not st:
+            st = f"Diferença {fmt_centavos(c - d)}"
+        relatorio.append(f"NF {nf} -> Crédito: {fmt_centavos(c)} | Débito: {fmt_centavos(d)} | {st}")
+
+    somaSomenteDebito = Decimal(int(debito[sem_aquisicao].sum())) / 100
+    relatorio.append(linha_saldo_anterior(somaSomenteDebito, saldoAnterior_val, situacao))
+    com_saldo = credito != debito
+    relatorio.extend(linhas_composicao(zip(numeros[com_saldo], credito[com_saldo].tolist(), debito[com_saldo].tolist()),
+                                       int(com_saldo.sum()), somaSomenteDebito, saldoAnterior_val, segundos_composicao))
+    return relatorio
+
+def gerar_relatorio_decimal(df_final, saldoAnterior_val, segundos_composicao=SEGUNDOS_COMPOSICAO, situacao=None):
+    """
+    Versão linha a linha, em Decimal, de gerar_relatorio.
+    Usada quando algum valor não é exato em centavos (ex.: mais de duas casas
+    decimais), para que o relatório continue idêntico ao cálculo original.
+    """
+    # --- ENGENHARIA E CÁLCULOS (lógica similar à do PDF) ---
+    notas = defaultdict(lambda: {"credito": Decimal("0.00"), "debito": Decimal("0.00")})
+
+    for _, row in df_final.iterrows():
+        nf = str(row['Numero'])
+        debito_val = parse_valor_br(row['Débito'])
+        credito_val = parse_valor_br(row['Crédito'])
+
+        # A lógica é simplificada aqui para somar diretamente os valores
+        notas[nf]["debito"] += debito_val
+        notas[nf]["credito"] += credito_val
+
+    return list(relatorio_decimal(((nf, valores["credito"], valores["debito"]) for nf, valores in notas.items()),
+                                  saldoAnterior_val, segundos_composicao, situacao))
+
+def relatorio_decimal(notas, saldoAnterior_val, segundos_composicao=SEGUNDOS_COMPOSICAO, situacao=None):
+    """
+    Gera as linhas do relatório, uma nota por vez, a partir de (nf, credito, debito)
+    em Decimal, terminando com a verificação do saldo anterior. As notas com
+    saldo são guardadas em centavos (até LIMITE_NOTAS_COMPOSICAO) para a
+    composição da diferença.
+    """
+    somaSomenteDebito = 0
+    com_saldo = []
+    quantidade_com_saldo = 0
+
+    # GERAR RELATÓRIO .txt
+    for nf, credito, debito in notas:
+        if credito == 0 and debito == 0:
+            continue
+
+        diferenca = credito - debito
+        status = ""
+        if credito > 0 and debito == 0:
+            status = "Sem pagamento registrado"
+            nome = "sem_pagamento"
+        elif debito > 0 and credito == 0:
+            status = "Sem aquisição registrada"
+            nome = "sem_aquisicao"
+
+            somaSomenteDebito += debito
+
+        elif abs(diferenca) < Decimal("0.01"):
+            status = "OK"
+            nome = "ok"
+        else:
+            status = f"Diferença {fmt_br(diferenca)}"
+            nome = "diferenca"
+
+        if situacao is not None:
+            somas = situacao["notas"][nome]
+            somas["notas"] += 1
+            somas["credito"] += centavos_decimal(credito)
+            somas["debito"] += centavos_decimal(debito)
+
+        if credito != debito:
+            quantidade_com_saldo += 1
+            if quantidade_com_saldo <= LIMITE_NOTAS_COMPOSICAO:
+                com_saldo.append((nf, centavos_decimal(credito), centavos_decimal(debito)))
+
+        yield f"NF {nf} -> Crédito: {fmt_br(credito)} | Débito: {fmt_br(debito)} | {status}"
+
+    yield linha_saldo_anterior(somaSomenteDebito, saldoAnterior_val, situacao)
+    yield from linhas_composicao(com_saldo, quantidade_com_saldo, somaSomenteDebito, saldoAnterior_val,
+                                 segundos_composicao)
+
+def centavos_decimal(valor):
+    """Valor em Decimal arredondado para centavos inteiros."""
+    return int((Decimal(valor) * 100).quantize(Decimal("1")))
+
+def linha_saldo_anterior(somaSomenteDebito, saldoAnterior_val, situacao=None):
+    """
+    Monta a linha do relatório que compara o débito sem aquisição com o saldo
+    anterior; o veredito (SITUACOES_SALDO) vai também em `situacao`, se informada.
+    """
+    print(f"Soma Débito {somaSomenteDebito}")
+    print(f"Saldo Anterior {saldoAnterior_val}")
+
+    if somaSomenteDebito > 0:
+        print("Cálculo Saldo Anterior")
+
+        diferenca = somaSomenteDebito - saldoAnterior_val
+
+        if abs(diferenca) < Decimal("0.01"):
+            status = f"| Saldo Anterior OK | Saldo Anterior {fmt_br(saldoAnterior_val)}    Débito Sem Aquisição Registrada {fmt_br(somaSomenteDebito)}"
+            veredito = "ok"
+        else:
+            status = f"| Saldo Anterior Diferença {fmt_br(diferenca)} | Saldo Anterior {fmt_br(saldoAnterior_val)}    Débito Sem Aquisição Registrada {fmt_br(somaSomenteDebito)}"
+            veredito = "diferenca"
+    else:
+        status = f"| Saldo Anterior OK | Saldo Anterior {fmt_br(saldoAnterior_val)}    Não existe Aquisição Registrada"
+        veredito = "nao_existe_aquisicao"
+
+    if situacao is not None:
+        situacao["saldo"] = veredito
+        situacao["saldo_anterior"] = centavos_decimal(saldoAnterior_val)
+        situacao["debito_sem_aquisicao"] = centavos_decimal(somaSomenteDebito)
+        if somaSomenteDebito > 0:
+            situacao["diferenca"] = situacao["debito_sem_aquisicao"] - situacao["saldo_anterior"]
+
+    return f"{status}"
+
+def linhas_composicao(notas, quantidade, somaSomenteDebito, saldoAnterior_val, segundos_composicao):
+    """
+    Linhas que seguem a verificação do saldo anterior quando há diferença: as
+    combinações de notas (as com menos notas primeiro) cuja soma é exatamente a
+    diferença, procuradas por explicar_diferenca.
+    notas: (nf, credito, debito) em centavos das `quantidade` notas com saldo.
+    """
+    if not segundos_composicao or somaSomenteDebito <= 0:
+        return []
+    diferenca = centavos_decimal(somaSomenteDebito - saldoAnterior_val)
+    if diferenca == 0:
+        return []
+    titulo = f"| Composição da Diferença {fmt_centavos(diferenca)}"
+    if quantidade > LIMITE_NOTAS_COMPOSICAO:
+        return [f"{titulo} | Não calculada: mais de {LIMITE_NOTAS_COMPOSICAO} notas com saldo"]
+
+    print("Composição da diferença do Saldo Anterior")
+    saldo_anterior = centavos_decimal(saldoAnterior_val)
+    combinacoes, completa, alvo = explicar_diferenca(list(notas), diferenca, segundos_composicao, saldo_anterior)
+    busca = "busca completa" if completa else (f"busca interrompida: prazo de {segundos_composicao:g}s ou mais de "
+                                                 f"{LIMITE_RAMIFICAR} notas candidatas")
+    if not combinacoes:
+        return [f"{titulo} | Nenhuma combinação de notas soma a diferença nem o saldo anterior ({busca})"]
+    soma = diferenca
+    if alvo == "saldo_anterior":
+        soma = saldo_anterior
+        origem = (f"de notas sem aquisição registrada que somam o Saldo Anterior {fmt_centavos(saldo_anterior)} "
+                  f"(as demais formam a diferença)")
+    elif alvo == "com_saldo":
+        origem = "entre todas as notas com saldo (débito - crédito)"
+    else:
+        origem = "entre as notas sem aquisição registrada"
+    linhas = [f"{titulo} | {len(combinacoes)} combinação(ões) {origem}, as menores primeiro ({busca})"]
+    for posicao, combinacao in enumerate(combinacoes, start=1):
+        notas_combinacao = " + ".join(f"NF {nf} ({fmt_centavos(valor)})" for nf, valor in combinacao)
+        linhas.append(f"|   {posicao}) {notas_combinacao} = {fmt_centavos(soma)}")
+    return linhas
+
+def processar_planilha_xlsx(caminho_entrada, pasta_saida_relatorios, pasta_lancamentos=None, opcoes=None,
+                            caminho_colunar=None, nome_base=None, caminho_origem=None):
+    """
+    Processa um único arquivo .xlsx ou .xls (ou balancete em .htm/.html/.pdf), extrai dados de movimentação e gera relatórios.
+    caminho_entrada: o caminho do arquivo .xlsx/.xls/.htm/.html/.pdf de entrada.
+    pasta_saida_relatorios: o caminho da pasta onde o relatório .txt será salvo.
+    pasta_lancamentos: pasta da planilha _lancamentos (padrão: a pasta do arquivo de entrada).
+    opcoes: OpcoesProcessamento (padrão: leitura em streaming, lançamentos em .xlsx).
+    caminho_colunar: se informado, os lançamentos normalizados também são gravados
+    nesse .parquet da base colunar (ver ArmazemLancamentos).
+    nome_base: início do nome do relatório e dos lançamentos (padrão: o nome do
+    arquivo de entrada sem a extensão; ver lote.nomes_saida).
+    caminho_origem: o arquivo original, quando caminho_entrada é a conversão
+    dele para .xlsx (dá o nome do perfil; ver perfilar).
+    Retorna um dicionário com o status e os caminhos gerados (ver novo_resultado),
+    as medidas de cada etapa em "metricas" e, com opcoes.indexar_notas, os totais
+    por nota fiscal em "indice_notas".
+    Se o arquivo precisar de conversão, o resultado traz "requer_conversao": True.
+    """
+    opcoes = opcoes or OpcoesProcessamento()
+    with perfilar(opcoes.pasta_perfil, caminho_origem or caminho_entrada):
+        return executar_etapas(caminho_entrada, pasta_saida_relatorios, pasta_lancamentos, opcoes, caminho_colunar,
+                               nome_base or os.path.splitext(os.path.basename(caminho_entrada))[0])
+
+def executar_etapas(caminho_entrada, pasta_saida_relatorios, pasta_lancamentos, opcoes, caminho_colunar, nome_base):
+    """
+    Etapas de processar_planilha_xlsx. Cada etapa é medida (tempo, linhas, bytes,
+    memória) e os registros vão em resultado["metricas"].
+    """
+    resultado = novo_resultado(caminho_entrada)
+    medidor = Medidor(os.path.basename(caminho_entrada))
+    resultado["metricas"] = medidor.registros
+    try:
+        try:
+            if opcoes.por_conta:
+                # Importado aqui porque contas importa este módulo
+                from .contas import executar_etapas_contas
+                return executar_etapas_contas(caminho_entrada, pasta_saida_relatorios, pasta_lancamentos, opcoes,
+                                              caminho_colunar, nome_base, resultado, medidor)
+            if opcoes.leitura == "blocos":
+                # Importado aqui porque blocos importa este módulo
+                from .blocos import executar_etapas_blocos
+                return executar_etapas_blocos(caminho_entrada, pasta_saida_relatorios, pasta_lancamentos, opcoes,
+                                              caminho_colunar, nome_base, resultado, medidor)
+            with medidor.etapa("leitura", leitura=opcoes.leitura, bytes_lidos=tamanho_arquivo(caminho_entrada)) as registro:
+                if opcoes.leitura == "completa":
+                    df_final, saldoAnterior_val = extrair_dados_completo(caminho_entrada, opcoes.processos_pdf)
+                else:
+                    df_final, saldoAnterior_val = extrair_dados_streaming(caminho_entrada, opcoes.processos_pdf)
+                registro["linhas_saida"] = len(df_final)
+        except FormatoNaoSuportado as e:
+            print(f"Aviso: '{os.path.basename(caminho_entrada)}' não pôde ser lido diretamente ({e}).")
+            resultado["mensagem"] = str(e)
+            resultado["requer_conversao"] = True
+            return resultado
+        except PlanilhaInvalida as e:
+            print(f"Aviso: {e} em '{os.path.basename(caminho_entrada)}'.")
+            resultado["status"] = "aviso"
+            resultado["mensagem"] = str(e)
+            return resultado
+
+        resultado["valores_invalidos"] = {}
+        with medidor.etapa("normalizacao", linhas_entrada=len(df_final)) as registro:
+            df_final, registro["regras"] = normalizar_lancamentos(df_final, ClassificadorHistorico(opcoes.regras),
+                                                                  resultado["valores_invalidos"])
+            registro["linhas_saida"] = len(df_final)
+            registro["valores_invalidos"] = sum(resultado["valores_invalidos"].values())
+        resultado["regras"] = registro["regras"]
+        aviso_valores_invalidos(caminho_entrada, resultado["valores_invalidos"])
+        if caminho_colunar:
+            try:
+                with medidor.etapa("colunar", linhas_entrada=len(df_final)) as registro:
+                    gravar_colunar(df_final, saldoAnterior_val, caminho_colunar)
+                    registro["bytes_gravados"] = tamanho_arquivo(caminho_colunar)
+                resultado["colunar"] = caminho_colunar
+            except Exception as e:
+                aviso_colunar(caminho_entrada, e)
+        with medidor.etapa("conciliacao", linhas_entrada=len(df_final)) as registro:
+            resultado["situacao"] = nova_situacao()
+            relatorio = gerar_relatorio(df_final, saldoAnterior_val, opcoes.segundos_composicao, resultado["situacao"])
+            registro["linhas_saida"] = len(relatorio)
+        if opcoes.indexar_notas:
+            with medidor.etapa("indice_notas", linhas_entrada=len(df_final)) as registro:
+                resultado["indice_notas"] = totais_por_nota(df_final)
+                registro["linhas_saida"] = len(resultado["indice_notas"]["notas"]) if resultado["indice_notas"] else 0
+
+        resultado["notas"] = sum(1 for linha in relatorio if linha.startswith("NF "))
+        resultado["saldo_anterior"] = fmt_br(saldoAnterior_val)
+
+        if relatorio:
+            # O relatório .txt será salvo na pasta de saída escolhida
+            caminho_saida_txt = os.path.join(pasta_saida_relatorios, f"{nome_base}_relatorio.txt")
+            with medidor.etapa("relatorio", linhas_entrada=len(relatorio)) as registro:
+                with open(caminho_saida_txt, "w", encoding="utf-8") as f:
+                    f.write("\n".join(relatorio))
+                registro["bytes_gravados"] = tamanho_arquivo(caminho_saida_txt)
+            print(f"Relatório de '{os.path.basename(caminho_entrada)}' salvo em: {caminho_saida_txt}")
+            resultado["relatorio"] = caminho_saida_txt
+
+        # GERAR PLANILHA FINAL
+        # A planilha final será salva, por padrão, na mesma pasta do arquivo de entrada
+        pasta_lancamentos = pasta_lancamentos or os.path.dirname(caminho_entrada)
+        with medidor.etapa("lancamentos", formato=opcoes.formato_lancamentos, linhas_entrada=len(df_final)) as registro:
+            caminho_saida_lancamentos = gravar_lancamentos(df_final, pasta_lancamentos, nome_base, opcoes.formato_lancamentos)
+            registro["bytes_gravados"] = tamanho_arquivo(caminho_saida_lancamentos)
+        print(f"Dados processados de '{os.path.basename(caminho_entrada)}' salvos em: {caminho_saida_lancamentos}")
+        resultado["lancamentos"] = caminho_saida_lancamentos
+
+        resultado["status"] = "ok"
+
+    except Exception as e:
+        print(f"Ocorreu um erro ao processar '{os.path.basename(caminho_entrada)}': {e}")
+        resultado["status"] = "erro"
+        resultado["mensagem"] = str(e)
+
+    return resultado
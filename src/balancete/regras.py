@@ -0,0 +1,118 @@
+import json
+import re
+
+import numpy as np
+import pandas as pd
+
+
+# Captura padrão do número da nota: o primeiro número depois da palavra-chave
+NUMERO_PADRAO = r'.*?(\d+)'
+
+# Regras de classificação do histórico (CONTRAPARTIDA/HISTÓRICO), na ordem de prioridade.
+# tipo: o que vai na coluna Descrição (sem ele, vai o texto que casou com a palavra-chave);
+# palavras: palavras-chave (sem diferenciar maiúsculas); padrao: expressão regular no lugar das
+# palavras; numero: expressão, depois da palavra-chave, com um grupo que captura o número da
+# nota (padrão: NUMERO_PADRAO); nome: nome nas estatísticas (padrão: o tipo).
+# As regras padrão dão o mesmo resultado da expressão original, (AQUISICAO|PAGAMENTO).*?(\d+):
+# a Descrição é o texto do histórico, como escrito, e AQUISIÇÃO com acento não entra.
+REGRAS_PADRAO = [
+    {"nome": "AQUISICAO", "palavras": ["AQUISICAO"]},
+    {"nome": "PAGAMENTO", "palavras": ["PAGAMENTO"]},
+]
+
+
+class RegraInvalida(ValueError):
+    """Indica uma regra de classificação mal escrita (campos ou expressões inválidos)."""
+
+
+def carregar_regras(caminho):
+    """
+    Lê as regras de um arquivo JSON: uma lista de regras ou {"regras": [...]}.
+    Exemplo:
+        [{"tipo": "AQUISICAO", "palavras": ["AQUISICAO", "AQUISIÇÃO", "COMPRA"]},
+         {"tipo": "DEVOLUCAO", "palavras": ["DEVOLUÇÃO", "DEVOLUCAO"]},
+         {"tipo": "PAGAMENTO", "palavras": ["PAGAMENTO", "PGTO"]},
+         {"tipo": "AQUISICAO", "nome": "NF avulsa", "padrao": "\\bNF\\b", "numero": "\\W*(\\d+)"}]
+    """
+    with open(caminho, encoding="utf-8") as f:
+        regras = json.load(f)
+    if isinstance(regras, dict):
+        regras = regras.get("regras")
+    if not isinstance(regras, list) or not regras:
+        raise RegraInvalida(f"'{caminho}' deve ter uma lista de regras")
+    # Valida já na leitura, antes de qualquer planilha ser processada
+    ClassificadorHistorico(regras)
+    return regras
+
+def compilar_regra(regra, posicao):
+    """Expressão de uma regra com dois grupos: o texto da palavra-chave e o número da nota."""
+    if not isinstance(regra, dict) or not (regra.get("tipo") or regra.get("nome")):
+        raise RegraInvalida(f"regra {posicao}: informe o 'tipo' (ou, para manter o texto do histórico, o 'nome')")
+    regra = {**regra, "tipo": regra.get("tipo") or regra["nome"]}
+    if regra.get("palavras"):
+        palavras = [regra["palavras"]] if isinstance(regra["palavras"], str) else regra["palavras"]
+        chave = "|".join(re.escape(palavra) for palavra in palavras)
+    elif regra.get("padrao"):
+        chave = regra["padrao"]
+    else:
+        raise RegraInvalida(f"regra {posicao} ({regra['tipo']}): informe 'palavras' ou 'padrao'")
+    numero = regra.get("numero", NUMERO_PADRAO)
+    try:
+        grupos_chave = re.compile(chave).groups
+        grupos_numero = re.compile(numero).groups
+    except re.error as e:
+        raise RegraInvalida(f"regra {posicao} ({regra['tipo']}): expressão inválida ({e})")
+    if grupos_chave != 0 or grupos_numero != 1:
+        raise RegraInvalida(f"regra {posicao} ({regra['tipo']}): 'padrao' não pode ter grupos (use (?:...)) "
+                            f"e 'numero' deve ter exatamente um grupo, o do número da nota")
+    return f"({chave}){numero}"
+
+
+class ClassificadorHistorico:
+    """
+    Classifica o histórico dos lançamentos com todas as regras de uma vez.
+
+    As regras viram uma única expressão, uma alternativa por regra, cada uma
+    com dois grupos (palavra-chave e número da nota), extraída da coluna de
+    uma vez (str.extract). Vale a palavra-chave que aparece primeiro e, na
+    mesma posição, a regra que vem antes na lista. O par de grupos preenchido
+    diz qual regra casou, então dezenas de regras custam uma passada pela
+    coluna, não uma por regra.
+    """
+
+    def __init__(self, regras=None):
+        self.regras = REGRAS_PADRAO if regras is None else regras
+        if not self.regras:
+            raise RegraInvalida("informe ao menos uma regra de classificação")
+        alternativas = [compilar_regra(regra, posicao) for posicao, regra in enumerate(self.regras, start=1)]
+        self.padrao = re.compile("|".join(alternativas), re.IGNORECASE)
+        # Posição 0: linhas sem regra; a regra i tem os grupos 2i-1 (palavra-chave) e 2i (número).
+        # Sem tipo, a Descrição é o próprio texto da palavra-chave
+        self.tipos = np.array([np.nan] + [regra.get("tipo") for regra in self.regras], dtype=object)
+        self.manter_texto = np.array([False] + [not regra.get("tipo") for regra in self.regras])
+        self.nomes = [regra.get("nome") or regra["tipo"] for regra in self.regras]
+
+    def classificar(self, textos):
+        """
+        Recebe a coluna de textos e devolve (descricao, numero, contagem): as
+        Series do tipo e do número da nota (NaN nas linhas sem regra) e
+        {nome da regra: linhas classificadas por ela, ..., "sem_regra": linhas}.
+        """
+        extraido = textos.astype(str).str.extract(self.padrao).to_numpy(dtype=object)
+        palavras, numeros = extraido[:, 0::2], extraido[:, 1::2]
+        casou = pd.notna(palavras)
+        # A alternativa que casou é a única com os grupos preenchidos
+        coluna = casou.argmax(axis=1)
+        regra = np.where(casou.any(axis=1), coluna + 1, 0)
+        linhas_todas = np.arange(len(regra))
+        numero = pd.Series(np.where(regra > 0, numeros[linhas_todas, coluna], np.nan), index=textos.index,
+                           dtype=object)
+        descricao = np.where(self.manter_texto[regra], palavras[linhas_todas, coluna], self.tipos[regra])
+        descricao = pd.Series(descricao, index=textos.index, dtype=object)
+
+        linhas = np.bincount(regra, minlength=len(self.tipos)).tolist()
+        contagem = {}
+        for nome, quantidade in zip(self.nomes, linhas[1:]):
+            contagem[nome] = contagem.get(nome, 0) + quantidade
+        contagem["sem_regra"] = linhas[0]
+        return descricao, numero, contagem
@@ -0,0 +1,303 @@
+import abc
+import datetime
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+
+# Formatos aceitos para a planilha de lançamentos (extensão do arquivo gerado)
+FORMATOS_LANCAMENTOS = ("xlsx", "csv", "parquet")
+# Linhas preparadas de cada vez na gravação do .xlsx
+LINHAS_POR_BLOCO = 5000
+# Sufixo do nome das planilhas de lançamentos geradas ({nome_base}_lancamentos.{formato})
+SUFIXO_LANCAMENTOS = "_lancamentos"
+
+
+def gravar_lancamentos(df_final, pasta_lancamentos, nome_base, formato="xlsx"):
+    """
+    Grava os lançamentos processados em {nome_base}_lancamentos.{formato}.
+    Retorna o caminho do arquivo gerado.
+    """
+    if formato not in FORMATOS_LANCAMENTOS:
+        raise ValueError(f"Formato de lançamentos desconhecido: '{formato}'")
+
+    caminho = os.path.join(pasta_lancamentos, f"{nome_base}{SUFIXO_LANCAMENTOS}.{formato}")
+    if formato == "csv":
+        df_final.to_csv(caminho, index=False, encoding="utf-8")
+    elif formato == "parquet":
+        gravar_parquet(df_final, caminho)
+    else:
+        gravar_xlsx(df_final, caminho)
+    return caminho
+
+def gravar_parquet(df_final, caminho):
+    """
+    Grava em Parquet; o texto do histórico pode misturar números e textos, então vira texto.
+    O arquivo é gravado com outro nome e renomeado no fim, para que nenhum leitor veja um arquivo pela metade.
+    """
+    df_final = df_final.assign(Texto_Completo=df_final['Texto_Completo'].astype("string"))
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    try:
+        df_final.to_parquet(temporario, index=False)
+        os.replace(temporario, caminho)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+def gravar_colunar(df_final, saldoAnterior_val, caminho, contas=None):
+    """
+    Grava os lançamentos normalizados na base colunar (ver ArmazemLancamentos).
+    O saldo anterior vai junto, exato, nos metadados do Parquet.
+    contas: com --por-conta, [{"conta", "aba", "saldo_anterior", "linhas"}] de
+    cada conta, na ordem das linhas; vai também nos metadados.
+    """
+    df_final = df_final.copy(deep=False)
+    df_final.attrs["saldo_anterior"] = str(saldoAnterior_val)
+    if contas:
+        df_final.attrs["contas"] = contas
+    gravar_parquet(df_final, caminho)
+
+def gravar_xlsx(df_final, caminho):
+    """
+    Grava a planilha .xlsx com o xlsxwriter em modo de memória constante:
+    cada linha é escrita e descarregada em disco na hora, sem montar a pasta
+    de trabalho inteira. O conteúdo é o mesmo de df_final.to_excel(index=False).
+    Sem o xlsxwriter instalado, usa o to_excel padrão do pandas.
+    """
+    escritor = EscritorXlsx(caminho)
+    try:
+        escritor.gravar(df_final)
+    except BaseException:
+        escritor.descartar()
+        raise
+    escritor.fechar()
+
+
+class EscritorBlocos(abc.ABC):
+    """
+    Grava um arquivo de lançamentos bloco a bloco: cada bloco é acrescentado
+    ao arquivo e pode ser descartado em seguida (modo em blocos). O resultado
+    é o mesmo de gravar todos os blocos juntos. O arquivo fica com outro nome
+    até fechar(), para que nenhum leitor veja um arquivo pela metade.
+    As subclasses implementam gravar_bloco e, se precisarem, finalizar.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.temporario = f"{caminho}.{os.getpid()}.tmp"
+        self.blocos = 0
+
+    def gravar(self, df):
+        self.gravar_bloco(df)
+        self.blocos += 1
+
+    def fechar(self):
+        """Conclui o arquivo e o coloca no lugar definitivo. Retorna o caminho."""
+        self.finalizar()
+        os.replace(self.temporario, self.caminho)
+        return self.caminho
+
+    def descartar(self):
+        """Abandona o arquivo (erro no meio do processamento)."""
+        try:
+            self.finalizar()
+        except Exception:
+            pass
+        if os.path.exists(self.temporario):
+            os.remove(self.temporario)
+
+    @abc.abstractmethod
+    def gravar_bloco(self, df):
+        """Acrescenta um bloco de lançamentos ao arquivo temporário."""
+
+    def finalizar(self):
+        pass
+
+
+class EscritorCsv(EscritorBlocos):
+    """CSV em blocos: o cabeçalho vai com o primeiro bloco, os demais são acrescentados."""
+
+    def gravar_bloco(self, df):
+        primeiro = self.blocos == 0
+        df.to_csv(self.temporario, mode="w" if primeiro else "a", header=primeiro, index=False, encoding="utf-8")
+
+
+class EscritorXlsx(EscritorBlocos):
+    """
+    .xlsx em blocos, com o xlsxwriter em modo de memória constante (ver gravar_xlsx).
+    Sem o xlsxwriter, os blocos são guardados e gravados com o to_excel do pandas no fim.
+    """
+
+    def __init__(self, caminho):
+        super().__init__(caminho)
+        self.pendentes = []
+        self.linha = 0
+        try:
+            import xlsxwriter
+        except ImportError:
+            self.livro = None
+            return
+        self.livro = xlsxwriter.Workbook(self.temporario, {"constant_memory": True})
+        self.aba = self.livro.add_worksheet("Sheet1")
+        # Mesmo estilo de cabeçalho e de data do pandas
+        self.cabecalho = self.livro.add_format({"bold": True, "border": 1, "align": "center", "valign": "top"})
+        self.formato_data = self.livro.add_format({"num_format": "YYYY-MM-DD HH:MM:SS"})
+
+    def gravar_bloco(self, df):
+        if self.livro is None:
+            self.pendentes.append(df)
+            return
+        if self.linha == 0:
+            self.aba.write_row(0, 0, [str(coluna) for coluna in df.columns], self.cabecalho)
+            self.linha = 1
+
+        # As células são preparadas por blocos de linhas, coluna a coluna, para não
+        # duplicar a tabela inteira em objetos Python
+        for inicio in range(0, len(df), LINHAS_POR_BLOCO):
+            bloco = df.iloc[inicio:inicio + LINHAS_POR_BLOCO]
+            celulas = [celulas_coluna(self.aba, bloco[coluna], self.formato_data) for coluna in bloco.columns]
+            for i, linha in enumerate(zip(*celulas), start=self.linha + inicio):
+                for j, (escrever, valor, formato) in enumerate(linha):
+                    if escrever is not None:
+                        escrever(i, j, valor, formato)
+        self.linha += len(df)
+
+    def finalizar(self):
+        if self.livro is not None:
+            self.livro.close()
+        elif self.pendentes:
+            # O nome temporário não tem a extensão .xlsx, então o motor é informado
+            pd.concat(self.pendentes, ignore_index=True).to_excel(self.temporario, index=False, engine="openpyxl")
+            self.pendentes = []
+
+
+class EscritorParquet(EscritorBlocos):
+    """
+    Parquet em blocos (um row group por bloco) com o pyarrow. Como em
+    gravar_parquet, o histórico vira texto; attrs vai nos metadados, como o
+    df.attrs do to_parquet (ver gravar_colunar). Os metadados são gravados com
+    o primeiro bloco: se attrs mudar depois, fechar() regrava o arquivo.
+    """
+
+    def __init__(self, caminho, attrs=None):
+        super().__init__(caminho)
+        self.attrs = attrs or {}
+        self.attrs_gravados = None
+        self.escritor = None
+        self.vazio = None
+
+    def gravar_bloco(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        df = df.assign(Texto_Completo=df['Texto_Completo'].astype("string"))
+        if df.empty:
+            # Sem linhas o tipo de algumas colunas não é conhecido; só é gravado se não vier nenhum bloco com dados
+            self.vazio = df if self.vazio is None else self.vazio
+            return
+        tabela = pa.Table.from_pandas(df, preserve_index=False)
+        if self.escritor is None:
+            if self.attrs:
+                tabela = tabela.replace_schema_metadata({**tabela.schema.metadata,
+                                                         b"PANDAS_ATTRS": json.dumps(self.attrs).encode()})
+            self.attrs_gravados = dict(self.attrs)
+            self.escritor = pq.ParquetWriter(self.temporario, tabela.schema)
+        else:
+            tabela = tabela.cast(self.escritor.schema)
+        self.escritor.write_table(tabela)
+
+    def fechar(self):
+        if self.escritor is not None and self.attrs != self.attrs_gravados:
+            self.escritor.close()
+            self.escritor = None
+            self.regravar_attrs()
+        return super().fechar()
+
+    def regravar_attrs(self):
+        """Copia o arquivo temporário, um row group por vez, com os metadados do attrs atual."""
+        import pyarrow.parquet as pq
+
+        origem = pq.ParquetFile(self.temporario)
+        schema = origem.schema_arrow.with_metadata({**origem.schema_arrow.metadata,
+                                                    b"PANDAS_ATTRS": json.dumps(self.attrs).encode()})
+        regravado = f"{self.temporario}.attrs"
+        try:
+            with pq.ParquetWriter(regravado, schema) as escritor:
+                for i in range(origem.num_row_groups):
+                    escritor.write_table(origem.read_row_group(i).replace_schema_metadata(schema.metadata))
+        except BaseException:
+            if os.path.exists(regravado):
+                os.remove(regravado)
+            raise
+        finally:
+            origem.close()
+        os.replace(regravado, self.temporario)
+
+    def finalizar(self):
+        if self.escritor is not None:
+            self.escritor.close()
+            self.escritor = None
+        elif self.vazio is not None:
+            self.vazio.attrs.update(self.attrs)
+            self.vazio.to_parquet(self.temporario, index=False)
+            self.vazio = None
+
+def abrir_escritor_lancamentos(pasta_lancamentos, nome_base, formato="xlsx"):
+    """Escritor em blocos da planilha {nome_base}_lancamentos.{formato} (o mesmo arquivo de gravar_lancamentos)."""
+    if formato not in FORMATOS_LANCAMENTOS:
+        raise ValueError(f"Formato de lançamentos desconhecido: '{formato}'")
+
+    caminho = os.path.join(pasta_lancamentos, f"{nome_base}{SUFIXO_LANCAMENTOS}.{formato}")
+    if formato == "csv":
+        return EscritorCsv(caminho)
+    if formato == "parquet":
+        return EscritorParquet(caminho)
+    return EscritorXlsx(caminho)
+
+def celulas_coluna(aba, serie, formato_data):
+    """
+    Prepara as células de uma coluna: datas viram o número de série do Excel
+    (calculado de forma vetorizada) e números são escritos sem passar pela
+    detecção de tipo do xlsxwriter. Células vazias têm método None.
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        # Em microssegundos para não estourar o int64 com datas muito distantes
+        micros = serie.to_numpy(dtype="datetime64[us]")
+        dias = (micros - np.datetime64("1899-12-30", "us")) / np.timedelta64(1, "D")
+        dias[np.isnat(micros)] = np.nan
+        return [celula_data(aba, v, d, formato_data) for v, d in zip(serie.tolist(), dias.tolist())]
+    if pd.api.types.is_float_dtype(serie) or pd.api.types.is_integer_dtype(serie):
+        return [celula_numero(aba, v) for v in serie.tolist()]
+    return [celula_generica(aba, v, formato_data) for v in serie.tolist()]
+
+def celula_data(aba, valor, dias, formato_data):
+    """Célula de data; antes de março/1900 o calendário do Excel é irregular e fica com o xlsxwriter."""
+    if math.isnan(dias):
+        return None, None, None
+    if dias < 61:
+        return aba.write_datetime, valor, formato_data
+    return aba.write_number, dias, formato_data
+
+def celula_numero(aba, valor):
+    """Célula numérica: vazia para NaN, infinito como texto (como o inf_rep do pandas)."""
+    if math.isnan(valor):
+        return None, None, None
+    if math.isinf(valor):
+        return aba.write_string, "inf" if valor > 0 else "-inf", None
+    return aba.write_number, valor, None
+
+def celula_generica(aba, valor, formato_data):
+    """
+    Célula de coluna mista (texto, número, data): usa a detecção de tipo do xlsxwriter, como o pandas;
+    datas levam o mesmo formato das colunas de datas.
+    """
+    if valor is None or valor is pd.NaT or (isinstance(valor, float) and math.isnan(valor)):
+        return None, None, None
+    if isinstance(valor, float) and math.isinf(valor):
+        return aba.write_string, "inf" if valor > 0 else "-inf", None
+    if isinstance(valor, datetime.datetime):
+        return aba.write_datetime, valor, formato_data
+    return aba.write, valor, None
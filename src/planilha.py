@@ -1,225 +1,23 @@
 
-import pandas as pd
-import numpy as np
-import re
 import tkinter as tk
 import sys
-import subprocess
 import os
+import multiprocessing
+import queue
+import threading
 import time
-from tkinter import filedialog, messagebox
-from collections import defaultdict
-from decimal import Decimal, InvalidOperation
-
-
-# Importa a biblioteca Pillow para lidar com imagens (necessária para .jpg)
-# Certifique-se de que a biblioteca Pillow esteja instalada:
-# pip install Pillow
-try:
-    from PIL import Image, ImageTk
-except ImportError:
-    messagebox.showerror("Erro de Dependência", 
-                         "A biblioteca 'Pillow' (PIL) não foi encontrada.\n"
-                         "Por favor, instale-a abrindo o terminal e executando:\n"
-                         "pip install Pillow")
-    Image, ImageTk = None, None
-    
-# Certifique-se de que a biblioteca BeautifulSoup esteja instalada:
-# pip install beautifulsoup4
-try:
-    from bs4 import BeautifulSoup
-except ImportError:
-    messagebox.showerror("Erro de Dependência", 
-                         "A biblioteca 'BeautifulSoup4' não foi encontrada.\n"
-                         "Por favor, instale-a abrindo o terminal e executando:\n"
-                         "pip install beautifulsoup4")
-    BeautifulSoup = None
-
-
-# --- REGEX ---
-# Padrão para extrair 'Aquisicao' ou 'Pagamento' e o número da nota fiscal
-padrao_movimentacao = re.compile(r'(AQUISICAO|PAGAMENTO).*?(\d+)', re.IGNORECASE)
-
-# --- FUNÇÕES AUXILIARES ---
-def parse_valor_br(s: str) -> Decimal:
-    """Converte uma string de valor em formato brasileiro para Decimal."""
-    try:
-        if isinstance(s, (int, float)):
-            return Decimal(str(s))
-        s = str(s).replace(".", "").replace(",", ".")
-        return Decimal(s)
-    except InvalidOperation:
-        return Decimal("0.00")
-
-def fmt_br(d: Decimal) -> str:
-    """Formata um Decimal para string de valor em formato brasileiro."""
-    if not isinstance(d, Decimal):
-        d = Decimal(str(d))
-    return f"{d:.2f}".replace(".", ",")
-
-def processar_planilha_xlsx(caminho_entrada, pasta_saida_relatorios):
-    """
-    Processa um único arquivo .xlsx, extrai dados de movimentação e gera relatórios.
-    caminho_entrada: o caminho do arquivo .xlsx de entrada.
-    pasta_saida_relatorios: o caminho da pasta onde o relatório .txt será salvo.
-    """
-    try:
-        # Lê o arquivo completo sem cabeçalho para ter controle total
-        df_bruto = pd.read_excel(caminho_entrada, header=None, engine='openpyxl')
-        
-        # Encontra a linha de cabeçalho
-        row_with_headers = -1
-        for i, row in df_bruto.iterrows():
-            row_str = [str(x).upper() for x in row]
-            if 'DÉBITO' in row_str and 'CRÉDITO' in row_str:
-                row_with_headers = i
-                break
-                
-        if row_with_headers == -1:
-            print(f"Aviso: Não foi possível encontrar a linha de cabeçalho em '{os.path.basename(caminho_entrada)}'.")
-            return
-
-        # Encontra os índices de todas as colunas de interesse
-        header_row_data = df_bruto.iloc[row_with_headers]
-        
-        col_index_data = header_row_data[header_row_data.astype(str).str.contains('DATA', na=False, case=False)].first_valid_index()
-        col_index_historico = header_row_data[header_row_data.astype(str).str.contains('CONTRAPARTIDA/HISTÓRICO', na=False, case=False)].first_valid_index()
-        col_index_debito = header_row_data[header_row_data.astype(str).str.contains('DÉBITO', na=False, case=False)].first_valid_index()
-        col_index_credito = header_row_data[header_row_data.astype(str).str.contains('CRÉDITO', na=False, case=False)].first_valid_index()
-        col_index_saldo = header_row_data[header_row_data.astype(str).str.contains('SALDO-EXERCÍCIO', na=False, case=False)].first_valid_index()
-
-        if any(idx is None for idx in [col_index_data, col_index_historico, col_index_debito, col_index_credito]):
-            print(f"Aviso: Uma ou mais colunas essenciais não foram encontradas em '{os.path.basename(caminho_entrada)}'.")
-            return
-        
+from tkinter import filedialog, messagebox, ttk
 
+# O processamento fica no pacote 'balancete', que não depende de tkinter/Pillow
+# e também pode ser executado sem janela: python -m balancete ENTRADA SAIDA.
+# Ele (e com ele pandas/numpy) só é importado ao clicar em Processar, para a
+# janela abrir sem esperar essas bibliotecas carregarem.
 
-        # Extrai o saldo anterior procurando pela descrição na coluna de histórico
-        saldoAnterior_val = Decimal("0.00")
-        if col_index_saldo is not None:
-            # Procura a linha com "SALDO ANTERIOR"
-            linha_saldo_anterior = df_bruto.iloc[row_with_headers:].astype(str).apply(
-                lambda row: any("SALDO ANTERIOR" in str(cell).upper() for cell in row), axis=1
-            )
-            
-            if linha_saldo_anterior.any():
-                indice_saldo = linha_saldo_anterior[linha_saldo_anterior].index[0]
-                try:
-                    saldo_anterior_bruto = df_bruto.iloc[indice_saldo, col_index_saldo]
-                    saldoAnterior_val = parse_valor_br(saldo_anterior_bruto)
-                    saldoAnterior_val = (saldoAnterior_val * -1 if saldoAnterior_val < 0 else saldoAnterior_val)
-
-                    print(f"Saldo Anterior extraído: {fmt_br(saldoAnterior_val)}")
-                except (IndexError, KeyError, InvalidOperation):
-                    print("Aviso: Não foi possível extrair o Saldo Anterior.")
-            else:
-                print("Aviso: 'SALDO ANTERIOR' não encontrado na planilha.")
-        
-
-
-        # Seleciona os dados a partir da linha seguinte à do cabeçalho
-        df_final = df_bruto.iloc[row_with_headers + 1:, [col_index_data, col_index_historico, col_index_debito, col_index_credito, col_index_saldo]].copy()
-        df_final.columns = ['Data', 'Texto_Completo', 'Débito', 'Crédito', 'Saldo']
-
-        # Converte 'Data' para o formato correto e remove linhas inválidas
-        df_final['Data'] = pd.to_datetime(df_final['Data'], errors='coerce')
-        # 
-        df_final.dropna(subset=['Data'], inplace=True)
-        # 
-
-        # Extrai Descrição e Número da coluna de texto
-        extraido = df_final['Texto_Completo'].astype(str).str.extract(padrao_movimentacao)
-        df_final['Descrição'] = extraido[0]
-        df_final['Numero'] = extraido[1]
-
-        # Converte as colunas de valores para numérico
-        df_final['Débito'] = pd.to_numeric(df_final['Débito'], errors='coerce').fillna(0)
-        df_final['Crédito'] = pd.to_numeric(df_final['Crédito'], errors='coerce').fillna(0)
-        df_final['Saldo'] = pd.to_numeric(df_final['Saldo'], errors='coerce').fillna(0)
-        
-        # Remove linhas que não tenham a descrição ou o número
-        # 
-        df_final.dropna(subset=['Descrição', 'Numero'], inplace=True)
-        # 
-
-        # Reseta o índice para começar do zero
-        df_final = df_final.reset_index(drop=True)
-
-        # --- ENGENHARIA E CÁLCULOS (lógica similar à do PDF) ---
-        notas = defaultdict(lambda: {"credito": Decimal("0.00"), "debito": Decimal("0.00")})
-        relatorio = []
-        
-        somaSomenteDebito = 0
-
-        for index, row in df_final.iterrows():
-            nf = str(row['Numero'])
-            debito_val = parse_valor_br(row['Débito'])
-            credito_val = parse_valor_br(row['Crédito'])
-            saldo_val = parse_valor_br(row['Saldo'])
+# Ícone já transparente e em 60x60, gerado no build (ver gerar_icone); o Tk lê
+# PNG sem o Pillow, então a janela abre sem importar o Pillow
+ARQUIVO_ICONE = "icon.png"
+TAMANHO_ICONE = (60, 60)
 
-            # print(f"NF  {nf}  -  {saldoAnterior_val}")
-
-            # A lógica é simplificada aqui para somar diretamente os valores
-            notas[nf]["debito"] += debito_val
-            notas[nf]["credito"] += credito_val
-
-        # GERAR RELATÓRIO .txt
-        for nf, valores in notas.items():
-            credito, debito = valores["credito"], valores["debito"]
-            if credito == 0 and debito == 0:
-                continue
-
-            diferenca = credito - debito
-            status = ""
-            if credito > 0 and debito == 0:
-                status = "Sem pagamento registrado"
-            elif debito > 0 and credito == 0:
-                status = "Sem aquisição registrada"
-
-                somaSomenteDebito += debito 
-
-            elif abs(diferenca) < Decimal("0.01"):
-                status = "OK"
-            else:
-                status = f"Diferença {fmt_br(diferenca)}"
-
-            relatorio.append(f"NF {nf} -> Crédito: {fmt_br(credito)} | Débito: {fmt_br(debito)} | {status}")
-        
-        print(f"Soma Débito {somaSomenteDebito}")
-        print(f"Saldo Anterior {saldoAnterior_val}")
-        
-        if somaSomenteDebito > 0:
-            print("Cálculo Saldo Anterior")
-
-            diferenca = somaSomenteDebito - saldoAnterior_val 
-
-            if abs(diferenca) < Decimal("0.01"):
-                status = f"| Saldo Anterior OK | Saldo Anterior {fmt_br(saldoAnterior_val)}    Débito Sem Aquisição Registrada {fmt_br(somaSomenteDebito)}"
-            else:
-                status = f"| Saldo Anterior Diferença {fmt_br(diferenca)} | Saldo Anterior {fmt_br(saldoAnterior_val)}    Débito Sem Aquisição Registrada {fmt_br(somaSomenteDebito)}"
-        else:
-            status = f"| Saldo Anterior OK | Saldo Anterior {fmt_br(saldoAnterior_val)}    Não existe Aquisição Registrada"
-
-        relatorio.append(f"{status}")
-
-        if relatorio:
-            nome_base = os.path.splitext(os.path.basename(caminho_entrada))[0]
-            # O relatório .txt será salvo na pasta de saída escolhida
-            caminho_saida_txt = os.path.join(pasta_saida_relatorios, f"{nome_base}_relatorio.txt")
-            with open(caminho_saida_txt, "w", encoding="utf-8") as f:
-                f.write("\n".join(relatorio))
-            print(f"Relatório de '{os.path.basename(caminho_entrada)}' salvo em: {caminho_saida_txt}")
-
-        # GERAR PLANILHA FINAL
-        nome_base = os.path.splitext(os.path.basename(caminho_entrada))[0]
-        # A planilha final será salva na mesma pasta do arquivo de entrada
-        caminho_saida_lancamentos_xlsx = os.path.join(os.path.dirname(caminho_entrada), f"{nome_base}_lancamentos.xlsx")
-        df_final.to_excel(caminho_saida_lancamentos_xlsx, index=False)
-        print(f"Dados processados de '{os.path.basename(caminho_entrada)}' salvos em: {caminho_saida_lancamentos_xlsx}")
-
-    except Exception as e:
-        print(f"Ocorreu um erro ao processar '{os.path.basename(caminho_entrada)}': {e}")
-        
 
 # --- INTERFACE (Tkinter) ---
 def escolher_pasta(entry_widget):
@@ -229,21 +27,135 @@ def escolher_pasta(entry_widget):
         entry_widget.delete(0, tk.END)
         entry_widget.insert(0, pasta)
 
-def find_libreoffice_path():
-    """Tenta encontrar o caminho do executável do LibreOffice em locais comuns."""
-    common_paths = [
-        os.path.join(os.getenv("PROGRAMFILES", "C:\\Program Files"), "LibreOffice\\program\\soffice.exe"),
-        os.path.join(os.getenv("PROGRAMFILES(X86)", "C:\\Program Files (x86)"), "LibreOffice\\program\\soffice.exe"),
-        "/usr/bin/libreoffice", # Para sistemas Linux
-        "/Applications/LibreOffice.app/Contents/MacOS/soffice" # Para sistemas macOS
-    ]
-    for path in common_paths:
-        if os.path.exists(path):
-            return path
-    return None
-
-def executar():
-    """Função principal que orquestra a conversão e o processamento de planilhas."""
+class Acompanhamento:
+    """
+    Executa o processamento em uma thread separada, para a janela não travar.
+
+    A thread só coloca mensagens na fila; a janela lê a fila a cada
+    INTERVALO_ATUALIZACAO ms (root.after) e atualiza a barra de progresso,
+    a lista de arquivos e a taxa/tempo restante. O botão Cancelar aciona um
+    evento verificado pelo lote entre um arquivo e outro.
+    """
+
+    INTERVALO_ATUALIZACAO = 100
+    SIMBOLOS = {"ok": "\u2714", "aviso": "\u26a0", "erro": "\u2716", "cancelado": "\u2013"}
+
+    def __init__(self, root, barra, situacao, lista, botao_processar, botao_cancelar):
+        self.root = root
+        self.barra = barra
+        self.situacao = situacao
+        self.lista = lista
+        self.botao_processar = botao_processar
+        self.botao_cancelar = botao_cancelar
+        self.fila = queue.Queue()
+        self.cancelar_evento = threading.Event()
+        self.thread = None
+
+    def em_andamento(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def iniciar(self, pasta_entrada, pasta_saida, total):
+        """Prepara a janela e inicia o processamento em segundo plano."""
+        self.total = total
+        self.concluidos = 0
+        self.contagem = {}
+        self.inicio = time.monotonic()
+        self.cancelar_evento.clear()
+        self.lista.delete(0, tk.END)
+        self.barra.config(maximum=total, value=0)
+        self.situacao.config(text=f"Processando 0 de {total} arquivo(s)...")
+        self.botao_processar.config(state=tk.DISABLED)
+        self.botao_cancelar.config(state=tk.NORMAL)
+
+        self.thread = threading.Thread(target=self.trabalhar, args=(pasta_entrada, pasta_saida), daemon=True)
+        self.thread.start()
+        self.root.after(self.INTERVALO_ATUALIZACAO, self.atualizar)
+
+    def trabalhar(self, pasta_entrada, pasta_saida):
+        """Corpo da thread: nada de tkinter aqui, só mensagens na fila."""
+        from balancete import NOME_CONSOLIDADO, CacheResultados, gravar_consolidado, processar_pasta
+
+        try:
+            # Arquivos sem alteração desde o último processamento são restaurados do cache
+            resultados = processar_pasta(pasta_entrada, pasta_saida, cache=CacheResultados(),
+                                         progresso=lambda resultado: self.fila.put(("arquivo", resultado)),
+                                         cancelar=self.cancelar_evento)
+            gravar_consolidado(resultados, os.path.join(pasta_saida, NOME_CONSOLIDADO))
+            self.fila.put(("fim", None))
+        except Exception as e:
+            self.fila.put(("falha", str(e)))
+
+    def cancelar(self):
+        """Pede o cancelamento; os arquivos em andamento terminam antes de parar."""
+        self.cancelar_evento.set()
+        self.botao_cancelar.config(state=tk.DISABLED)
+        self.situacao.config(text="Cancelando após os arquivos em andamento...")
+
+    def atualizar(self):
+        """Lê as mensagens da thread e atualiza a janela (executa na thread do Tk)."""
+        try:
+            while True:
+                tipo, conteudo = self.fila.get_nowait()
+                if tipo == "arquivo":
+                    self.mostrar_arquivo(conteudo)
+                else:
+                    self.finalizar(conteudo if tipo == "falha" else None)
+                    return
+        except queue.Empty:
+            pass
+        self.root.after(self.INTERVALO_ATUALIZACAO, self.atualizar)
+
+    def mostrar_arquivo(self, resultado):
+        """Acrescenta o arquivo concluído à lista e atualiza barra, taxa e tempo restante."""
+        status = resultado["status"]
+        self.concluidos += 1
+        self.contagem[status] = self.contagem.get(status, 0) + 1
+
+        detalhe = "do cache" if resultado.get("cache") else f"{resultado['notas']} NF(s)"
+        if status != "ok":
+            detalhe = resultado["mensagem"] or status
+        self.lista.insert(tk.END, f"{self.SIMBOLOS.get(status, '?')} {resultado['arquivo']} - {detalhe}")
+        self.lista.see(tk.END)
+        self.barra.config(value=self.concluidos)
+
+        decorrido = time.monotonic() - self.inicio
+        taxa = self.concluidos / decorrido if decorrido > 0 else 0
+        restante = (self.total - self.concluidos) / taxa if taxa > 0 else 0
+        texto = f"{self.concluidos} de {self.total} arquivo(s) - {taxa:.1f} arquivos/s - restante ~{formatar_duracao(restante)}"
+        if self.cancelar_evento.is_set():
+            texto = "Cancelando... " + texto
+        self.situacao.config(text=texto)
+
+    def finalizar(self, falha):
+        """Libera os botões e mostra o resumo do lote."""
+        self.botao_processar.config(state=tk.NORMAL)
+        self.botao_cancelar.config(state=tk.DISABLED)
+        if falha:
+            self.situacao.config(text="Falha no processamento.")
+            messagebox.showerror("Erro", f"Ocorreu um erro durante o processamento:\n{falha}")
+            return
+
+        resumo = (f"{self.contagem.get('ok', 0)} ok, {self.contagem.get('aviso', 0)} aviso(s), "
+                  f"{self.contagem.get('erro', 0)} erro(s) em {formatar_duracao(time.monotonic() - self.inicio)}")
+        if self.contagem.get("cancelado"):
+            self.situacao.config(text=f"Cancelado: {resumo}; {self.contagem['cancelado']} não processado(s).")
+            messagebox.showinfo("Processamento cancelado", f"Processamento cancelado.\n{resumo}.")
+            return
+        self.situacao.config(text=f"Concluído: {resumo}.")
+        messagebox.showinfo("Processamento concluído", f"{resumo}.\nVerifique a pasta de saída para os relatórios e a pasta de entrada para as planilhas processadas.")
+
+def formatar_duracao(segundos):
+    """Formata segundos como m:ss (ou h:mm:ss)."""
+    minutos, segundos = divmod(int(round(segundos)), 60)
+    horas, minutos = divmod(minutos, 60)
+    return f"{horas}:{minutos:02d}:{segundos:02d}" if horas else f"{minutos}:{segundos:02d}"
+
+def executar(pasta_entry, saida_entry, acompanhamento):
+    """Função principal que valida as pastas e inicia o processamento em segundo plano."""
+    if acompanhamento.em_andamento():
+        return
+    from balancete import listar_planilhas
+
     pasta_entrada = pasta_entry.get()
     pasta_saida = saida_entry.get()
     
@@ -254,181 +166,192 @@ def executar():
         messagebox.showerror("Erro", "Selecione uma pasta de SAÍDA válida.")
         return
 
-    arquivos_encontrados = [f for f in os.listdir(pasta_entrada) if f.lower().endswith(('.xls', '.xlsx'))]
-    if not arquivos_encontrados:
-        messagebox.showinfo("Aviso", "Nenhum arquivo .xls ou .xlsx encontrado na pasta de entrada.")
+    planilhas = listar_planilhas(pasta_entrada)
+    if not planilhas:
+        messagebox.showinfo("Aviso", "Nenhum arquivo .xls, .xlsx, .htm, .html ou .pdf encontrado na pasta de entrada.")
         return
 
-    print("Iniciando o processamento...")
-    for arquivo in arquivos_encontrados:
-        caminho_completo_entrada = os.path.join(pasta_entrada, arquivo)
-        nome_base, extensao = os.path.splitext(arquivo)
-
-        caminho_para_processar = caminho_completo_entrada
-        
-        # Se for um arquivo .xls, tenta convertê-lo primeiro
-        if extensao.lower() == '.xls':
-            print(f"\nDetectado arquivo .xls: '{arquivo}'. Iniciando a conversão...")
-            
-            # O arquivo convertido será salvo na mesma pasta de entrada
-            caminho_convertido = os.path.join(pasta_entrada, f"{nome_base}.xlsx")
-            
-            # Tenta encontrar o LibreOffice antes de tentar a conversão
-            soffice_path = find_libreoffice_path()
-            if not soffice_path:
-                messagebox.showerror("Erro de Conversão", "LibreOffice não encontrado. Certifique-se de que está instalado.")
-                return
-
-            try:
-                # O --outdir para a conversão deve ser a pasta de entrada
-                comando_libreoffice = f'"{soffice_path}" --headless --convert-to xlsx --outdir "{pasta_entrada}" "{caminho_completo_entrada}"'
-                
-                subprocess.run(comando_libreoffice, shell=True, check=True)
-                
-                # Espere um pouco para o LibreOffice terminar a conversão
-                time.sleep(2)
-                
-                if os.path.exists(caminho_convertido):
-                    caminho_para_processar = caminho_convertido
-                    print(f"Conversão concluída. Arquivo salvo como '{caminho_convertido}'.")
-                else:
-                    print(f"Erro: Conversão de '{arquivo}' falhou ou o arquivo de saída não foi encontrado.")
-                    continue
-            except subprocess.CalledProcessError as e:
-                print(f"Erro de subprocesso ao tentar converter '{arquivo}': {e}")
-                continue
-        
-        # Processa o arquivo (original .xlsx ou o recém-convertido)
-        # Passa o caminho do arquivo de entrada e a pasta de saída de relatórios para a função
-        processar_planilha_xlsx(caminho_para_processar, pasta_saida)
-    
-    messagebox.showinfo("Processamento concluído", f"Verifique a pasta de saída para os relatórios e a pasta de entrada para as planilhas processadas.")
+    acompanhamento.iniciar(pasta_entrada, pasta_saida, len(planilhas))
 
 def make_image_transparent(image):
     """
     Converte pixels brancos (ou muito claros) para transparentes.
+    As bandas são comparadas inteiras (Image.point e ImageChops), sem
+    percorrer os pixels em Python.
     """
     if not image:
         return None
+    from PIL import ImageChops
+
+    # Converte para RGBA (também resolve imagens CMYK, que o PyInstaller pode não tratar)
     image = image.convert("RGBA")
-    # Converte a imagem para o modo RGB, pois PyInstaller pode ter problemas com CMYK
-    if image.mode == 'CMYK':
-        image = image.convert('RGB')
-    image = image.convert("RGBA")
-    
-    datas = image.getdata()
-    
-    newData = []
-    for item in datas:
-        # Troca pixels brancos (ou quase brancos) por transparentes
-        if item[0] > 240 and item[1] > 240 and item[2] > 240:
-            newData.append((255, 255, 255, 0))
-        else:
-            newData.append(item)
-    
-    image.putdata(newData)
+    # 255 onde a banda passa de 240; o produto das três máscaras marca os pixels quase brancos
+    claros = [banda.point(lambda v: 255 if v > 240 else 0) for banda in image.split()[:3]]
+    mascara = ImageChops.multiply(ImageChops.multiply(claros[0], claros[1]), claros[2])
+    image.paste((255, 255, 255, 0), mask=mascara)
     return image
 
+def gerar_icone(origem, destino):
+    """
+    Gera o ícone da janela (transparente, TAMANHO_ICONE) a partir do icon.jpg.
+    Executado no build do executável (Análise de Balancete.spec), não ao abrir a janela.
+    """
+    from PIL import Image
+
+    with Image.open(origem) as imagem:
+        icone = make_image_transparent(imagem).resize(TAMANHO_ICONE, Image.Resampling.LANCZOS)
+    # O perfil de cor do JPEG (CMYK) ocuparia centenas de KB num ícone de 60x60
+    icone.info.pop("icc_profile", None)
+    icone.save(destino, optimize=True)
+
+def carregar_icone(base_path):
+    """
+    PhotoImage do ícone: o ARQUIVO_ICONE pré-calculado ou, sem ele (execução
+    a partir do código), o icon.jpg tratado na hora com o Pillow.
+    Retorna None se nenhum dos dois puder ser usado.
+    """
+    caminho_icone = os.path.join(base_path, ARQUIVO_ICONE)
+    if os.path.exists(caminho_icone):
+        return tk.PhotoImage(file=caminho_icone)
+
+    icon_path = os.path.join(base_path, "icon.jpg")
+    if not os.path.exists(icon_path):
+        print(f"Aviso: Arquivo de ícone '{icon_path}' não encontrado.")
+        return None
+    try:
+        from PIL import Image, ImageTk
+    except ImportError:
+        messagebox.showerror("Erro de Dependência",
+                             "A biblioteca 'Pillow' (PIL) não foi encontrada.\n"
+                             "Por favor, instale-a abrindo o terminal e executando:\n"
+                             "pip install Pillow")
+        return None
+    with Image.open(icon_path) as imagem:
+        return ImageTk.PhotoImage(make_image_transparent(imagem).resize(TAMANHO_ICONE, Image.Resampling.LANCZOS))
+
 # --- CRIAÇÃO DA JANELA TKINTER ---
-root = tk.Tk()
-root.title("Análise de Balancete licenciado para G.A.B.CONTABILIDADE")
-root.resizable(False, False)
-
-# Altera o ícone da janela para a imagem fornecida (necessita de 'Pillow')
-# Certifique-se de que o arquivo 'icon.jpg' está na mesma pasta que o script.
-
-# Define o caminho base para encontrar arquivos, compatível com PyInstaller
-base_path = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
-
-try:
-    if Image and ImageTk:
-        icon_path = os.path.join(base_path, "icon.jpg")
-        if os.path.exists(icon_path):
-            icon_image = Image.open(icon_path)
-
-            # Torna o fundo branco da imagem transparente
-            icon_image_transparent = make_image_transparent(icon_image)
-
-            # Redimensiona a imagem para o novo tamanho de ícone (60x60)
-            icon_image_resized = icon_image.resize((60, 60), Image.Resampling.LANCZOS)
-            photo = ImageTk.PhotoImage(icon_image_resized)
-            root.iconphoto(False, photo)
-        else:
-            print(f"Aviso: Arquivo de ícone '{icon_path}' não encontrado.")
-except Exception as e:
-    print(f"Erro ao tentar definir o ícone: {e}")
-
-# Pasta de entrada
-tk.Label(root, text="Pasta de Planilhas (.xls/.xlsx):").grid(row=0, column=0, padx=10, pady=10, sticky="e")
-pasta_entry = tk.Entry(root, width=50)
-pasta_entry.grid(row=0, column=1, padx=10, pady=10)
-tk.Button(root, text="📁", command=lambda: escolher_pasta(pasta_entry)).grid(row=0, column=2, padx=10, pady=10)
-
-# Pasta de saída
-tk.Label(root, text="Pasta para salvar relatórios:").grid(row=1, column=0, padx=10, pady=10, sticky="e")
-saida_entry = tk.Entry(root, width=50)
-saida_entry.grid(row=1, column=1, padx=10, pady=10)
-tk.Button(root, text="📁", command=lambda: escolher_pasta(saida_entry)).grid(row=1, column=2, padx=10, pady=10)
-
-# Adiciona um novo rótulo para o texto adicional
-# tk.Label(root, text="\U0001F4DA G.A.B.CONTABILIDADE").grid(row=2, column=0, pady=(10, 5))
-
-# Ícone de livro
-icone_livro = "  \U0001F4DA"
-
-# Label para o ícone (fonte grande)
-tk.Label(root, text=icone_livro, font=("Arial", 20)).grid(row=2, column=0, pady=(10, 5), sticky="w") # 'sticky="e"' alinha à direita
-
-# Label para o texto (fonte menor)
-tk.Label(root, text="G.A.B. CONTABILIDADE", font=("Arial", 8)).grid(row=2, column=0, pady=(12, 5), sticky="e") # 'sticky="w"' alinha à esquerda
-
-
-# Juntos eles ficam um ao lado do outro na mesma linha 2
-
-
-# Adiciona o texto antes do botão "Processar"
-try:
-    image_path = os.path.join(base_path, 'icon.jpg')
-    if Image and ImageTk and os.path.exists(image_path):
-        # Abre a imagem usando PIL
-        pil_image = Image.open(image_path)
-        # Torna o fundo branco da imagem transparente e redimensiona
-        pil_image_transparent = make_image_transparent(pil_image)
-        pil_image_transparent = pil_image_transparent.resize((60, 60), Image.Resampling.LANCZOS)
-        
-        # Converte a imagem PIL para um objeto PhotoImage que o Tkinter pode usar
-        tk_image = ImageTk.PhotoImage(pil_image_transparent)
+def criar_janela():
+    """Cria a janela Tkinter com todos os controles. Retorna o root (ainda sem o loop de eventos)."""
+    root = tk.Tk()
+    root.title("Análise de Balancete licenciado para G.A.B.CONTABILIDADE")
+    root.resizable(False, False)
 
-        # Cria um Frame para agrupar a imagem e o texto
-        frame_dev = tk.Frame(root)
-        frame_dev.grid(row=2, column=0, pady=(10, 5))
+    # Define o caminho base para encontrar arquivos, compatível com PyInstaller
+    base_path = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
 
-        frame_dev = tk.Frame(root)        
-        frame_dev.grid(row=2, column=1, pady=(10, 5))
+    # Altera o ícone da janela; o mesmo PhotoImage é usado ao lado do texto do desenvolvedor
+    try:
+        tk_image = carregar_icone(base_path)
+        if tk_image is not None:
+            root.iconphoto(False, tk_image)
+    except Exception as e:
+        tk_image = None
+        print(f"Erro ao tentar definir o ícone: {e}")
 
-        # O fundo do frame para combinar com o da janela
-        frame_dev.config(bg=root['bg']) 
+    # Pasta de entrada
+    tk.Label(root, text="Pasta de Planilhas (.xls/.xlsx/.htm/.pdf):").grid(row=0, column=0, padx=10, pady=10, sticky="e")
+    pasta_entry = tk.Entry(root, width=50)
+    pasta_entry.grid(row=0, column=1, padx=10, pady=10)
+    tk.Button(root, text="📁", command=lambda: escolher_pasta(pasta_entry)).grid(row=0, column=2, padx=10, pady=10)
 
-        # Cria o rótulo para a imagem e a exibe no frame
-        image_label = tk.Label(frame_dev, image=tk_image)
-        image_label.pack(side=tk.LEFT, padx=(0, 5))
-        image_label.config(bg=root['bg']) # O fundo do label para combinar com o da janela
+    # Pasta de saída
+    tk.Label(root, text="Pasta para salvar relatórios:").grid(row=1, column=0, padx=10, pady=10, sticky="e")
+    saida_entry = tk.Entry(root, width=50)
+    saida_entry.grid(row=1, column=1, padx=10, pady=10)
+    tk.Button(root, text="📁", command=lambda: escolher_pasta(saida_entry)).grid(row=1, column=2, padx=10, pady=10)
 
+    # Adiciona um novo rótulo para o texto adicional
+    # tk.Label(root, text="\U0001F4DA G.A.B.CONTABILIDADE").grid(row=2, column=0, pady=(10, 5))
 
-    # Cria o rótulo com o texto, agora no mesmo frame
-    text_label = tk.Label(frame_dev, text="Desenvolvido por Denis Menegon - \u260e (19) 99493-4477", font=("Helvetica", 10))
-    text_label.pack(side=tk.LEFT)
-    
-except FileNotFoundError:
-    # Caso a imagem não seja encontrada, exibe um rótulo de erro
-    tk.Label(root, text="Erro: A imagem 'icon.jpg' não foi encontrada.", fg="red").grid(row=2, column=1, pady=(10, 5))
-except Exception as e:
-    tk.Label(root, text=f"Erro ao carregar a imagem: {e}", fg="red").grid(row=2, column=1, pady=(10, 5))
+    # Ícone de livro
+    icone_livro = "  \U0001F4DA"
+
+    # Label para o ícone (fonte grande)
+    tk.Label(root, text=icone_livro, font=("Arial", 20)).grid(row=2, column=0, pady=(10, 5), sticky="w") # 'sticky="e"' alinha à direita
+
+    # Label para o texto (fonte menor)
+    tk.Label(root, text="G.A.B. CONTABILIDADE", font=("Arial", 8)).grid(row=2, column=0, pady=(12, 5), sticky="e") # 'sticky="w"' alinha à esquerda
+
+
+    # Juntos eles ficam um ao lado do outro na mesma linha 2
+
+
+    # Adiciona o texto antes do botão "Processar"
+    try:
+        if tk_image is not None:
+            # Cria um Frame para agrupar a imagem e o texto
+            frame_dev = tk.Frame(root)
+            frame_dev.grid(row=2, column=0, pady=(10, 5))
+
+            frame_dev = tk.Frame(root)        
+            frame_dev.grid(row=2, column=1, pady=(10, 5))
+
+            # O fundo do frame para combinar com o da janela
+            frame_dev.config(bg=root['bg']) 
+
+            # Cria o rótulo para a imagem e a exibe no frame
+            image_label = tk.Label(frame_dev, image=tk_image)
+            image_label.pack(side=tk.LEFT, padx=(0, 5))
+            image_label.config(bg=root['bg']) # O fundo do label para combinar com o da janela
+
+
+        # Cria o rótulo com o texto, agora no mesmo frame
+        text_label = tk.Label(frame_dev, text="Desenvolvido por Denis Menegon - \u260e (19) 99493-4477", font=("Helvetica", 10))
+        text_label.pack(side=tk.LEFT)
+        
+    except FileNotFoundError:
+        # Caso a imagem não seja encontrada, exibe um rótulo de erro
+        tk.Label(root, text="Erro: A imagem 'icon.jpg' não foi encontrada.", fg="red").grid(row=2, column=1, pady=(10, 5))
+    except Exception as e:
+        tk.Label(root, text=f"Erro ao carregar a imagem: {e}", fg="red").grid(row=2, column=1, pady=(10, 5))
+
+
+    # Andamento: barra de progresso, taxa/tempo restante e situação de cada arquivo
+    barra = ttk.Progressbar(root, orient="horizontal", mode="determinate")
+    barra.grid(row=4, column=0, columnspan=3, padx=10, pady=(0, 5), sticky="we")
+    situacao = tk.Label(root, text="", anchor="w")
+    situacao.grid(row=5, column=0, columnspan=3, padx=10, sticky="we")
+    frame_lista = tk.Frame(root)
+    frame_lista.grid(row=6, column=0, columnspan=3, padx=10, pady=(5, 10), sticky="we")
+    rolagem = tk.Scrollbar(frame_lista)
+    rolagem.pack(side=tk.RIGHT, fill=tk.Y)
+    lista = tk.Listbox(frame_lista, height=8, yscrollcommand=rolagem.set)
+    lista.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+    rolagem.config(command=lista.yview)
+
+    # Botões processar e cancelar
+    botao_processar = tk.Button(root, text="Processar", bg="#3956b6", fg="white")
+    botao_processar.grid(row=3, column=1, pady=(5, 20), sticky="e")
+    botao_cancelar = tk.Button(root, text="Cancelar", state=tk.DISABLED)
+    botao_cancelar.grid(row=3, column=2, pady=(5, 20))
+
+    acompanhamento = Acompanhamento(root, barra, situacao, lista, botao_processar, botao_cancelar)
+    botao_processar.config(command=lambda: executar(pasta_entry, saida_entry, acompanhamento))
+    botao_cancelar.config(command=acompanhamento.cancelar)
+
+    def fechar():
+        # Fechar a janela no meio do lote: para entre arquivos antes de sair
+        if acompanhamento.em_andamento():
+            if not messagebox.askyesno("Processamento em andamento", "Cancelar o processamento e sair?"):
+                return
+            acompanhamento.cancelar_evento.set()
+            acompanhamento.thread.join()
+        root.destroy()
+
+    root.protocol("WM_DELETE_WINDOW", fechar)
+    # O Tk só guarda o nome da imagem: a referência evita que o Python a descarte
+    root.icone = tk_image
+    return root
+
+def main():
+    """Cria a janela Tkinter e inicia o loop de eventos."""
+    criar_janela().mainloop()
 
 
-# Botão processar
-tk.Button(root, text="Processar", command=executar, bg="#3956b6", fg="white").grid(row=3, column=1, pady=(5, 20), sticky="e")
-root.mainloop()
+if __name__ == "__main__":
+    # Necessário para o processamento paralelo no executável do PyInstaller (Windows)
+    multiprocessing.freeze_support()
+    main()
 
 
 # -*- coding: utf-8 -*-
@@ -0,0 +1,8 @@
+import os
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# O pacote roda a partir de src/ (python -m balancete), sem instalação; as
+# planilhas sintéticas vêm do gerador dos benchmarks
+sys.path.insert(0, os.path.join(RAIZ, "src"))
+sys.path.insert(0, os.path.join(RAIZ, "benchmarks"))
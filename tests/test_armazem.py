@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from balancete import armazem as modulo_armazem
+from balancete.__main__ import SAIDA_OK, main
+from balancete.armazem import ArmazemLancamentos
+from balancete.processamento import fmt_br
+from gerar_balancete import gravar_xlsx
+
+
+@pytest.fixture
+def base(tmp_path):
+    """Duas planilhas processadas pela linha de comando com --base-colunar (e o cache ligado)."""
+    entrada, saida = tmp_path / "entrada", tmp_path / "saida"
+    entrada.mkdir()
+    saida.mkdir()
+    for semente in range(2):
+        gravar_xlsx(str(entrada / f"cliente_{semente}.xlsx"), 150, semente)
+    argumentos = [str(entrada), str(saida), "--base-colunar", str(tmp_path / "base"), "--cache",
+                  str(tmp_path / "cache"), "--pasta-lancamentos", str(saida)]
+    assert main(argumentos) == SAIDA_OK
+    return entrada, saida, argumentos
+
+
+def test_reconciliar_a_partir_da_base_igual_ao_relatorio(base, tmp_path):
+    entrada, saida, _ = base
+    armazem = ArmazemLancamentos(str(tmp_path / "base"))
+    for semente in range(2):
+        with open(saida / f"cliente_{semente}_relatorio.txt", encoding="utf-8") as f:
+            assert armazem.reconciliar(str(entrada / f"cliente_{semente}.xlsx")) == f.read().split("\n")
+
+def test_carregar_pelo_nome_e_todos(base, tmp_path):
+    armazem = ArmazemLancamentos(str(tmp_path / "base"))
+    df_final, saldo_anterior = armazem.carregar("cliente_1.xlsx")
+    assert saldo_anterior > 0
+    assert armazem.localizar("cliente_1.xlsx")["saldo_anterior"] == fmt_br(saldo_anterior)
+    todos = armazem.carregar_todos()
+    assert todos["Arquivo"].value_counts().to_dict() == {"cliente_0.xlsx": len(armazem.carregar("cliente_0.xlsx")[0]),
+                                                         "cliente_1.xlsx": len(df_final)}
+    with pytest.raises(KeyError):
+        armazem.carregar("outro.xlsx")
+
+def test_restaurado_do_cache_continua_na_base(base, tmp_path):
+    _, _, argumentos = base
+    with open(tmp_path / "base" / "manifesto.json", encoding="utf-8") as f:
+        antes = json.load(f)["lancamentos"]
+    resumo = tmp_path / "resumo.json"
+    assert main(argumentos + ["--resumo", str(resumo)]) == SAIDA_OK
+    with open(resumo, encoding="utf-8") as f:
+        assert json.load(f)["cache"] == 2
+    with open(tmp_path / "base" / "manifesto.json", encoding="utf-8") as f:
+        depois = json.load(f)["lancamentos"]
+    assert {origem: entrada["parquet"] for origem, entrada in depois.items()} == {
+        origem: entrada["parquet"] for origem, entrada in antes.items()}
+
+def test_entradas_de_outra_versao_ignoradas(base, tmp_path, monkeypatch):
+    armazem = ArmazemLancamentos(str(tmp_path / "base"))
+    assert len(armazem.entradas()) == 2
+    monkeypatch.setattr(modulo_armazem, "VERSAO_PROCESSAMENTO", "versao-nova")
+    assert armazem.entradas() == []
+    assert armazem.carregar_todos().empty
@@ -0,0 +1,112 @@
+import datetime
+import os
+import random
+from decimal import Decimal
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from balancete.blocos import AcumuladorNotas
+from balancete.processamento import (
+    OpcoesProcessamento, gerar_relatorio_decimal, nova_situacao, processar_planilha_xlsx, totais_por_nota,
+)
+from gerar_balancete import CABECALHO, gravar_xlsx
+
+
+def lancamentos(semente, quantidade=200, notas=30, casas=2):
+    sorteio = random.Random(semente)
+    linhas = []
+    for i in range(quantidade):
+        valor = round(sorteio.randint(1, 10 ** (casas + 4)) / 10 ** casas, casas)
+        credito = sorteio.randrange(2) == 0
+        linhas.append({"Data": pd.Timestamp(2024, 1, 1) + pd.Timedelta(days=i % 300),
+                       "Numero": str(sorteio.randint(1, notas)), "Débito": 0.0 if credito else valor,
+                       "Crédito": valor if credito else 0.0, "Saldo": 0.0})
+    return pd.DataFrame(linhas)
+
+def acumular(blocos, limite_notas=1000):
+    acumulador = AcumuladorNotas(limite_notas)
+    for bloco in blocos:
+        acumulador.adicionar(bloco.reset_index(drop=True))
+    return acumulador
+
+def dividir(df_final, tamanho):
+    return [df_final.iloc[inicio:inicio + tamanho] for inicio in range(0, len(df_final), tamanho)]
+
+def comparar(acumulador, df_final, saldo_anterior=Decimal("500.00")):
+    situacao, situacao_esperada = nova_situacao(), nova_situacao()
+    relatorio = list(acumulador.relatorio(saldo_anterior, 1, situacao))
+    assert relatorio == gerar_relatorio_decimal(df_final, saldo_anterior, 1, situacao_esperada)
+    assert situacao == situacao_esperada
+    totais = acumulador.totais(df_final["Data"].min(), df_final["Data"].max())
+    assert totais == totais_por_nota(df_final)
+
+
+def test_nota_dividida_entre_blocos():
+    df_final = pd.DataFrame({"Data": pd.to_datetime(["2024-01-01", "2024-01-02", "2024-01-03", "2024-01-04"]),
+                             "Numero": ["1", "2", "1", "3"], "Débito": [100.0, 0.0, 0.0, 7.5],
+                             "Crédito": [0.0, 20.0, 100.0, 0.0], "Saldo": [0.0] * 4})
+    acumulador = acumular(dividir(df_final, 2))
+    assert not acumulador.decimal
+    comparar(acumulador, df_final)
+    assert list(acumulador.relatorio(Decimal("0"), 1))[0] == "NF 1 -> Crédito: 100,00 | Débito: 100,00 | OK"
+
+@pytest.mark.parametrize("tamanho", [1, 7, 64, 1000])
+def test_blocos_igual_decimal(tamanho):
+    df_final = lancamentos(tamanho)
+    comparar(acumular(dividir(df_final, tamanho)), df_final)
+
+def test_passa_para_decimal_no_meio():
+    # Primeiro bloco exato em centavos, segundo com três casas: as somas inteiras já feitas passam para Decimal
+    df_final = pd.concat([lancamentos(1, 100), lancamentos(2, 100, casas=3)], ignore_index=True)
+    acumulador = acumular(dividir(df_final, 100))
+    assert acumulador.decimal
+    comparar(acumulador, df_final)
+
+def test_somas_no_banco_temporario():
+    df_final = pd.concat([lancamentos(3, 150, notas=40), lancamentos(4, 150, notas=40, casas=3)],
+                         ignore_index=True)
+    acumulador = acumular(dividir(df_final, 25), limite_notas=10)
+    try:
+        assert acumulador.banco is not None
+        comparar(acumulador, df_final)
+    finally:
+        caminho_banco = acumulador.caminho_banco
+        acumulador.fechar()
+    assert not os.path.exists(caminho_banco)
+
+def test_leitura_em_blocos_igual_completa(tmp_path):
+    entrada = tmp_path / "razao.xlsx"
+    gravar_xlsx(str(entrada), 300)
+    relatorios = {}
+    for leitura in ("completa", "blocos"):
+        saida = tmp_path / leitura
+        saida.mkdir()
+        opcoes = OpcoesProcessamento(leitura=leitura, linhas_por_bloco=7, segundos_composicao=0)
+        resultado = processar_planilha_xlsx(str(entrada), str(saida), str(saida), opcoes)
+        assert resultado["status"] == "ok", resultado["mensagem"]
+        with open(resultado["relatorio"], encoding="utf-8") as f:
+            relatorios[leitura] = f.read()
+        assert resultado["saldo_anterior"] is not None
+    assert relatorios["blocos"] == relatorios["completa"]
+
+def test_saldo_anterior_depois_do_primeiro_bloco_vai_para_a_base_colunar(tmp_path):
+    entrada = tmp_path / "razao.xlsx"
+    livro = openpyxl.Workbook()
+    aba = livro.active
+    aba.append(CABECALHO)
+    for lote in range(10):
+        aba.append([datetime.datetime(2024, 1, 10), lote, f"AQUISICAO CONF NF {lote} ACME", None, None, 10.0, None])
+    aba.append([None, None, "SALDO ANTERIOR", None, None, None, -123.45])
+    aba.append([datetime.datetime(2024, 1, 11), 10, "PAGAMENTO NF. 900 ACME", None, 123.45, None, None])
+    livro.save(entrada)
+
+    caminho_colunar = str(tmp_path / "base.parquet")
+    opcoes = OpcoesProcessamento(leitura="blocos", linhas_por_bloco=7, segundos_composicao=0)
+    resultado = processar_planilha_xlsx(str(entrada), str(tmp_path), str(tmp_path), opcoes, caminho_colunar)
+    assert resultado["saldo_anterior"] == "123,45"
+    assert resultado["colunar"] == caminho_colunar
+    df_final = pd.read_parquet(caminho_colunar)
+    assert df_final.attrs["saldo_anterior"] == "123.45"
+    assert len(df_final) == 11
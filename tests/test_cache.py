@@ -0,0 +1,80 @@
+import json
+import os
+import shutil
+
+from balancete import cache as modulo_cache
+from balancete.__main__ import SAIDA_OK, main
+from balancete.cache import CacheResultados
+from balancete.processamento import OpcoesProcessamento, novo_resultado
+from gerar_balancete import gravar_xlsx
+
+
+def executar(entrada, saida, pasta_cache, *argumentos):
+    resumo = saida.parent / "resumo.json"
+    # Os lançamentos fora da pasta de entrada, para não serem lidos como planilhas na execução seguinte
+    assert main([str(entrada), str(saida), "--cache", str(pasta_cache), "--resumo", str(resumo),
+                 "--pasta-lancamentos", str(saida), *argumentos]) == SAIDA_OK
+    with open(resumo, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_chave_pelo_conteudo_versao_e_opcoes(tmp_path, monkeypatch):
+    gravar_xlsx(str(tmp_path / "a.xlsx"), 50)
+    shutil.copyfile(tmp_path / "a.xlsx", tmp_path / "copia.xlsx")
+    gravar_xlsx(str(tmp_path / "outro.xlsx"), 50, semente=1)
+    cache = CacheResultados(str(tmp_path / "cache"))
+    opcoes = OpcoesProcessamento()
+    chave = cache.chave(str(tmp_path / "a.xlsx"), opcoes)
+
+    # O nome do arquivo não entra na chave
+    assert cache.chave(str(tmp_path / "copia.xlsx"), opcoes) == chave
+    assert cache.chave(str(tmp_path / "outro.xlsx"), opcoes) != chave
+    # Opções que mudam o resultado mudam a chave; as que só mudam o desempenho, não
+    assert cache.chave(str(tmp_path / "a.xlsx"), OpcoesProcessamento(formato_lancamentos="csv")) != chave
+    assert cache.chave(str(tmp_path / "a.xlsx"), OpcoesProcessamento(regras=[{"tipo": "X", "palavras": ["X"]}])) != chave
+    assert cache.chave(str(tmp_path / "a.xlsx"), OpcoesProcessamento(processos_pdf=4, linhas_por_bloco=10)) == chave
+    assert cache.chave(str(tmp_path / "nao_existe.xlsx"), opcoes) is None
+
+    monkeypatch.setattr(modulo_cache, "VERSAO_PROCESSAMENTO", "versao-nova")
+    assert cache.chave(str(tmp_path / "a.xlsx"), opcoes) != chave
+
+def test_segunda_execucao_restaura_do_cache(tmp_path):
+    entrada, saida = tmp_path / "entrada", tmp_path / "saida"
+    entrada.mkdir()
+    saida.mkdir()
+    for semente in range(3):
+        gravar_xlsx(str(entrada / f"cliente_{semente}.xlsx"), 100, semente)
+
+    primeira = executar(entrada, saida, tmp_path / "cache")
+    assert primeira["cache"] == 0
+    relatorios = {arquivo.name: arquivo.read_text(encoding="utf-8") for arquivo in saida.glob("*.txt")}
+    lancamentos = (saida / "cliente_0_lancamentos.xlsx").read_bytes()
+    for arquivo in saida.iterdir():
+        arquivo.unlink()
+
+    segunda = executar(entrada, saida, tmp_path / "cache")
+    assert segunda["cache"] == 3
+    assert {arquivo.name: arquivo.read_text(encoding="utf-8") for arquivo in saida.glob("*.txt")} == relatorios
+    assert (saida / "cliente_0_lancamentos.xlsx").read_bytes() == lancamentos
+
+    # Com outras opções o arquivo é processado de novo
+    assert executar(entrada, saida, tmp_path / "cache", "--formato-lancamentos", "csv")["cache"] == 0
+
+def test_arquivo_com_erro_nao_e_guardado(tmp_path):
+    cache = CacheResultados(str(tmp_path / "cache"))
+    caminho = tmp_path / "a.xlsx"
+    caminho.write_bytes(b"conteudo")
+    resultado = novo_resultado(str(caminho))
+    resultado["status"] = "erro"
+    cache.guardar(cache.chave(str(caminho)), str(caminho), resultado)
+    assert cache.entradas() == []
+
+def test_limite_remove_as_menos_usadas(tmp_path):
+    cache = CacheResultados(str(tmp_path / "cache"), limite_bytes=250)
+    for indice in range(3):
+        pasta = tmp_path / "cache" / f"entrada_{indice}"
+        pasta.mkdir()
+        (pasta / "resultado.json").write_bytes(b"x" * 100)
+        os.utime(pasta, (1000 + indice, 1000 + indice))
+    cache.limitar_tamanho()
+    assert sorted(os.path.basename(caminho) for _, _, caminho in cache.entradas()) == ["entrada_1", "entrada_2"]
@@ -0,0 +1,94 @@
+import itertools
+import random
+import time
+
+import pytest
+
+from balancete import composicao
+from balancete.composicao import buscar_combinacoes, explicar_diferenca, meio_a_meio, ramificar
+
+
+def forca_bruta(valores, alvo):
+    """Todas as combinações (índices) que somam o alvo, as menores primeiro."""
+    return [list(combinacao) for tamanho in range(1, len(valores) + 1)
+            for combinacao in itertools.combinations(range(len(valores)), tamanho)
+            if sum(valores[i] for i in combinacao) == alvo]
+
+def prazo(segundos=10):
+    return time.perf_counter() + segundos
+
+def chave(combinacao):
+    return len(combinacao), combinacao
+
+
+@pytest.mark.parametrize("semente", range(30))
+def test_meio_a_meio_igual_forca_bruta(semente):
+    sorteio = random.Random(semente)
+    valores = [sorteio.randint(-3000, 10000) for _ in range(sorteio.randint(1, 12))]
+    alvo = sum(sorteio.sample(valores, sorteio.randint(1, len(valores))))
+    esperadas = sorted(forca_bruta(valores, alvo), key=chave)
+    encontradas = meio_a_meio(valores, alvo, 5)
+    assert all(sum(valores[i] for i in combinacao) == alvo for combinacao in encontradas)
+    # As menores: mesmos tamanhos da força bruta
+    assert [len(c) for c in encontradas] == [len(c) for c in esperadas[:5]]
+
+@pytest.mark.parametrize("semente", range(30))
+def test_ramificar_igual_forca_bruta(semente):
+    sorteio = random.Random(semente)
+    valores = [sorteio.randint(-50, 100) for _ in range(sorteio.randint(1, 12))]
+    alvo = sorteio.randint(-50, 200)
+    combinacoes, completa = ramificar(valores, alvo, prazo())
+    assert completa
+    assert sorted(combinacoes) == sorted(forca_bruta(valores, alvo))
+
+def test_ramificar_itens_que_se_anulam():
+    # {7, 26, 77} e {7, 26, 77, 2, -2} somam 110
+    valores = [7, 11, 77, 2, -2, 26]
+    combinacoes, completa = ramificar(valores, 110, prazo())
+    assert completa
+    assert sorted(combinacoes) == [[0, 2, 3, 4, 5], [0, 2, 5]]
+
+def test_sem_subconjunto_exato():
+    valores = [200 * i + 2 for i in range(60)]
+    # Todos os valores são pares: nenhuma soma dá um alvo ímpar
+    assert buscar_combinacoes(valores, 1001, prazo()) == ([], True)
+    assert buscar_combinacoes(valores[:10], 1001, prazo()) == ([], True)
+
+def test_prazo_esgotado():
+    sorteio = random.Random(1)
+    # Valores pares e alvo ímpar: a busca com poda não acha nada e para no prazo já vencido
+    valores = [sorteio.randint(1, 10 ** 6) * 2 for _ in range(100)]
+    combinacoes, completa = buscar_combinacoes(valores, sum(valores) // 2 | 1, time.perf_counter())
+    assert combinacoes == []
+    assert not completa
+
+def test_acima_do_limite_so_pares(monkeypatch):
+    monkeypatch.setattr(composicao, "LIMITE_RAMIFICAR", 50)
+    valores = list(range(1, 61))
+    combinacoes, completa = buscar_combinacoes(valores, 6, prazo())
+    # Sem a busca com poda, [0, 1, 2] (1 + 2 + 3) não aparece
+    assert combinacoes == [[5], [0, 4], [1, 3]]
+    assert not completa
+
+def test_explicar_diferenca_por_notas_sem_aquisicao():
+    notas = [("1", 0, 100), ("2", 0, 250), ("3", 0, 333), ("4", 500, 0)]
+    combinacoes, completa, alvo = explicar_diferenca(notas, 333, 1)
+    assert (combinacoes, completa, alvo) == ([[("3", 333)]], True, "sem_aquisicao")
+
+def test_explicar_diferenca_ampliada_com_creditos():
+    notas = [("1", 0, 100), ("2", 40, 0)]
+    combinacoes, _, alvo = explicar_diferenca(notas, 60, 1)
+    assert alvo == "com_saldo"
+    assert combinacoes == [[("1", 100), ("2", -40)]]
+
+def test_explicar_diferenca_pelo_saldo_anterior(monkeypatch):
+    # Com a busca da diferença incompleta (muitas notas), o saldo anterior de duas notas ainda é achado
+    monkeypatch.setattr(composicao, "LIMITE_RAMIFICAR", 50)
+    sorteio = random.Random(3)
+    notas = [(str(i), 0, sorteio.randint(10 ** 5, 10 ** 8)) for i in range(100)]
+    saldo_anterior = notas[5][2] + notas[9][2]
+    diferenca = sum(debito for _, _, debito in notas) - saldo_anterior
+    combinacoes, completa, alvo = explicar_diferenca(notas, diferenca, 1, saldo_anterior)
+    assert alvo == "saldo_anterior"
+    assert not completa
+    assert [("5", notas[5][2]), ("9", notas[9][2])] in combinacoes
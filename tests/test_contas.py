@@ -0,0 +1,75 @@
+import datetime
+
+import openpyxl
+
+from balancete.armazem import ArmazemLancamentos
+from balancete.contas import LeitorContas
+from balancete.indice import IndiceNotas
+from balancete.processamento import OpcoesProcessamento, processar_planilha_xlsx
+from gerar_balancete import CABECALHO
+
+
+def gravar_contas(caminho, contas):
+    """
+    Balancete com várias contas na mesma aba: contas é uma lista de (titulo,
+    saldo_anterior, lancamentos); saldo_anterior None omite a linha de SALDO ANTERIOR.
+    """
+    livro = openpyxl.Workbook()
+    aba = livro.active
+    data = datetime.datetime(2024, 1, 10)
+    for titulo, saldo_anterior, lancamentos in contas:
+        aba.append([titulo])
+        aba.append(CABECALHO)
+        if saldo_anterior is not None:
+            aba.append([None, None, "SALDO ANTERIOR", None, None, None, -saldo_anterior])
+        for lote, (historico, debito, credito) in enumerate(lancamentos):
+            aba.append([data, lote, historico, None, debito, credito, None])
+    livro.save(caminho)
+
+def processar(tmp_path):
+    """A mesma NF 100 em duas contas: conciliada em cada uma, ficaria com diferença se as contas se somassem."""
+    entrada = tmp_path / "cliente_2024-01.xlsx"
+    gravar_contas(entrada, [
+        ("CONTA: 2.1.1.01 - FORNECEDORES", 0.0, [("AQUISICAO CONF NF 100 ACME", None, 50.0),
+                                                 ("PAGAMENTO NF. 100 ACME", 50.0, None)]),
+        ("CONTA: 1.1.5.01 - ADIANTAMENTOS", 30.0, [("PAGAMENTO NF. 100 ACME", 30.0, None),
+                                                  ("AQUISICAO CONF NF 200 ACME", None, 10.0)]),
+    ])
+    armazem = ArmazemLancamentos(str(tmp_path / "base"))
+    opcoes = OpcoesProcessamento(por_conta=True, indexar_notas=True)
+    chave = armazem.chave(str(entrada), opcoes)
+    resultado = processar_planilha_xlsx(str(entrada), str(tmp_path), str(tmp_path), opcoes, armazem.caminho(chave))
+    assert resultado["status"] == "ok"
+    armazem.registrar([(str(entrada), chave, resultado)])
+    return entrada, armazem, resultado
+
+
+def test_indice_separa_a_mesma_nf_por_conta(tmp_path):
+    entrada, _, resultado = processar(tmp_path)
+    indice = IndiceNotas(str(tmp_path / "notas.db"))
+    try:
+        indice.registrar([(str(entrada), None, resultado["indice_notas"])])
+        notas = {nota["conta"]: nota for nota in indice.consultar(numero="100")}
+        assert set(notas) == {"CONTA: 2.1.1.01 - FORNECEDORES", "CONTA: 1.1.5.01 - ADIANTAMENTOS"}
+        assert notas["CONTA: 2.1.1.01 - FORNECEDORES"]["status"] == "OK"
+        assert notas["CONTA: 1.1.5.01 - ADIANTAMENTOS"]["status"] == "Sem aquisição registrada"
+        assert [nota["numero"] for nota in indice.consultar(conta="CONTA: 1.1.5.01 - ADIANTAMENTOS")] == ["100", "200"]
+    finally:
+        indice.fechar()
+
+def test_reconciliar_por_conta_igual_ao_relatorio(tmp_path):
+    entrada, armazem, resultado = processar(tmp_path)
+    assert [conta["saldo_anterior"] for conta in armazem.localizar(str(entrada))["contas"]] == ["0,00", "30,00"]
+    with open(resultado["relatorio"], encoding="utf-8") as f:
+        assert armazem.reconciliar(str(entrada)) == f.read().split("\n")
+
+def test_contas_sem_saldo_anterior_separadas_pelo_titulo(tmp_path):
+    entrada = tmp_path / "contas.xlsx"
+    gravar_contas(entrada, [
+        ("CONTA: 1 - FORNECEDORES", None, [("AQUISICAO CONF NF 100 ACME", None, 50.0)]),
+        # Quebra de página repetindo o título e o cabeçalho da mesma conta
+        ("CONTA: 1 - FORNECEDORES", None, [("PAGAMENTO NF. 100 ACME", 50.0, None)]),
+        ("CONTA: 2 - ADIANTAMENTOS", None, [("PAGAMENTO NF. 300 ACME", 20.0, None)]),
+    ])
+    contas = list(LeitorContas(str(entrada)).contas())
+    assert [conta["conta"] for conta in contas] == ["CONTA: 1 - FORNECEDORES", "CONTA: 2 - ADIANTAMENTOS"]
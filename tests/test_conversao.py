@@ -0,0 +1,73 @@
+import os
+import sys
+
+import pytest
+
+from balancete.conversao import ConversorLibreOffice
+
+pytestmark = pytest.mark.skipif(os.name != "posix", reason="o LibreOffice falso é um script executável")
+
+# Imita o soffice: grava NOME.xlsx em --outdir para cada arquivo, anota cada execução
+# e termina com erro (sem converter nada) se o lote tiver um arquivo "corrompido"
+SOFFICE_FALSO = """#!{python}
+import os, shutil, sys, time
+argumentos = sys.argv[1:]
+outdir = argumentos[argumentos.index("--outdir") + 1]
+arquivos = argumentos[argumentos.index("--outdir") + 2:]
+with open({execucoes!r}, "a") as f:
+    f.write(" ".join(os.path.basename(arquivo) for arquivo in arquivos) + "\\n")
+if any("lento" in arquivo for arquivo in arquivos):
+    time.sleep(30)
+if any("corrompido" in arquivo for arquivo in arquivos):
+    sys.exit(1)
+for arquivo in arquivos:
+    shutil.copy(arquivo, os.path.join(outdir, os.path.splitext(os.path.basename(arquivo))[0] + ".xlsx"))
+"""
+
+
+@pytest.fixture
+def soffice(tmp_path):
+    caminho = tmp_path / "soffice"
+    execucoes = tmp_path / "execucoes.txt"
+    caminho.write_text(SOFFICE_FALSO.format(python=sys.executable, execucoes=str(execucoes)))
+    caminho.chmod(0o755)
+    return str(caminho), execucoes
+
+def arquivos(pasta, nomes):
+    caminhos = []
+    for nome in nomes:
+        (pasta / nome).write_bytes(b"xls")
+        caminhos.append(str(pasta / nome))
+    return caminhos
+
+
+def test_converte_em_lotes(tmp_path, soffice):
+    caminho_soffice, execucoes = soffice
+    caminhos = arquivos(tmp_path, [f"{nome}.xls" for nome in "abcde"])
+    with ConversorLibreOffice(caminho_soffice, arquivos_por_lote=2) as conversor:
+        convertidos = conversor.converter(caminhos, str(tmp_path))
+    assert execucoes.read_text().splitlines() == ["a.xls b.xls", "c.xls d.xls", "e.xls"]
+    assert convertidos == {caminho: caminho[:-4] + ".xlsx" for caminho in caminhos}
+
+def test_falha_no_lote_reconvertida_individualmente(tmp_path, soffice):
+    caminho_soffice, execucoes = soffice
+    caminhos = arquivos(tmp_path, ["a.xls", "corrompido.xls", "c.xls"])
+    with ConversorLibreOffice(caminho_soffice) as conversor:
+        convertidos = conversor.converter(caminhos, str(tmp_path))
+    assert execucoes.read_text().splitlines() == ["a.xls corrompido.xls c.xls", "a.xls", "corrompido.xls", "c.xls"]
+    assert [convertidos[caminho] is not None for caminho in caminhos] == [True, False, True]
+
+def test_nomes_repetidos_em_subpastas(tmp_path, soffice):
+    caminho_soffice, _ = soffice
+    caminhos = arquivos(tmp_path, ["a.xls", "a.htm"])
+    destino = tmp_path / "convertidos"
+    destino.mkdir()
+    with ConversorLibreOffice(caminho_soffice) as conversor:
+        convertidos = conversor.converter(caminhos, str(destino))
+    assert convertidos == {caminhos[0]: str(destino / "a.xlsx"), caminhos[1]: str(destino / "repetido_2" / "a.xlsx")}
+
+def test_tempo_limite_encerra_o_libreoffice(tmp_path, soffice):
+    caminho_soffice, _ = soffice
+    caminhos = arquivos(tmp_path, ["lento.xls"])
+    with ConversorLibreOffice(caminho_soffice, timeout_por_arquivo=1) as conversor:
+        assert conversor.converter(caminhos, str(tmp_path)) == {caminhos[0]: None}
@@ -0,0 +1,39 @@
+import pytest
+
+import benchmark
+from balancete.processamento import OpcoesProcessamento, processar_planilha_xlsx
+from gerar_balancete import LIMITE_LINHAS_XLS, LINHAS_EXTRAS, gerar_balancete, gravar_xls, linhas_balancete, suporta
+
+
+def test_mesma_semente_mesmo_balancete():
+    assert list(linhas_balancete(500, 7)) == list(linhas_balancete(500, 7))
+    assert list(linhas_balancete(500, 7)) != list(linhas_balancete(500, 8))
+    assert len(list(linhas_balancete(500))) == 500 + LINHAS_EXTRAS
+
+@pytest.mark.parametrize("semente", [1, 2, 3])
+def test_saldo_anterior_bate_com_os_pagamentos_do_periodo_anterior(tmp_path, semente):
+    caminho = gerar_balancete(str(tmp_path), 400, semente=semente)
+    resultado = processar_planilha_xlsx(caminho, str(tmp_path), str(tmp_path), OpcoesProcessamento())
+    assert resultado["status"] == "ok"
+    assert resultado["situacao"]["saldo"] == "ok"
+    assert resultado["situacao"]["diferenca"] == 0
+
+def test_gerar_reaproveita_o_arquivo(tmp_path):
+    caminho = gerar_balancete(str(tmp_path), 50)
+    with open(caminho, "ab") as f:
+        f.write(b"marca")
+    assert gerar_balancete(str(tmp_path), 50) == caminho
+    with open(caminho, "rb") as f:
+        assert f.read().endswith(b"marca")
+
+def test_xls_acima_do_limite(tmp_path):
+    linhas = LIMITE_LINHAS_XLS - LINHAS_EXTRAS + 1
+    assert not suporta("xls", linhas) and suporta("xlsx", linhas)
+    with pytest.raises(ValueError):
+        gravar_xls(str(tmp_path / "grande.xls"), linhas)
+
+def test_comparar_acusa_so_regressoes_acima_da_tolerancia():
+    referencia = {"cenarios": {"lento": {"segundos": 10.0}, "ruido": {"segundos": 0.01}, "igual": {"segundos": 2.0}}}
+    resultados = {"lento": {"segundos": 13.0}, "ruido": {"segundos": 0.05}, "igual": {"segundos": 2.1},
+                  "novo": {"segundos": 1.0}}
+    assert benchmark.comparar(resultados, referencia, 0.25) == ["lento"]
@@ -0,0 +1,92 @@
+import sqlite3
+
+import pytest
+
+from balancete import consulta
+from balancete.indice import IndiceNotas
+
+
+def totais(inicio, notas):
+    return {"inicio": inicio, "fim": inicio, "notas": notas}
+
+@pytest.fixture
+def indice(tmp_path):
+    indice = IndiceNotas(str(tmp_path / "notas.db"))
+    # NF 1 adquirida em janeiro e paga em fevereiro; NF 2 paga a menor; NF 3 sem pagamento
+    indice.registrar([
+        ("entrada/cliente_2024-01.xlsx", "a", totais("2024-01-05", [["1", 10000, 0], ["2", 5000, 0]])),
+        ("entrada/cliente_2024-02.xlsx", "b", totais("2024-02-03", [["1", 0, 10000], ["2", 0, 4000],
+                                                                     ["3", 700, 0]])),
+    ])
+    yield indice
+    indice.fechar()
+
+
+def test_notas_conciliadas_entre_periodos(indice):
+    notas = {nota["numero"]: nota for nota in indice.consultar(cliente="cliente")}
+    assert notas["1"]["status"] == "OK"
+    assert notas["1"]["periodos_aquisicao"] == ["2024-01"]
+    assert notas["1"]["periodos_pagamento"] == ["2024-02"]
+    assert notas["2"]["status"] == "Diferença 10,00"
+    assert [nota["numero"] for nota in indice.consultar(somente_pendentes=True)] == ["2", "3"]
+
+def test_reprocessar_em_outro_mes_substitui_as_notas_do_arquivo(indice):
+    # O mesmo arquivo, corrigido, agora começa em março e paga a NF 2 inteira
+    indice.registrar([("entrada/cliente_2024-02.xlsx", "c",
+                       totais("2024-03-01", [["1", 0, 10000], ["2", 0, 5000], ["3", 700, 700]]))])
+    assert [periodo["periodo"] for periodo in indice.periodos()] == ["2024-01", "2024-03"]
+    notas = {nota["numero"]: nota for nota in indice.consultar(numero=None)}
+    assert notas["1"]["debito"] == 10000
+    assert notas["1"]["periodos_pagamento"] == ["2024-03"]
+    assert indice.consultar(somente_pendentes=True) == []
+
+def test_reprocessar_sem_notas_apaga_o_arquivo(indice):
+    indice.registrar([("entrada/cliente_2024-02.xlsx", "c", None)])
+    assert [periodo["arquivo"] for periodo in indice.periodos()] == ["cliente_2024-01.xlsx"]
+    assert [nota["numero"] for nota in indice.consultar(somente_pendentes=True)] == ["1", "2"]
+
+def test_consulta_pendentes(indice, tmp_path, capsys):
+    indice.fechar()
+    assert consulta.main([str(tmp_path / "notas.db"), "--pendentes"]) == 0
+    linhas = capsys.readouterr().out.splitlines()
+    assert linhas == [
+        "cliente | NF 2 -> Crédito: 50,00 | Débito: 40,00 | Diferença 10,00 | Aquisição: 2024-01 | Pagamento: 2024-02",
+        "cliente | NF 3 -> Crédito: 7,00 | Débito: 0,00 | Sem pagamento registrado | Aquisição: 2024-02 | Pagamento: -",
+    ]
+
+def test_consulta_sem_indice(tmp_path):
+    assert consulta.main([str(tmp_path / "nao_existe.db")]) == 2
+
+def test_indice_do_esquema_2_e_migrado(tmp_path):
+    caminho = str(tmp_path / "antigo.db")
+    conexao = sqlite3.connect(caminho)
+    conexao.executescript("""
+        CREATE TABLE periodos (cliente TEXT NOT NULL, periodo TEXT NOT NULL, arquivo TEXT NOT NULL,
+            inicio TEXT NOT NULL, fim TEXT NOT NULL, chave TEXT, versao TEXT NOT NULL, registrado_em TEXT NOT NULL,
+            PRIMARY KEY (cliente, periodo, arquivo));
+        CREATE INDEX periodos_chave ON periodos (chave, cliente);
+        CREATE TABLE notas (cliente TEXT NOT NULL, numero TEXT NOT NULL, periodo TEXT NOT NULL,
+            arquivo TEXT NOT NULL, credito INTEGER NOT NULL, debito INTEGER NOT NULL,
+            PRIMARY KEY (cliente, numero, periodo, arquivo)) WITHOUT ROWID;
+        INSERT INTO periodos VALUES ('cliente', '2024-01', 'cliente_2024-01.xlsx', '2024-01-05', '2024-01-31',
+                                     'a', '5', '2024-02-01T10:00:00');
+        INSERT INTO notas VALUES ('cliente', '9', '2024-01', 'cliente_2024-01.xlsx', 1500, 0);
+        PRAGMA user_version = 2;
+    """)
+    conexao.close()
+    indice = IndiceNotas(caminho)
+    try:
+        assert [(nota["conta"], nota["numero"], nota["credito"]) for nota in indice.consultar()] == [("", "9", 1500)]
+        assert len(indice.periodos()) == 1
+    finally:
+        indice.fechar()
+
+def test_indice_de_versao_mais_nova_e_recusado(tmp_path):
+    caminho = str(tmp_path / "novo.db")
+    conexao = sqlite3.connect(caminho)
+    conexao.executescript("CREATE TABLE notas (x); CREATE TABLE periodos (x); PRAGMA user_version = 99;")
+    conexao.close()
+    assert consulta.main([caminho]) == 2
+    conexao = sqlite3.connect(caminho)
+    assert conexao.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table'").fetchone()[0] == 2
+    conexao.close()
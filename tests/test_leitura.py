@@ -0,0 +1,146 @@
+import datetime
+from decimal import Decimal
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from balancete import leitura
+from balancete.leitura import FormatoNaoSuportado, iterar_abas, iterar_linhas, ler_planilha
+from balancete.processamento import (
+    OpcoesProcessamento, PlanilhaInvalida, extrair_dados_completo, extrair_dados_streaming, processar_planilha_xlsx,
+)
+from gerar_balancete import CABECALHO, gravar_xls, gravar_xlsx, linhas_balancete, texto_pdf
+
+
+def linhas_read_excel(caminho, engine):
+    """Linhas do pd.read_excel como tuplas sem as células vazias do fim, para comparar com iterar_linhas."""
+    df = pd.read_excel(caminho, header=None, engine=engine)
+    linhas = []
+    for linha in df.astype(object).where(df.notna(), None).itertuples(index=False):
+        linha = list(linha)
+        while linha and linha[-1] is None:
+            linha.pop()
+        linhas.append(tuple(linha))
+    return linhas
+
+def sem_vazias_no_fim(linhas):
+    return [tuple(linha[:max((i + 1 for i, valor in enumerate(linha) if valor is not None), default=0)])
+            for linha in linhas]
+
+def gravar_linhas(caminho, linhas):
+    livro = openpyxl.Workbook()
+    for linha in linhas:
+        livro.active.append(linha)
+    livro.save(caminho)
+
+
+def test_xls_lido_sem_conversao_igual_read_excel(tmp_path):
+    caminho = str(tmp_path / "balancete.xls")
+    gravar_xls(caminho, 300)
+    assert sem_vazias_no_fim(iterar_linhas(caminho)) == linhas_read_excel(caminho, "xlrd")
+    assert ler_planilha(caminho).shape == pd.read_excel(caminho, header=None, engine="xlrd").shape
+    assert [nome for nome, _ in iterar_abas(caminho)] == ["Razao"]
+
+def test_xls_e_xlsx_geram_o_mesmo_relatorio(tmp_path):
+    relatorios = []
+    for extensao, gravar in [("xls", gravar_xls), ("xlsx", gravar_xlsx)]:
+        caminho = str(tmp_path / f"balancete.{extensao}")
+        gravar(caminho, 300)
+        resultado = processar_planilha_xlsx(caminho, str(tmp_path), str(tmp_path), OpcoesProcessamento(),
+                                            nome_base=extensao)
+        assert resultado["status"] == "ok"
+        with open(resultado["relatorio"], encoding="utf-8") as f:
+            relatorios.append(f.read())
+    assert relatorios[0] == relatorios[1]
+
+@pytest.mark.parametrize("nome", ["renomeado.xls", "renomeado.xlsx"])
+def test_arquivo_ilegivel_vai_para_a_conversao(tmp_path, nome):
+    caminho = tmp_path / nome
+    caminho.write_bytes(b"PK\x03\x04 nem xls nem xlsx")
+    with pytest.raises(FormatoNaoSuportado):
+        list(iterar_linhas(str(caminho)))
+    with pytest.raises(FormatoNaoSuportado):
+        ler_planilha(str(caminho))
+
+
+def test_xlsx_em_streaming_igual_read_excel(tmp_path):
+    caminho = str(tmp_path / "balancete.xlsx")
+    gravar_xlsx(caminho, 300)
+    assert sem_vazias_no_fim(iterar_linhas(caminho)) == linhas_read_excel(caminho, "openpyxl")
+
+@pytest.mark.parametrize("gravar, extensao", [(gravar_xlsx, "xlsx"), (gravar_xls, "xls")])
+def test_streaming_igual_leitura_completa(tmp_path, gravar, extensao):
+    caminho = str(tmp_path / f"balancete.{extensao}")
+    gravar(caminho, 300)
+    streaming, saldo_streaming = extrair_dados_streaming(caminho)
+    completo, saldo_completo = extrair_dados_completo(caminho)
+    assert saldo_streaming == saldo_completo > 0
+    # O pandas preenche as células vazias com NaN; o streaming, com None
+    completo = completo.reset_index(drop=True).astype(object)
+    pd.testing.assert_frame_equal(streaming.reset_index(drop=True), completo.where(completo.notna(), None))
+
+def test_streaming_sem_saldo_anterior(tmp_path, capsys):
+    caminho = str(tmp_path / "sem_saldo.xlsx")
+    gravar_linhas(caminho, [["EMPRESA"], CABECALHO, [None, 1, "AQUISICAO NF 10", None, None, 5.5, -5.5]])
+    df_final, saldo = extrair_dados_streaming(caminho)
+    assert saldo == Decimal("0.00")
+    assert df_final["Texto_Completo"].tolist() == ["AQUISICAO NF 10"]
+    assert "'SALDO ANTERIOR' não encontrado" in capsys.readouterr().out
+
+def test_streaming_sem_cabecalho(tmp_path):
+    caminho = str(tmp_path / "sem_cabecalho.xlsx")
+    gravar_linhas(caminho, [["EMPRESA"], ["DATA", "HISTÓRICO", "VALOR"]])
+    with pytest.raises(PlanilhaInvalida):
+        extrair_dados_streaming(caminho)
+
+def gravar_html(caminho, linhas, codificacao="cp1252", declarar=True):
+    """Balancete exportado como página HTML: uma <tr> por linha, valores como o sistema os imprime."""
+    meta = f'<meta http-equiv="Content-Type" content="text/html; charset={codificacao}">' if declarar else ""
+    partes = [f"<html><head>{meta}</head><body><table border=1>"]
+    for linha in linhas:
+        celulas = "".join(f"<td>{'' if valor is None else texto_pdf(valor)}</td>" for valor in linha)
+        partes.append(f"<tr>{celulas}</tr>\n")
+    partes.append("</table></body></html>")
+    with open(caminho, "w", encoding=codificacao) as f:
+        f.write("".join(partes))
+
+
+@pytest.fixture(params=["lxml", "html.parser"])
+def parser_html(request, monkeypatch):
+    if request.param == "html.parser":
+        monkeypatch.setattr(leitura, "criar_parser_html", leitura.ParserHtmlPadrao)
+    else:
+        pytest.importorskip("lxml")
+    return request.param
+
+
+def test_celulas_do_html(tmp_path, parser_html, monkeypatch):
+    # Blocos pequenos: caracteres de várias bytes e tags cortados entre um bloco e outro
+    monkeypatch.setattr(leitura, "TAMANHO_BLOCO_HTML", 7)
+    caminho = tmp_path / "balancete.htm"
+    caminho.write_text(
+        '<html><head><meta charset="utf-8"></head><body><table>'
+        '<tr><th>DATA</th><th colspan="2">CONTRAPARTIDA/HISTÓRICO</th><th>DÉBITO</th></tr>'
+        '<tr><td>05/01/2024</td><td>AQUISIÇÃO&nbsp;NF<br>123 &amp; CIA</td><td></td><td>1.234,56</td></tr>'
+        '<tr><td>31/02/2024</td><td>-10</td><td>  </td><td>7,5</td></tr>'
+        "</table></body></html>", encoding="utf-8")
+    assert list(iterar_linhas(str(caminho))) == [
+        ("DATA", "CONTRAPARTIDA/HISTÓRICO", None, "DÉBITO"),
+        (datetime.datetime(2024, 1, 5), "AQUISIÇÃO NF 123 & CIA", None, 1234.56),
+        ("31/02/2024", -10, None, 7.5),
+    ]
+
+@pytest.mark.parametrize("codificacao, declarar", [("cp1252", True), ("utf-8", False), ("cp1252", False)])
+def test_html_igual_xlsx(tmp_path, parser_html, codificacao, declarar):
+    # .xls com HTML dentro, como alguns sistemas exportam: lido sem o LibreOffice
+    gravar_html(tmp_path / "balancete.xls", linhas_balancete(300), codificacao, declarar)
+    gravar_xlsx(str(tmp_path / "balancete.xlsx"), 300)
+    relatorios = []
+    for nome in ("balancete.xls", "balancete.xlsx"):
+        resultado = processar_planilha_xlsx(str(tmp_path / nome), str(tmp_path), str(tmp_path), OpcoesProcessamento(),
+                                            nome_base=nome.replace(".", "_"))
+        assert resultado["status"] == "ok"
+        with open(resultado["relatorio"], encoding="utf-8") as f:
+            relatorios.append(f.read())
+    assert relatorios[0] == relatorios[1]
@@ -0,0 +1,83 @@
+import pytest
+
+from balancete import leitura_pdf
+from balancete.lote import PipelineLote, processar_caminhos
+from balancete.leitura_pdf import distribuir_linha, e_valor, sinal_no_inicio
+from balancete.processamento import OpcoesProcessamento, processar_planilha_xlsx
+from gerar_balancete import gravar_pdf, gravar_xlsx
+
+pytest.importorskip("pypdfium2")
+
+# Cabeçalho como o de gerar_balancete.gravar_pdf: (texto, x0, x1, numerica)
+LAYOUT = [("DATA", 30, 50, False), ("LOTE", 85, 105, False), ("CONTRAPARTIDA/HISTÓRICO", 130, 230, False),
+          ("DÉBITO", 535, 560, True), ("CRÉDITO", 640, 670, True), ("SALDO-EXERCÍCIO", 740, 800, True)]
+
+
+def trecho(texto, x0, x1):
+    return {"text": texto, "x0": x0, "x1": x1, "top": 100}
+
+def relatorio(caminho, pasta, nome_base, processos_pdf=1):
+    resultado = processar_planilha_xlsx(caminho, str(pasta), str(pasta), OpcoesProcessamento(processos_pdf=processos_pdf),
+                                        nome_base=nome_base)
+    assert resultado["status"] == "ok"
+    with open(resultado["relatorio"], encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("texto, esperado", [
+    ("1.234,56-", "-1.234,56"), ("1.234,56", "1.234,56"), ("-10,00", "-10,00"), ("10,00-", "-10,00"),
+    ("NF 123-", "NF 123-"), ("1234-", "1234-"), ("", ""), (None, ""),
+])
+def test_sinal_no_inicio(texto, esperado):
+    assert sinal_no_inicio(texto) == esperado
+
+def test_valores_so_com_centavos():
+    assert e_valor("1.234,56") and e_valor("0,01") and e_valor("12,00-")
+    assert not e_valor("123") and not e_valor("01/02/2024") and not e_valor("1.234")
+
+def test_distribuir_linha_pelo_alinhamento():
+    linha = [trecho("02/01/2024", 30, 70), trecho("100001", 85, 110), trecho("PAGAMENTO NF. 10 ACME", 130, 220),
+             # Número sem centavos depois do histórico: texto, não valor
+             trecho("2024", 300, 320), trecho("1.234,56", 524, 560), trecho("99.999,99-", 752, 800)]
+    assert distribuir_linha(linha, LAYOUT) == ["02/01/2024", "100001", "PAGAMENTO NF. 10 ACME 2024", "1.234,56", None,
+                                              "99.999,99-"]
+
+def test_distribuir_linha_do_cabecalho_repetido():
+    linha = [trecho(texto, x0, x1) for texto, x0, x1, _ in LAYOUT]
+    assert distribuir_linha(linha, LAYOUT) == [texto for texto, _, _, _ in LAYOUT]
+
+def test_valor_antes_das_colunas_de_valores_fica_no_texto():
+    assert distribuir_linha([trecho("SALDO ANTERIOR", 130, 200), trecho("5,00", 210, 230)], LAYOUT)[2] == \
+        "SALDO ANTERIOR 5,00"
+
+def test_pdf_igual_xlsx_sequencial_e_paralelo(tmp_path, monkeypatch):
+    # 400 lançamentos: 9 páginas, com o cabeçalho repetido em cada uma
+    gravar_pdf(str(tmp_path / "balancete.pdf"), 400)
+    gravar_xlsx(str(tmp_path / "balancete.xlsx"), 400)
+    monkeypatch.setattr(leitura_pdf, "PAGINAS_POR_TAREFA", 2)
+    esperado = relatorio(str(tmp_path / "balancete.xlsx"), tmp_path, "xlsx")
+    assert relatorio(str(tmp_path / "balancete.pdf"), tmp_path, "pdf") == esperado
+    assert relatorio(str(tmp_path / "balancete.pdf"), tmp_path, "pdf_paralelo", processos_pdf=3) == esperado
+
+def test_pdfs_dividem_os_processos_com_as_planilhas(tmp_path, monkeypatch):
+    caminhos = [str(tmp_path / "a.pdf"), str(tmp_path / "b.xlsx"), str(tmp_path / "c.pdf")]
+    gravar_pdf(caminhos[0], 120)
+    gravar_xlsx(caminhos[1], 120)
+    gravar_pdf(caminhos[2], 120)
+    enviados = []
+    executar = PipelineLote.executar
+
+    def registrar(self, tarefas):
+        enviados.append(([caminho for _, caminho, _, _, _ in tarefas], self.processos, self.opcoes.processos_pdf))
+        return executar(self, tarefas)
+
+    monkeypatch.setattr(PipelineLote, "executar", registrar)
+    resultados = processar_caminhos(caminhos, str(tmp_path), processos=2, pasta_lancamentos=str(tmp_path))
+    # Um só executor para o lote todo, com as páginas de cada PDF num processo só
+    assert enviados == [(caminhos, 2, 1)]
+    relatorios = []
+    for resultado in resultados:
+        assert resultado["status"] == "ok"
+        with open(resultado["relatorio"], encoding="utf-8") as f:
+            relatorios.append(f.read())
+    assert relatorios[0] == relatorios[1] == relatorios[2]
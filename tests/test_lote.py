@@ -0,0 +1,148 @@
+import json
+import os
+import threading
+
+import pytest
+
+from balancete import lote
+from balancete.__main__ import SAIDA_FALHAS, SAIDA_OK, SAIDA_PARAMETROS, SAIDA_SEM_ARQUIVOS, main
+from balancete.cache import CacheResultados
+from balancete.conversao import separar_nomes_repetidos
+from balancete.lote import PipelineLote, nomes_saida, processar_pasta
+from gerar_balancete import gravar_xlsx
+
+
+def test_nomes_saida_sem_repeticao():
+    assert nomes_saida(["in/a.xlsx", "in/b.xls", "in/c.pdf"]) == ["a", "b", "c"]
+
+def test_nomes_saida_com_extensao_quando_repete():
+    assert nomes_saida(["in/a.pdf", "in/A.xls", "in/a.xlsx", "in/b.xlsx"]) == ["a_pdf", "A_xls", "a_xlsx", "b"]
+
+def test_nomes_saida_numerados_quando_ainda_repete():
+    caminhos = [os.path.join("x", "a.xls"), os.path.join("y", "a.xls"), "a_xls.xlsx"]
+    assert nomes_saida(caminhos) == ["a_xls", "a_xls_2", "a_xls_3"]
+
+def test_conversao_em_rodadas_sem_nomes_repetidos():
+    rodadas = separar_nomes_repetidos(["a.xls", "b.xls", "A.htm", "a.html", "c.xls"])
+    assert rodadas == [["a.xls", "b.xls", "c.xls"], ["A.htm"], ["a.html"]]
+
+
+def executar_com_limite(pipeline, tarefas, segundos=60):
+    """Executa o pipeline numa thread; falha se ele não terminar no prazo (em vez de travar o teste)."""
+    resultados = {}
+    thread = threading.Thread(target=lambda: resultados.update(pipeline.executar(tarefas)), daemon=True)
+    thread.start()
+    thread.join(segundos)
+    assert not thread.is_alive(), "PipelineLote travou"
+    return resultados
+
+def tarefas_lote(pasta, nomes):
+    tarefas = []
+    for indice, nome in enumerate(nomes):
+        caminho = str(pasta / nome)
+        # .xls com conteúdo .xlsx: o xlrd recusa e o arquivo vai para a conversão
+        gravar_xlsx(caminho, 50, indice)
+        tarefas.append((indice, caminho, str(pasta), None, os.path.splitext(nome)[0]))
+    return tarefas
+
+def test_pipeline_termina_se_a_conversao_morrer(tmp_path, monkeypatch):
+    def morrer(self, pasta_conversao):
+        raise RuntimeError("thread de conversão interrompida")
+
+    monkeypatch.setattr(PipelineLote, "converter_lotes", morrer)
+    tarefas = tarefas_lote(tmp_path, ["a.xls", "b.xls", "c.xlsx"])
+    resultados = executar_com_limite(PipelineLote(str(tmp_path), 1, soffice_path="soffice"), tarefas)
+    assert [resultados[indice]["status"] for indice in range(3)] == ["erro", "erro", "ok"]
+    assert "Falha na conversão" in resultados[0]["mensagem"]
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_pipeline_termina_se_a_gravacao_morrer(tmp_path, monkeypatch):
+    monkeypatch.setattr(lote, "FILA_GRAVACAO", 1)
+
+    def guardar(indice, resultado):
+        # Fora de Exception: derruba a thread de gravação
+        raise SystemExit
+
+    tarefas = tarefas_lote(tmp_path, [f"{nome}.xlsx" for nome in "abcde"])
+    resultados = executar_com_limite(PipelineLote(str(tmp_path), 1, guardar=guardar), tarefas)
+    assert [resultados[indice]["status"] for indice in range(5)] == ["ok"] * 5
+
+def test_pasta_vazia_grava_consolidado_so_com_total(tmp_path):
+    entrada, saida = tmp_path / "entrada", tmp_path / "saida"
+    entrada.mkdir()
+    saida.mkdir()
+    consolidado = saida / "consolidado.json"
+    assert main([str(entrada), str(saida), "--consolidado", str(consolidado), "--sem-cache"]) == SAIDA_SEM_ARQUIVOS
+    with open(consolidado, encoding="utf-8") as f:
+        assert [linha["arquivo"] for linha in json.load(f)] == ["TOTAL"]
+
+
+def pasta_com_planilhas(tmp_path, nome, quantidade):
+    entrada, saida = tmp_path / nome / "entrada", tmp_path / nome / "saida"
+    entrada.mkdir(parents=True)
+    saida.mkdir()
+    for semente in range(quantidade):
+        gravar_xlsx(str(entrada / f"cliente_{semente}.xlsx"), 200, semente)
+    return entrada, saida
+
+def test_paralelo_igual_sequencial(tmp_path):
+    relatorios = []
+    for nome, processos in [("sequencial", "1"), ("paralelo", "3")]:
+        entrada, saida = pasta_com_planilhas(tmp_path, nome, 4)
+        assert main([str(entrada), str(saida), "--processos", processos, "--sem-cache"]) == SAIDA_OK
+        relatorios.append({arquivo.name: arquivo.read_text(encoding="utf-8") for arquivo in saida.iterdir()})
+    assert len(relatorios[0]) == 4
+    assert relatorios[0] == relatorios[1]
+
+def test_arquivo_com_erro_nao_interrompe_o_lote(tmp_path):
+    entrada, saida = pasta_com_planilhas(tmp_path, "lote", 2)
+    (entrada / "corrompido.xlsx").write_bytes(b"nao e uma planilha")
+    resumo = tmp_path / "resumo.json"
+    assert main([str(entrada), str(saida), "--processos", "2", "--sem-cache", "--resumo", str(resumo)]) == SAIDA_FALHAS
+    with open(resumo, encoding="utf-8") as f:
+        assert [arquivo["status"] for arquivo in json.load(f)["arquivos"]] == ["ok", "ok", "erro"]
+
+@pytest.mark.parametrize("argumentos", [
+    ["--processos", "0"],
+    ["--linhas-por-bloco", "0"],
+    ["--por-conta", "--leitura", "blocos"],
+    ["--segundos-composicao", "-1"],
+    ["--consolidado", "consolidado.txt"],
+])
+def test_parametros_invalidos(tmp_path, argumentos):
+    entrada, saida = pasta_com_planilhas(tmp_path, "lote", 1)
+    assert main([str(entrada), str(saida), "--sem-cache", *argumentos]) == SAIDA_PARAMETROS
+    assert list(saida.iterdir()) == []
+
+def test_pasta_inexistente(tmp_path):
+    assert main([str(tmp_path / "nao_existe"), str(tmp_path), "--sem-cache"]) == SAIDA_PARAMETROS
+
+def test_progresso_de_cada_arquivo_inclusive_do_cache(tmp_path):
+    entrada, saida = pasta_com_planilhas(tmp_path, "lote", 3)
+    cache = CacheResultados(str(tmp_path / "cache"))
+    processar_pasta(str(entrada), str(saida), processos=1, cache=cache, pasta_lancamentos=str(saida))
+    (entrada / "cliente_1.xlsx").unlink()
+    gravar_xlsx(str(entrada / "cliente_1.xlsx"), 150, 9)
+    vistos = []
+    resultados = processar_pasta(str(entrada), str(saida), processos=2, cache=cache, pasta_lancamentos=str(saida),
+                                 progresso=lambda resultado: vistos.append((resultado["arquivo"], resultado["cache"])))
+    assert sorted(vistos) == [("cliente_0.xlsx", True), ("cliente_1.xlsx", False), ("cliente_2.xlsx", True)]
+    assert [resultado["status"] for resultado in resultados] == ["ok"] * 3
+
+@pytest.mark.parametrize("processos", [1, 2])
+def test_cancelar_entre_os_arquivos(tmp_path, processos):
+    entrada, saida = pasta_com_planilhas(tmp_path, "lote", 6)
+    cancelar = threading.Event()
+    vistos = []
+
+    def progresso(resultado):
+        vistos.append(resultado["status"])
+        cancelar.set()
+
+    resultados = processar_pasta(str(entrada), str(saida), processos=processos, pasta_lancamentos=str(saida),
+                                 progresso=progresso, cancelar=cancelar)
+    status = [resultado["status"] for resultado in resultados]
+    # Os arquivos já em execução terminam; os que não começaram ficam cancelados
+    assert 1 <= status.count("ok") <= processos
+    assert status.count("cancelado") == 6 - status.count("ok")
+    assert len(list(saida.glob("*_relatorio.txt"))) == status.count("ok")
@@ -0,0 +1,71 @@
+import json
+import sys
+
+import pytest
+
+from balancete.__main__ import SAIDA_OK, main
+from balancete.metricas import Medidor, perfilar
+from gerar_balancete import gravar_xlsx
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="memória atual lida de /proc")
+def test_memoria_medida_em_cada_etapa():
+    medidor = Medidor("a.xlsx")
+    with medidor.etapa("grande"):
+        grande = bytearray(200 * 1024 * 1024)
+    del grande
+    with medidor.etapa("pequena"):
+        pequena = bytearray(1024)
+    del pequena
+    grande, pequena = medidor.registros
+    assert grande["aumento_memoria_mb"] >= 150
+    assert pequena["aumento_memoria_mb"] < 50
+    assert pequena["pico_processo_mb"] >= grande["aumento_memoria_mb"]
+
+def test_etapa_acumulada_guarda_o_maior_aumento():
+    medidor = Medidor("a.xlsx")
+    for tamanho in (1, 120, 1):
+        with medidor.etapa_acumulada("bloco") as registro:
+            bloco = bytearray(tamanho * 1024 * 1024)
+            registro["linhas_entrada"] = tamanho
+        del bloco
+    registro, = medidor.registros
+    assert registro["vezes"] == 3
+    assert registro["linhas_entrada"] == 122
+    if registro["aumento_memoria_mb"] is not None:
+        assert registro["aumento_memoria_mb"] >= 100
+
+def test_perfil_com_a_extensao_e_sem_sobrescrever(tmp_path):
+    for caminho in ("entrada/a.xls", "entrada/a.xlsx", "entrada/a.pdf", "outra/a.xls"):
+        with perfilar(str(tmp_path), caminho):
+            sum(range(100))
+    assert sorted(arquivo.name for arquivo in tmp_path.iterdir()) == [
+        "a.pdf.prof", "a.xls.prof", "a.xls_2.prof", "a.xlsx.prof"]
+    assert all(arquivo.stat().st_size > 0 for arquivo in tmp_path.iterdir())
+
+def test_metricas_do_lote_em_json_lines(tmp_path):
+    entrada, saida = tmp_path / "entrada", tmp_path / "saida"
+    entrada.mkdir()
+    saida.mkdir()
+    for nome in ("a", "b"):
+        gravar_xlsx(str(entrada / f"{nome}.xlsx"), 100)
+    metricas = tmp_path / "metricas.jsonl"
+    argumentos = [str(entrada), str(saida), "--sem-cache", "--processos", "2", "--metricas", str(metricas),
+                  "--perfil", str(tmp_path / "perfis"), "--pasta-lancamentos", str(saida)]
+    assert main(argumentos) == SAIDA_OK
+    with open(metricas, encoding="utf-8") as f:
+        registros = [json.loads(linha) for linha in f]
+    etapas = {}
+    for registro in registros:
+        etapas.setdefault(registro["arquivo"], []).append(registro["etapa"])
+    for nome in ("a.xlsx", "b.xlsx"):
+        assert etapas[nome][:5] == ["leitura", "normalizacao", "conciliacao", "relatorio", "lancamentos"]
+    assert etapas[None][-1] == "total"
+    total = registros[-1]
+    assert (total["arquivos"], total["ok"]) == (2, 2)
+    assert sorted(arquivo.name for arquivo in (tmp_path / "perfis").iterdir()) == ["a.xlsx.prof", "b.xlsx.prof"]
+
+    # Uma segunda execução acrescenta as linhas, sem apagar as anteriores
+    assert main(argumentos) == SAIDA_OK
+    with open(metricas, encoding="utf-8") as f:
+        assert sum(1 for _ in f) == 2 * len(registros)
@@ -0,0 +1,60 @@
+from balancete import observador
+from balancete.observador import ObservadorPasta
+from balancete.processamento import novo_resultado
+
+
+def preparar(tmp_path, monkeypatch, status):
+    """Observador sem espera sobre uma planilha; processar_caminhos devolve os status da lista, um por chamada."""
+    entrada, saida = tmp_path / "entrada", tmp_path / "saida"
+    entrada.mkdir()
+    saida.mkdir()
+    (entrada / "a.xlsx").write_bytes(b"planilha")
+    chamadas = []
+
+    def processar_caminhos(caminhos, pasta_saida, **opcoes):
+        chamadas.append(caminhos)
+        resultado = novo_resultado(caminhos[0])
+        resultado["status"] = status[min(len(chamadas), len(status)) - 1]
+        return [resultado]
+
+    monkeypatch.setattr(observador, "processar_caminhos", processar_caminhos)
+    monkeypatch.setattr(observador, "ESPERA_NOVA_TENTATIVA", 0)
+    return ObservadorPasta(str(entrada), str(saida), espera=0), chamadas
+
+
+def test_erro_tentado_de_novo_ate_o_limite(tmp_path, monkeypatch):
+    obs, chamadas = preparar(tmp_path, monkeypatch, ["erro"])
+    obs.prontos()
+    for _ in range(observador.TENTATIVAS_ERRO + 2):
+        obs.ciclo()
+    assert len(chamadas) == observador.TENTATIVAS_ERRO
+
+def test_erro_seguido_de_sucesso_para_de_tentar(tmp_path, monkeypatch):
+    obs, chamadas = preparar(tmp_path, monkeypatch, ["erro", "ok"])
+    obs.prontos()
+    for _ in range(4):
+        obs.ciclo()
+    assert len(chamadas) == 2
+    assert "nova_tentativa_em" not in next(iter(obs.estado.values()))
+
+def test_aviso_nao_e_tentado_de_novo(tmp_path, monkeypatch):
+    obs, chamadas = preparar(tmp_path, monkeypatch, ["aviso"])
+    obs.prontos()
+    for _ in range(3):
+        obs.ciclo()
+    assert len(chamadas) == 1
+
+def test_falha_no_ciclo_nao_encerra_a_observacao(tmp_path, monkeypatch):
+    obs, _ = preparar(tmp_path, monkeypatch, ["ok"])
+    obs.intervalo = 0
+    ciclos = []
+
+    def ciclo():
+        ciclos.append(1)
+        if len(ciclos) == 3:
+            obs.parar.set()
+        raise OSError("pasta inacessível")
+
+    obs.ciclo = ciclo
+    obs.executar()
+    assert len(ciclos) == 3
@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import RAIZ
+
+PASTA_SRC = os.path.join(RAIZ, "src")
+
+
+def test_janela_importada_sem_pandas_nem_pillow():
+    # Num interpretador novo: os módulos já carregados pelos outros testes não contam
+    script = ("import sys, planilha; "
+              "print(sorted(m for m in ('pandas', 'numpy', 'PIL', 'balancete') if m in sys.modules))")
+    saida = subprocess.run([sys.executable, "-c", script], cwd=PASTA_SRC, capture_output=True, text=True, check=True)
+    assert saida.stdout.strip() == "[]"
+
+def test_icone_gerado_no_build(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    import planilha
+
+    destino = str(tmp_path / "icon.png")
+    planilha.gerar_icone(os.path.join(PASTA_SRC, "icon.jpg"), destino)
+    with Image.open(destino) as icone:
+        assert icone.format == "PNG"
+        assert icone.size == planilha.TAMANHO_ICONE
+        assert icone.mode == "RGBA"
+        # O fundo branco do icon.jpg fica transparente
+        assert icone.getpixel((0, 0))[3] == 0
+        assert "icc_profile" not in icone.info
+
+def test_icone_versionado_igual_ao_gerado(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    import planilha
+
+    destino = str(tmp_path / "icon.png")
+    planilha.gerar_icone(os.path.join(PASTA_SRC, "icon.jpg"), destino)
+    with Image.open(destino) as gerado, Image.open(os.path.join(PASTA_SRC, planilha.ARQUIVO_ICONE)) as versionado:
+        assert gerado.tobytes() == versionado.tobytes()
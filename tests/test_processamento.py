@@ -0,0 +1,64 @@
+import datetime
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from balancete.processamento import (
+    PlanilhaInvalida, linha_e_cabecalho, linha_tem_saldo_anterior, localizar_colunas, localizar_estrutura,
+)
+from gerar_balancete import CABECALHO, linhas_balancete
+
+
+def localizar_linha_a_linha(df_bruto):
+    """A busca da versão original: o cabeçalho e o SALDO ANTERIOR testados linha a linha."""
+    linhas = [list(linha) for linha in df_bruto.itertuples(index=False)]
+    row_with_headers = next(i for i, linha in enumerate(linhas) if linha_e_cabecalho(linha))
+    indice_saldo = next((i for i in range(row_with_headers, len(linhas)) if linha_tem_saldo_anterior(linhas[i])), None)
+    return row_with_headers, localizar_colunas(linhas[row_with_headers]), indice_saldo
+
+def planilha(linhas):
+    return pd.DataFrame(linhas, dtype=object).infer_objects()
+
+
+def test_estrutura_do_balancete_sintetico():
+    df_bruto = planilha(list(linhas_balancete(200)))
+    assert localizar_estrutura(df_bruto) == (5, [0, 2, 4, 5, 6], 6) == localizar_linha_a_linha(df_bruto)
+
+@pytest.mark.parametrize("semente", range(5))
+def test_estrutura_igual_busca_linha_a_linha(semente):
+    sorteio = random.Random(semente)
+    outras = ["EMPRESA", "saldo anterior do exercício", "Débito", 12.5, None, datetime.datetime(2024, 1, 1)]
+    linhas = [[sorteio.choice(outras) for _ in range(7)] for _ in range(sorteio.randint(0, 20))]
+    cabecalho = list(CABECALHO)
+    sorteio.shuffle(cabecalho)
+    linhas.append([valor.lower() if isinstance(valor, str) and sorteio.random() < 0.5 else valor
+                   for valor in cabecalho])
+    linhas += [[sorteio.choice(outras) for _ in range(7)] for _ in range(sorteio.randint(0, 20))]
+    df_bruto = planilha(linhas)
+    assert localizar_estrutura(df_bruto) == localizar_linha_a_linha(df_bruto)
+
+def test_saldo_anterior_antes_do_cabecalho_e_ignorado():
+    df_bruto = planilha([["SALDO ANTERIOR", None, None, None, None], [CABECALHO[0]] + CABECALHO[2:3] + CABECALHO[4:],
+                         [None, "PAGAMENTO NF 1", 10.0, None, 1.0]])
+    assert localizar_estrutura(df_bruto) == (1, [0, 1, 2, 3, 4], None)
+
+def test_colunas_numericas_e_de_datas_ignoradas():
+    df_bruto = pd.DataFrame({
+        "emissao": pd.to_datetime([None, "2024-01-02", "2024-01-03"]),
+        "lote": np.array([1.0, 2.0, 3.0]),
+        "data": ["DATA", "02/01/2024", "03/01/2024"],
+        "historico": ["CONTRAPARTIDA/HISTÓRICO", "SALDO ANTERIOR", "AQUISICAO NF 1"],
+        "debito": ["DÉBITO", None, None],
+        "credito": ["CRÉDITO", None, "10,00"],
+    })
+    assert localizar_estrutura(df_bruto) == (0, [2, 3, 4, 5, None], 1)
+
+def test_sem_cabecalho():
+    with pytest.raises(PlanilhaInvalida, match="cabeçalho"):
+        localizar_estrutura(planilha([["DATA", "HISTÓRICO", "DÉBITO"], [1, 2, 3]]))
+
+def test_sem_coluna_essencial():
+    with pytest.raises(PlanilhaInvalida, match="Colunas essenciais"):
+        localizar_estrutura(planilha([["DATA", "HISTÓRICO", "DÉBITO", "CRÉDITO"]]))
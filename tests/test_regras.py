@@ -0,0 +1,64 @@
+import json
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from balancete.regras import ClassificadorHistorico, RegraInvalida, carregar_regras
+
+# Expressão da versão original (planilha.py), que as regras padrão devem reproduzir
+PADRAO_ORIGINAL = re.compile(r'(AQUISICAO|PAGAMENTO).*?(\d+)', re.IGNORECASE)
+
+HISTORICOS = pd.Series([
+    "AQUISICAO CONF NF 1234 ACME", "PAGAMENTO NF. 1234 ACME", "aquisicao nf 77", "Pagamento-NF5",
+    "AQUISIÇÃO CONF NF 999", "PAGAMENTO SEM NUMERO", "TARIFA BANCARIA 12", "PAGAMENTO REF AQUISICAO 55",
+    "ESTORNO AQUISICAO 10 PAGAMENTO 20", None, np.nan, 123, "",
+])
+
+
+def test_regras_padrao_iguais_a_expressao_original():
+    descricao, numero, contagem = ClassificadorHistorico().classificar(HISTORICOS)
+    esperado = HISTORICOS.astype(str).str.extract(PADRAO_ORIGINAL)
+    assert descricao.fillna("-").tolist() == esperado[0].fillna("-").tolist()
+    assert numero.fillna("-").tolist() == esperado[1].fillna("-").tolist()
+    # "AQUISIÇÃO" com acento e "PAGAMENTO SEM NUMERO" ficam sem regra, como na versão original
+    assert contagem == {"AQUISICAO": 3, "PAGAMENTO": 3, "sem_regra": 7}
+
+def test_regras_padrao_com_coluna_vazia():
+    descricao, numero, contagem = ClassificadorHistorico().classificar(pd.Series([], dtype=object))
+    assert len(descricao) == len(numero) == 0
+    assert contagem == {"AQUISICAO": 0, "PAGAMENTO": 0, "sem_regra": 0}
+
+def test_arquivo_de_regras_proprio(tmp_path):
+    caminho = tmp_path / "regras.json"
+    caminho.write_text(json.dumps({"regras": [
+        {"tipo": "AQUISICAO", "palavras": ["AQUISICAO", "AQUISIÇÃO", "COMPRA"]},
+        {"tipo": "PAGAMENTO", "nome": "pagamentos", "palavras": ["PAGAMENTO", "PGTO"]},
+        {"tipo": "AQUISICAO", "nome": "NF avulsa", "padrao": "\\bNF\\b", "numero": "\\W*(\\d+)"},
+    ]}, ensure_ascii=False), encoding="utf-8")
+    classificador = ClassificadorHistorico(carregar_regras(str(caminho)))
+    textos = pd.Series(["Aquisição nf 10", "PGTO 20", "COMPRA 30 PAGAMENTO 40", "NF 50 ACME", "TARIFA 60"],
+                       index=[5, 6, 7, 8, 9])
+    descricao, numero, contagem = classificador.classificar(textos)
+    assert descricao.index.tolist() == textos.index.tolist()
+    assert descricao.fillna("-").tolist() == ["AQUISICAO", "PAGAMENTO", "AQUISICAO", "AQUISICAO", "-"]
+    assert numero.fillna("-").tolist() == ["10", "20", "30", "50", "-"]
+    assert contagem == {"AQUISICAO": 2, "pagamentos": 1, "NF avulsa": 1, "sem_regra": 1}
+
+@pytest.mark.parametrize("regras", [
+    [{"palavras": ["X"]}],
+    [{"tipo": "A"}],
+    [{"tipo": "A", "padrao": "(X)"}],
+    [{"tipo": "A", "palavras": ["X"], "numero": "\\d+"}],
+    [{"tipo": "A", "padrao": "["}],
+])
+def test_regras_invalidas(regras):
+    with pytest.raises(RegraInvalida):
+        ClassificadorHistorico(regras)
+
+def test_arquivo_sem_lista_de_regras(tmp_path):
+    caminho = tmp_path / "regras.json"
+    caminho.write_text('{"regras": []}', encoding="utf-8")
+    with pytest.raises(RegraInvalida):
+        carregar_regras(str(caminho))
@@ -0,0 +1,67 @@
+import random
+from decimal import Decimal
+
+import pandas as pd
+import pytest
+
+from balancete.processamento import gerar_relatorio, gerar_relatorio_decimal, nova_situacao, somar_por_nota
+
+
+def lancamentos(semente, quantidade=300, notas=30):
+    """
+    Lançamentos normalizados sorteados: valores com duas casas, notas em todas
+    as situações. Até 40 notas com saldo a composição é exata (sem prazo).
+    """
+    sorteio = random.Random(semente)
+    linhas = []
+    for _ in range(quantidade):
+        nf = str(sorteio.randint(1, notas))
+        valor = sorteio.randint(1, 500000) / 100
+        tipo = sorteio.randrange(3)
+        linhas.append({"Numero": nf, "Débito": valor if tipo != 1 else 0.0, "Crédito": valor if tipo != 0 else 0.0,
+                       "Saldo": 0.0})
+    # Uma nota que zera (crédito = débito em lançamentos separados) e uma só com zeros
+    linhas += [{"Numero": "OK1", "Débito": 10.1, "Crédito": 0.0, "Saldo": 0.0},
+               {"Numero": "OK1", "Débito": 0.0, "Crédito": 10.1, "Saldo": 0.0},
+               {"Numero": "ZERO", "Débito": 0.0, "Crédito": 0.0, "Saldo": 0.0}]
+    return pd.DataFrame(linhas)
+
+def comparar(df_final, saldo_anterior, segundos=1):
+    situacao, situacao_decimal = nova_situacao(), nova_situacao()
+    relatorio = gerar_relatorio(df_final, saldo_anterior, segundos, situacao)
+    esperado = gerar_relatorio_decimal(df_final, saldo_anterior, segundos, situacao_decimal)
+    assert relatorio == esperado
+    assert situacao == situacao_decimal
+    return relatorio
+
+
+@pytest.mark.parametrize("semente", range(10))
+def test_centavos_igual_decimal(semente):
+    df_final = lancamentos(semente)
+    assert somar_por_nota(df_final) is not None
+    comparar(df_final, Decimal("1234.56"))
+
+def test_saldo_anterior_igual_ao_debito_sem_aquisicao():
+    df_final = pd.DataFrame({"Numero": ["1", "2", "2"], "Débito": [100.25, 50.0, 0.0],
+                             "Crédito": [0.0, 0.0, 50.0], "Saldo": [0.0, 0.0, 0.0]})
+    relatorio = comparar(df_final, Decimal("100.25"))
+    assert relatorio[:2] == ["NF 1 -> Crédito: 0,00 | Débito: 100,25 | Sem aquisição registrada",
+                             "NF 2 -> Crédito: 50,00 | Débito: 50,00 | OK"]
+
+def test_composicao_da_diferenca_igual_decimal():
+    df_final = pd.DataFrame({"Numero": ["1", "2", "3", "4"], "Débito": [10.0, 20.5, 30.25, 0.0],
+                             "Crédito": [0.0, 0.0, 0.0, 5.0], "Saldo": [0.0] * 4})
+    relatorio = comparar(df_final, Decimal("30.25"))
+    assert "|   1) NF 1 (10,00) + NF 2 (20,50) = 30,50" in relatorio
+
+def test_mais_de_duas_casas_usa_decimal():
+    df_final = pd.DataFrame({"Numero": ["1", "1", "2"], "Débito": [0.333, 0.667, 2.0],
+                             "Crédito": [0.0, 1.0, 0.0], "Saldo": [0.0] * 3})
+    assert somar_por_nota(df_final) is None
+    relatorio = comparar(df_final, Decimal("0"))
+    assert relatorio[0] == "NF 1 -> Crédito: 1,00 | Débito: 1,00 | OK"
+
+def test_sem_lancamentos():
+    df_final = pd.DataFrame({"Numero": pd.Series([], dtype=object), "Débito": pd.Series([], dtype=float),
+                             "Crédito": pd.Series([], dtype=float), "Saldo": pd.Series([], dtype=float)})
+    comparar(df_final, Decimal("0"))
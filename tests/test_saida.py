@@ -0,0 +1,63 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from balancete.saida import FORMATOS_LANCAMENTOS, abrir_escritor_lancamentos, gravar_lancamentos
+
+
+def lancamentos():
+    return pd.DataFrame({
+        "Data": pd.to_datetime(["2024-01-02", None, "1900-01-15", "2024-12-31 10:30"], format="ISO8601"),
+        "Texto_Completo": ["AQUISICAO NF 1", 12345, None, datetime.datetime(2024, 5, 1)],
+        "Débito": [10.5, np.nan, np.inf, 0.0],
+        "Crédito": [np.nan, 3.25, -np.inf, 1e9],
+        "Saldo": [1, 2, 3, 4],
+        "Descrição": ["AQUISICAO", None, "PAGAMENTO", None],
+        "Número": ["1", np.nan, "2", None],
+    })
+
+def ler(caminho):
+    df = pd.read_excel(caminho, engine="openpyxl")
+    return df.astype(object).where(df.notna(), None)
+
+
+def test_xlsx_igual_to_excel(tmp_path):
+    df = lancamentos()
+    df.to_excel(tmp_path / "pandas.xlsx", index=False)
+    caminho = gravar_lancamentos(df, str(tmp_path), "a")
+    assert caminho == str(tmp_path / "a_lancamentos.xlsx")
+    pd.testing.assert_frame_equal(ler(caminho), ler(tmp_path / "pandas.xlsx"))
+
+@pytest.mark.parametrize("formato", FORMATOS_LANCAMENTOS)
+def test_escritor_em_blocos_igual_gravacao_inteira(tmp_path, formato):
+    df = pd.concat([lancamentos()] * 5, ignore_index=True)
+    # Só datas sem hora, como nos balancetes: o CSV do pandas omite a hora quando nenhuma data do bloco a tem
+    df["Data"] = df["Data"].dt.normalize()
+    inteiro = gravar_lancamentos(df, str(tmp_path), "inteiro", formato)
+    escritor = abrir_escritor_lancamentos(str(tmp_path), "blocos", formato)
+    for inicio in range(0, len(df), 3):
+        escritor.gravar(df.iloc[inicio:inicio + 3])
+    escritor.fechar()
+    if formato == "xlsx":
+        pd.testing.assert_frame_equal(ler(escritor.caminho), ler(inteiro))
+    elif formato == "csv":
+        with open(inteiro, encoding="utf-8") as a, open(escritor.caminho, encoding="utf-8") as b:
+            assert a.read() == b.read()
+    else:
+        pd.testing.assert_frame_equal(pd.read_parquet(escritor.caminho), pd.read_parquet(inteiro))
+
+def test_parquet_guarda_o_historico_como_texto(tmp_path):
+    caminho = gravar_lancamentos(lancamentos(), str(tmp_path), "a", "parquet")
+    lido = pd.read_parquet(caminho)
+    assert lido["Texto_Completo"].tolist()[:2] == ["AQUISICAO NF 1", "12345"]
+    assert pd.isna(lido["Texto_Completo"].iloc[2])
+    assert lido["Débito"].iloc[0] == 10.5
+    assert list(tmp_path.iterdir()) == [tmp_path / "a_lancamentos.parquet"]
+
+def test_formato_desconhecido(tmp_path):
+    with pytest.raises(ValueError):
+        gravar_lancamentos(lancamentos(), str(tmp_path), "a", "ods")
+    with pytest.raises(ValueError):
+        abrir_escritor_lancamentos(str(tmp_path), "a", "ods")
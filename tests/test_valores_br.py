@@ -0,0 +1,96 @@
+import random
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from balancete.processamento import converter_valores_br, parse_valor_br
+
+# Textos no formato brasileiro e o valor esperado
+CASOS = {
+    "1.234,56": Decimal("1234.56"),
+    "1234,56": Decimal("1234.56"),
+    "0,01": Decimal("0.01"),
+    "-0,01": Decimal("-0.01"),
+    "(1.234,56)": Decimal("-1234.56"),
+    "1.234,5-": Decimal("-1234.5"),
+    "R$ 1.234,56": Decimal("1234.56"),
+    "R$1.234,56": Decimal("1234.56"),
+    "-R$ 10,00": Decimal("-10.00"),
+    "1.234,56 D": Decimal("1234.56"),
+    "1.234,56 C": Decimal("1234.56"),
+    " 1.234.567,891 ": Decimal("1234567.891"),
+    "12": Decimal("12"),
+}
+# Vazios valem 0 e não contam como falha
+VAZIOS = ["", "  ", "-"]
+
+
+@pytest.fixture(params=["pyarrow", "sem pyarrow"])
+def caminho_texto(request, monkeypatch):
+    """Roda o teste com as operações de texto no pyarrow e no fallback sem ele."""
+    if request.param == "sem pyarrow":
+        astype = pd.Series.astype
+
+        def sem_pyarrow(serie, dtype, *args, **kwargs):
+            if dtype == "string[pyarrow]":
+                raise ImportError("pyarrow")
+            return astype(serie, dtype, *args, **kwargs)
+
+        monkeypatch.setattr(pd.Series, "astype", sem_pyarrow)
+    return request.param
+
+
+def test_parse_valor_br_formatos():
+    for texto, esperado in CASOS.items():
+        assert parse_valor_br(texto) == esperado, texto
+    for texto in VAZIOS + ["abc"]:
+        assert parse_valor_br(texto) == 0
+
+def test_converter_igual_parse_valor_br(caminho_texto):
+    textos = list(CASOS) + VAZIOS
+    valores, falhas = converter_valores_br(pd.Series(textos, dtype=object))
+    assert falhas == 0
+    for texto, valor in zip(textos, valores):
+        assert Decimal(str(valor)) == parse_valor_br(texto), texto
+
+def test_credor_negativo(caminho_texto):
+    serie = pd.Series(["1.234,56 C", "1.234,56 D", "1.234,56C", "(10,00) C"], dtype=object)
+    valores, _ = converter_valores_br(serie, credor_negativo=True)
+    assert valores.tolist() == [-1234.56, 1234.56, -1234.56, -10.0]
+
+def test_falhas_e_nulos(caminho_texto):
+    serie = pd.Series(["abc", None, np.nan, "1,00", "(1,00", "1.234.56,00"], dtype=object)
+    valores, falhas = converter_valores_br(serie)
+    assert valores.tolist() == [0.0, 0.0, 0.0, 1.0, 0.0, 0.0]
+    assert falhas == 3
+
+def test_colunas_mistas_e_numericas(caminho_texto):
+    # Números passam direto; textos fora do formato brasileiro são tentados como número comum
+    valores, falhas = converter_valores_br(pd.Series([12.5, "1.234,56", 3, "1234.56"], dtype=object))
+    assert valores.tolist() == [12.5, 1234.56, 3.0, 1234.56]
+    assert falhas == 0
+    valores, falhas = converter_valores_br(pd.Series([1.5, np.nan, 2.25]))
+    assert valores.dtype == np.float64
+    assert valores.tolist() == [1.5, 0.0, 2.25]
+    assert falhas == 0
+
+def test_sorteio_igual_parse_valor_br(caminho_texto):
+    sorteio = random.Random(7)
+    textos = []
+    for _ in range(2000):
+        centavos = sorteio.randint(0, 10 ** 11)
+        texto = f"{centavos // 100:,}".replace(",", ".") + f",{centavos % 100:02d}"
+        forma = sorteio.randrange(4)
+        if forma == 1:
+            texto = f"({texto})"
+        elif forma == 2:
+            texto = f"{texto}-"
+        elif forma == 3:
+            texto = f"R$ {texto} D"
+        textos.append(texto)
+    valores, falhas = converter_valores_br(pd.Series(textos, index=range(10, 2010)))
+    assert falhas == 0
+    assert list(valores.index) == list(range(10, 2010))
+    assert [Decimal(str(valor)) for valor in valores] == [parse_valor_br(texto) for texto in textos]